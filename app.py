@@ -1,8 +1,6 @@
 import os
 import sys
 import uuid
-import json
-import sqlite3
 import datetime
 import streamlit as st
 
@@ -15,38 +13,22 @@ BACKEND_DIR = os.path.join(os.path.dirname(__file__), "backend")
 if BACKEND_DIR not in sys.path:
     sys.path.insert(0, BACKEND_DIR)
 
-from backend.graph_ml_assistant import graph_app
+from backend import chat_store, quiz_agent, tracing
+from backend.startup import timed, warm_up
+from backend.service_client import ASSISTANT_SERVICE_URL, AssistantClient, ServiceBusy
 
+# With ASSISTANT_SERVICE_URL set, turns run in the shared service (backend/service.py)
+# and this process never loads the models
+if not ASSISTANT_SERVICE_URL:
+    with timed("import:backend.graph_ml_assistant"):
+        from backend import graph_ml_assistant
 
-# ----------------------------------------------------
-# ENV DETECTION (local vs Streamlit Cloud)
-# ----------------------------------------------------
-if os.path.exists("/mount/data"):
-    DATA_DIR = "/mount/data"
-else:
-    DATA_DIR = os.path.join(os.getcwd(), "local_data")
-
-os.makedirs(DATA_DIR, exist_ok=True)
-DB_PATH = os.path.join(DATA_DIR, "chats.db")
 
+# Render replies token by token (set STREAM_REPLIES=0 for a single blocking invoke)
+STREAM_REPLIES = os.getenv("STREAM_REPLIES", "1") == "1"
+# Default state of the sidebar's per-turn trace panel
+DEBUG_PANEL = os.getenv("DEBUG_PANEL", "0") == "1"
 
-# ----------------------------------------------------
-# DATABASE
-# ----------------------------------------------------
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-cursor = conn.cursor()
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS chats (
-    user_id TEXT,
-    chat_id TEXT,
-    name TEXT,
-    messages TEXT,
-    last_updated REAL,
-    PRIMARY KEY (user_id, chat_id)
-)
-""")
-conn.commit()
 
 # ----------------------------------------------------
 # HEADER
@@ -59,48 +41,24 @@ st.set_page_config(
 
 
 # ----------------------------------------------------
-# DB HELPERS (USER-SCOPED)
+# BACKGROUND WARM-UP (models, Chroma, LLM clients)
 # ----------------------------------------------------
-def load_chats(user_id):
-    cursor.execute(
-        "SELECT chat_id, name, messages, last_updated FROM chats WHERE user_id = ?",
-        (user_id,)
-    )
-    rows = cursor.fetchall()
-    chats = {}
-    for chat_id, name, messages, last_updated in rows:
-        chats[chat_id] = {
-            "name": name,
-            "messages": json.loads(messages),
-            "last_updated": last_updated
-        }
-    return chats
-
-
-def save_chat(user_id, chat_id, chat):
-    cursor.execute(
-        """
-        INSERT OR REPLACE INTO chats
-        (user_id, chat_id, name, messages, last_updated)
-        VALUES (?, ?, ?, ?, ?)
-        """,
-        (
-            user_id,
-            chat_id,
-            chat["name"],
-            json.dumps(chat["messages"]),
-            chat["last_updated"]
-        )
-    )
-    conn.commit()
+@st.cache_resource
+def start_backend_warm_up():
+    # Runs once per server process; the login page renders while this loads
+    if ASSISTANT_SERVICE_URL:
+        return None
+    if quiz_agent.QUIZ_PREWARM:
+        quiz_agent.prewarm_quizzes()
+    return warm_up(background=True)
 
 
-def delete_chat(user_id, chat_id):
-    cursor.execute(
-        "DELETE FROM chats WHERE user_id = ? AND chat_id = ?",
-        (user_id, chat_id)
-    )
-    conn.commit()
+start_backend_warm_up()
+
+
+@st.cache_resource
+def service_client():
+    return AssistantClient(ASSISTANT_SERVICE_URL)
 
 
 # ----------------------------------------------------
@@ -118,6 +76,10 @@ if "current_chat" not in st.session_state:
 if "rename_id" not in st.session_state:
     st.session_state.rename_id = None
 
+# chat_id → {"messages": [...]} for chats whose messages were (partly) loaded
+if "loaded" not in st.session_state:
+    st.session_state.loaded = {}
+
 
 # ----------------------------------------------------
 # USER LOGIN (4-DIGIT CODE)
@@ -128,7 +90,9 @@ if st.session_state.user_id is None:
 
     if pin and pin.isdigit() and len(pin) == 4:
         st.session_state.user_id = pin
-        st.session_state.chats = load_chats(pin)
+        # Sidebar needs metadata only; message bodies load when a chat is opened
+        st.session_state.chats = chat_store.list_chats(pin)
+        st.session_state.loaded = {}
         st.session_state.current_chat = None
         st.rerun()
     else:
@@ -143,16 +107,86 @@ def auto_title(text):
     return " ".join(text.split()[:6]).title() or "New Chat"
 
 
+def render_trace(trace):
+    """Waterfall of the last turn: one bar per node span, sub-spans indented."""
+    if not trace:
+        st.caption("No traced turn yet.")
+        return
+
+    total = trace["total_ms"] or 1.0
+    width = 40
+    lines = []
+    for s in trace["spans"]:
+        offset = int(s["start_ms"] / total * width)
+        length = max(1, int(s["dur_ms"] / total * width))
+        name = s["name"] if s["parent"] is None else f"  └ {s['name']}"
+        lines.append(f"{name:<24} {' ' * offset}{'█' * length:<{width - offset}} {s['dur_ms']:>9.1f} ms")
+
+    st.markdown(f"**Last turn** — {trace['total_ms']:.0f} ms")
+    st.code("\n".join(lines), language=None)
+    st.json(trace["attrs"])
+
+
+def run_turn(history):
+    """One assistant turn over the full history → (reply, trace id)."""
+    if ASSISTANT_SERVICE_URL:
+        client = service_client()
+        user_id, chat_id = st.session_state.user_id, st.session_state.current_chat
+        try:
+            if STREAM_REPLIES:
+                turn = {}
+                with st.chat_message("assistant"):
+                    st.write_stream(client.stream_turn(user_id, chat_id, history, turn))
+                result = turn["result"]
+            else:
+                result = client.turn(user_id, chat_id, history)
+        except ServiceBusy as e:
+            st.warning(f"The assistant is busy ({e.reason}), try again in a few seconds.")
+            st.stop()
+        return result["reply"], result.get("trace_id")
+
+    state = {
+        "user_id": st.session_state.user_id,
+        "chat_id": st.session_state.current_chat,
+        "messages": [
+            HumanMessage(content=m["content"]) if m["role"] == "user"
+            else AIMessage(content=m["content"])
+            for m in history
+        ]
+    }
+    if STREAM_REPLIES:
+        # Tokens render as they arrive; the final state is collected in `turn`
+        turn = {}
+        with st.chat_message("assistant"):
+            st.write_stream(graph_ml_assistant.stream_turn(state, turn))
+        result = turn["state"]
+    else:
+        result = graph_ml_assistant.graph_app.invoke(state)
+    return result["messages"][-1].content, result.get("trace_id")
+
+
 def create_chat():
     chat_id = str(uuid.uuid4())
     chat = {
         "name": "New Chat",
-        "messages": [],
+        "n_messages": 0,
         "last_updated": datetime.datetime.now().timestamp()
     }
     st.session_state.chats[chat_id] = chat
+    st.session_state.loaded[chat_id] = {"messages": []}
     st.session_state.current_chat = chat_id
-    save_chat(st.session_state.user_id, chat_id, chat)
+    chat_store.create_chat(st.session_state.user_id, chat_id, chat["name"], chat["last_updated"])
+
+
+def chat_view(chat_id):
+    """Loaded page(s) of a chat's messages; the newest page is fetched on first open."""
+    view = st.session_state.loaded.get(chat_id)
+    if view is None:
+        msgs = chat_store.load_messages(
+            st.session_state.user_id, chat_id, limit=chat_store.PAGE_SIZE
+        )
+        view = st.session_state.loaded[chat_id] = {"messages": msgs}
+    return view
 
 
 # ----------------------------------------------------
@@ -169,9 +203,14 @@ with st.sidebar:
     if st.button("🔄 Change User", use_container_width=True):
         st.session_state.user_id = None
         st.session_state.chats = {}
+        st.session_state.loaded = {}
         st.session_state.current_chat = None
         st.rerun()
 
+    st.session_state.debug_panel = st.toggle(
+        "🛠 Debug panel", value=st.session_state.get("debug_panel", DEBUG_PANEL)
+    )
+
     st.markdown("---")
 
     sorted_chats = sorted(
@@ -194,8 +233,9 @@ with st.sidebar:
 
         with col3:
             if st.button("x", key=f"delete_{chat_id}"):
-                delete_chat(st.session_state.user_id, chat_id)
+                chat_store.delete_chat(st.session_state.user_id, chat_id)
                 del st.session_state.chats[chat_id]
+                st.session_state.loaded.pop(chat_id, None)
                 if st.session_state.current_chat == chat_id:
                     st.session_state.current_chat = None
                 st.rerun()
@@ -205,7 +245,7 @@ with st.sidebar:
         new_name = st.text_input("Rename chat", st.session_state.chats[cid]["name"])
         if st.button("Save"):
             st.session_state.chats[cid]["name"] = new_name
-            save_chat(st.session_state.user_id, cid, st.session_state.chats[cid])
+            chat_store.rename_chat(st.session_state.user_id, cid, new_name)
             st.session_state.rename_id = None
             st.rerun()
 
@@ -220,34 +260,57 @@ if st.session_state.current_chat is None:
 
 chat_id = st.session_state.current_chat
 chat = st.session_state.chats[chat_id]
+view = chat_view(chat_id)
 
 st.markdown(f"## {chat['name']}")
 
-for msg in chat["messages"]:
+if view["messages"] and view["messages"][0]["seq"] > 0:
+    if st.button("⬆️ Load earlier messages"):
+        older = chat_store.load_messages(
+            st.session_state.user_id, chat_id,
+            limit=chat_store.PAGE_SIZE, before_seq=view["messages"][0]["seq"]
+        )
+        view["messages"] = older + view["messages"]
+        st.rerun()
+
+for msg in view["messages"]:
     st.chat_message(msg["role"]).write(msg["content"])
 
+if st.session_state.get("debug_panel"):
+    with st.expander("🛠 Trace", expanded=True):
+        if ASSISTANT_SERVICE_URL:
+            render_trace(service_client().trace(st.session_state.get("last_trace_id")))
+            st.json(service_client().metrics(), expanded=False)
+        else:
+            render_trace(tracing.get_trace(st.session_state.get("last_trace_id")))
+            st.json(tracing.metrics.snapshot(), expanded=False)
+
 
 user_input = st.chat_input("Ask anything from the ML course...")
 
 if user_input:
-    if chat["name"] == "New Chat" and not chat["messages"]:
+    if chat["name"] == "New Chat" and not chat["n_messages"]:
         chat["name"] = auto_title(user_input)
+        chat_store.rename_chat(st.session_state.user_id, chat_id, chat["name"])
 
-    chat["messages"].append({"role": "user", "content": user_input})
+    # The graph gets the whole conversation, not just the page on screen
+    history = chat_store.load_messages(st.session_state.user_id, chat_id)
+    history.append({"role": "user", "content": user_input})
 
-    state = {
-        "messages": [
-            HumanMessage(content=m["content"]) if m["role"] == "user"
-            else AIMessage(content=m["content"])
-            for m in chat["messages"]
-        ]
-    }
+    st.chat_message("user").write(user_input)
 
-    result = graph_app.invoke(state)
-    reply = result["messages"][-1].content
+    reply, st.session_state.last_trace_id = run_turn(history)
 
-    chat["messages"].append({"role": "assistant", "content": reply})
+    # Append-only: only this turn's two rows are written
+    new_messages = [
+        {"role": "user", "content": user_input},
+        {"role": "assistant", "content": reply},
+    ]
     chat["last_updated"] = datetime.datetime.now().timestamp()
+    chat["n_messages"] = chat_store.append_messages(
+        st.session_state.user_id, chat_id, new_messages, chat["last_updated"]
+    )
+    first_seq = chat["n_messages"] - len(new_messages)
+    view["messages"] += [dict(m, seq=first_seq + i) for i, m in enumerate(new_messages)]
 
-    save_chat(st.session_state.user_id, chat_id, chat)
     st.rerun()
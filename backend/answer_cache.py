@@ -0,0 +1,111 @@
+# backend/answer_cache.py
+# Semantic response cache in front of the teacher LLM
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from backend import embeddings
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_TTL_S = float(os.getenv("ANSWER_CACHE_TTL_S", str(24 * 3600)))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+
+
+def context_key(parts) -> str:
+    """Stable key for the context an answer was grounded on (chunk ids, URLs, ...)."""
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed on (route, context key) + question embedding.
+    A lookup hits when an entry in the same (route, context) bucket has cosine
+    similarity ≥ threshold and is younger than the TTL. Eviction is LRU.
+    """
+
+    def __init__(self, threshold: float, ttl_s: float, max_items: int):
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.max_items = max_items
+        self._entries = OrderedDict()   # entry id → (route, ctx, unit vector, answer, created)
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.hit_ms_total = 0.0
+
+    @staticmethod
+    def _unit(question: str):
+        vec = np.asarray(embeddings.encode(question), dtype=np.float32)
+        return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+    def lookup(self, question: str, route: str, ctx: str = "") -> str | None:
+        t0 = time.perf_counter()
+        vec = self._unit(question)
+        now = time.time()
+        best_id, best_sim = None, self.threshold
+
+        with self._lock:
+            for entry_id, (e_route, e_ctx, e_vec, _, created) in list(self._entries.items()):
+                if now - created > self.ttl_s:
+                    del self._entries[entry_id]
+                    continue
+                if e_route != route or e_ctx != ctx:
+                    continue
+                sim = float(e_vec @ vec)
+                if sim >= best_sim:
+                    best_id, best_sim = entry_id, sim
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            self.hit_ms_total += (time.perf_counter() - t0) * 1000
+            return self._entries[best_id][3]
+
+    def store(self, question: str, route: str, ctx: str, answer: str):
+        if not answer:
+            return
+        vec = self._unit(question)
+        with self._lock:
+            self._entries[self._next_id] = (route, ctx, vec, answer, time.time())
+            self._next_id += 1
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "avg_hit_ms": round(self.hit_ms_total / self.hits, 3) if self.hits else None,
+        }
+
+
+answer_cache = SemanticAnswerCache(
+    threshold=ANSWER_CACHE_THRESHOLD,
+    ttl_s=ANSWER_CACHE_TTL_S,
+    max_items=ANSWER_CACHE_SIZE,
+)
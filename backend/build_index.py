@@ -0,0 +1,271 @@
+# backend/build_index.py
+# Incremental, content-hashed build of the course vector DB (replaces build_vector_db.ipynb)
+#
+#   python -m backend.build_index            # sync processed_texts/ → vectorstore/
+#   python -m backend.build_index --rebuild  # ignore the manifest, re-embed everything
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend import embeddings
+
+# ----------------------------
+# Paths + chunking setup (same as the original notebook)
+# ----------------------------
+TEXT_DIR = os.path.join(PROJECT_ROOT, "processed_texts")
+DB_DIR = os.path.join(PROJECT_ROOT, "vectorstore")
+MANIFEST_PATH = os.path.join(DB_DIR, "index_manifest.json")
+
+COLLECTION_NAME = "course_rag"
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+SEPARATORS = ["\n\n", "\n", ".", " ", ""]
+
+# 2: chunk metadata carries the deck's chapter / deck number (see deck_metadata)
+MANIFEST_VERSION = 2
+UPSERT_BATCH = 1000
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(source: str, chunk: str) -> str:
+    """Stable id: same chunk text in the same deck → same id across rebuilds."""
+    return f"{source}-{_sha256(chunk)[:16]}"
+
+
+def deck_metadata(source: str) -> dict:
+    """
+    Chunk metadata for a deck file name:
+    '7_NLP_Seq2Seq_Transformer.txt' → chapter '7', deck '7';
+    '10_3_CLOUD_AI_Weapons_of_math_destruction.txt' → chapter '10', deck '10.3'.
+    """
+    meta = {"source": source}
+    m = re.match(r"(\d+)(?:_(\d+))?_", source)
+    if m:
+        meta["chapter"] = m.group(1)
+        meta["deck"] = f"{m.group(1)}.{m.group(2)}" if m.group(2) else m.group(1)
+    return meta
+
+
+def index_config() -> dict:
+    """Everything that, when changed, invalidates every stored chunk."""
+    return {
+        "version": MANIFEST_VERSION,
+        "model": embeddings.MODEL_NAME,
+        "collection": COLLECTION_NAME,
+        "splitter": {
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "separators": SEPARATORS,
+        },
+    }
+
+
+def make_splitter(chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=SEPARATORS,
+    )
+
+
+def load_documents(text_dir: str = TEXT_DIR) -> dict:
+    """{filename: text} for every processed_texts/*.txt."""
+    docs = {}
+    for filename in sorted(os.listdir(text_dir)):
+        if not filename.endswith(".txt"):
+            continue
+        with open(os.path.join(text_dir, filename), "r", encoding="utf-8") as f:
+            docs[filename] = f.read()
+    return docs
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest: dict, path: str = MANIFEST_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def indexed_documents(manifest_path: str = MANIFEST_PATH) -> dict:
+    """Manifest entries of the current index ({} when the manifest is missing or stale)."""
+    manifest = load_manifest(manifest_path)
+    return manifest.get("documents", {}) if manifest.get("config") == index_config() else {}
+
+
+def _batches(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ----------------------------
+# Sync
+# ----------------------------
+def sync_index(
+    documents: dict,
+    keep: set | None = None,
+    rebuild: bool = False,
+    batch_size: int = embeddings.EMBED_BATCH_SIZE,
+    manifest_path: str = MANIFEST_PATH,
+    verbose: bool = True,
+    allow_empty: bool = False,
+) -> dict:
+    """
+    Bring the `course_rag` collection in line with `documents` ({name: text}).
+
+    - documents whose text hash matches the manifest are skipped (no chunking, no embedding)
+    - changed documents: only chunks with new content are embedded and upserted,
+      chunks that disappeared are deleted
+    - manifest documents missing from `documents` (and not in `keep`) are removed
+    - no documents at all is refused unless allow_empty=True: it would delete every chunk
+    """
+    t0 = time.perf_counter()
+    keep = set(keep or ())
+    config = index_config()
+    known = {} if rebuild else indexed_documents(manifest_path)
+    # No (matching) manifest → the collection may hold chunks we can't account for
+    full_sync = not known
+
+    changed = {}
+    unchanged = []
+    for name, text in documents.items():
+        text_hash = _sha256(text)
+        if not full_sync and known.get(name, {}).get("sha256") == text_hash:
+            unchanged.append(name)
+        else:
+            changed[name] = (text, text_hash)
+
+    removed = [n for n in known if n not in documents and n not in keep]
+    stats = {
+        "documents": len(documents),
+        "changed": sorted(changed),
+        "removed": sorted(removed),
+        "unchanged": len(unchanged) + len([n for n in keep if n in known]),
+        "embedded": 0,
+        "deleted": 0,
+    }
+
+    if not documents and not keep and not allow_empty:
+        # Empty or mistyped --text-dir: syncing would wipe the whole collection
+        print(
+            "[INDEX WARNING] No documents to index; the course index was left untouched. "
+            "Pass --allow-empty to empty it on purpose."
+        )
+        stats["refused"] = True
+        stats["seconds"] = round(time.perf_counter() - t0, 3)
+        return stats
+
+    if not changed and not removed and not full_sync:
+        stats["seconds"] = round(time.perf_counter() - t0, 3)
+        if verbose:
+            print(f"✅ Index up to date ({stats['unchanged']} documents, {stats['seconds']}s)")
+        return stats
+
+    from backend.tools_rag import get_chroma_collection, export_numpy_index, RAG_BACKEND
+
+    collection = get_chroma_collection()
+    splitter = make_splitter()
+
+    new_docs = {name: known[name] for name in unchanged}
+    new_docs.update({name: known[name] for name in keep if name in known})
+    to_add = []            # (id, chunk, source)
+    stale_ids = set()
+
+    for name, (text, text_hash) in changed.items():
+        # Identical chunks within one deck share an id and are stored once
+        chunks = {}
+        for chunk in splitter.split_text(text):
+            chunks.setdefault(chunk_id(name, chunk), chunk)
+
+        old_ids = set(known.get(name, {}).get("chunks", []))
+        # Chunks already stored under the same content hash need no re-embedding
+        to_add.extend((cid, c, name) for cid, c in chunks.items() if cid not in old_ids)
+        stale_ids |= old_ids - set(chunks)
+        ids = list(chunks)
+        new_docs[name] = {"sha256": text_hash, "chunks": ids}
+        if verbose:
+            print(f"Processing {name} → {len(ids)} chunks")
+
+    for name in removed:
+        stale_ids |= set(known[name].get("chunks", []))
+
+    if full_sync:
+        wanted = {cid for d in new_docs.values() for cid in d["chunks"]}
+        stale_ids |= set(collection.get(include=[])["ids"]) - wanted
+
+    for batch in _batches(to_add, UPSERT_BATCH):
+        vectors = embeddings.encode_many(
+            [chunk for _, chunk, _ in batch], batch_size=batch_size, use_cache=False
+        )
+        collection.upsert(
+            ids=[cid for cid, _, _ in batch],
+            embeddings=vectors,
+            documents=[chunk for _, chunk, _ in batch],
+            metadatas=[deck_metadata(src) for _, _, src in batch],
+        )
+    stats["embedded"] = len(to_add)
+
+    stale = sorted(stale_ids)
+    for batch in _batches(stale, UPSERT_BATCH):
+        collection.delete(ids=batch)
+    stats["deleted"] = len(stale)
+
+    save_manifest({"config": config, "documents": new_docs}, manifest_path)
+    if RAG_BACKEND == "numpy":
+        export_numpy_index()
+
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    if verbose:
+        print("\n-------------------------------------------")
+        print("✅ Vector database synced!")
+        print(f"Changed: {len(changed)}  Removed: {len(removed)}  Unchanged: {stats['unchanged']}")
+        print(f"Chunks embedded: {stats['embedded']}  deleted: {stats['deleted']}")
+        print(f"Total chunks stored: {collection.count()}  ({stats['seconds']}s)")
+        print("-------------------------------------------")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync processed_texts/ into the course vector DB.")
+    parser.add_argument("--text-dir", default=TEXT_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="ignore the manifest and re-embed all chunks")
+    parser.add_argument("--batch-size", type=int, default=embeddings.EMBED_BATCH_SIZE)
+    parser.add_argument("--allow-empty", action="store_true", help="sync even when --text-dir has no documents")
+    args = parser.parse_args(argv)
+
+    stats = sync_index(
+        load_documents(args.text_dir),
+        rebuild=args.rebuild,
+        batch_size=args.batch_size,
+        allow_empty=args.allow_empty,
+    )
+    if stats.get("refused"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# backend/chat_store.py
+# Chat persistence: chat metadata + append-only messages (SQLite, WAL, per-thread connections)
+
+import os
+import time
+import sqlite3
+import threading
+
+# ----------------------------------------------------
+# ENV DETECTION (local vs Streamlit Cloud)
+# ----------------------------------------------------
+if os.path.exists("/mount/data"):
+    DATA_DIR = "/mount/data"
+else:
+    DATA_DIR = os.path.join(os.getcwd(), "local_data")
+
+os.makedirs(DATA_DIR, exist_ok=True)
+DB_PATH = os.path.join(DATA_DIR, "chats.db")
+
+PAGE_SIZE = 30
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = set()
+
+
+# ----------------------------------------------------
+# CONNECTIONS
+# ----------------------------------------------------
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def get_conn(path: str = DB_PATH) -> sqlite3.Connection:
+    """One connection per (thread, db file); the schema is set up once per process."""
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _connect(path)
+    if path not in _initialized:
+        with _init_lock:
+            if path not in _initialized:
+                _init_schema(conn)
+                _initialized.add(path)
+    return conn
+
+
+# ----------------------------------------------------
+# SCHEMA (+ migration from the old one-row-per-chat JSON layout)
+# ----------------------------------------------------
+def _columns(conn, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _tables(conn) -> set[str]:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _init_schema(conn: sqlite3.Connection):
+    with conn:
+        # Check + rename + copy + drop in one write transaction: a crash rolls the
+        # whole migration back, and a second process opening the same file waits
+        # here and then finds it already done
+        conn.execute("BEGIN IMMEDIATE")
+        legacy = "messages" in _columns(conn, "chats")
+        if legacy:
+            conn.execute("ALTER TABLE chats RENAME TO chats_legacy")
+        legacy = legacy or "chats_legacy" in _tables(conn)
+
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS chats (
+            user_id TEXT,
+            chat_id TEXT,
+            name TEXT,
+            created REAL,
+            last_updated REAL,
+            n_messages INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, chat_id)
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            user_id TEXT,
+            chat_id TEXT,
+            seq INTEGER,
+            role TEXT,
+            content TEXT,
+            created REAL,
+            PRIMARY KEY (user_id, chat_id, seq)
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS chat_summaries (
+            user_id TEXT,
+            chat_id TEXT,
+            summary TEXT,
+            upto_seq INTEGER,
+            updated REAL,
+            PRIMARY KEY (user_id, chat_id)
+        )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS chats_by_user ON chats (user_id, last_updated DESC)"
+        )
+
+        if legacy:
+            _migrate_legacy(conn)
+
+
+def _migrate_legacy(conn: sqlite3.Connection):
+    import json
+
+    rows = conn.execute(
+        "SELECT user_id, chat_id, name, messages, last_updated FROM chats_legacy"
+    ).fetchall()
+    for user_id, chat_id, name, messages, last_updated in rows:
+        try:
+            msgs = json.loads(messages or "[]")
+        except ValueError:
+            msgs = []
+        conn.execute(
+            "INSERT OR REPLACE INTO chats VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, chat_id, name, last_updated, last_updated, len(msgs)),
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (user_id, chat_id, seq, m.get("role"), m.get("content"), last_updated)
+                for seq, m in enumerate(msgs)
+            ],
+        )
+    conn.execute("DROP TABLE chats_legacy")
+
+
+# ----------------------------------------------------
+# CHATS (metadata only)
+# ----------------------------------------------------
+def list_chats(user_id: str) -> dict:
+    rows = get_conn().execute(
+        """
+        SELECT chat_id, name, last_updated, n_messages FROM chats
+        WHERE user_id = ? ORDER BY last_updated DESC
+        """,
+        (user_id,),
+    ).fetchall()
+    return {
+        chat_id: {"name": name, "last_updated": last_updated, "n_messages": n}
+        for chat_id, name, last_updated, n in rows
+    }
+
+
+def create_chat(user_id: str, chat_id: str, name: str, ts: float | None = None):
+    ts = ts or time.time()
+    conn = get_conn()
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO chats VALUES (?, ?, ?, ?, ?, 0)",
+            (user_id, chat_id, name, ts, ts),
+        )
+
+
+def rename_chat(user_id: str, chat_id: str, name: str):
+    conn = get_conn()
+    with conn:
+        conn.execute(
+            "UPDATE chats SET name = ? WHERE user_id = ? AND chat_id = ?",
+            (name, user_id, chat_id),
+        )
+
+
+def delete_chat(user_id: str, chat_id: str):
+    conn = get_conn()
+    with conn:
+        conn.execute("DELETE FROM messages WHERE user_id = ? AND chat_id = ?", (user_id, chat_id))
+        conn.execute("DELETE FROM chat_summaries WHERE user_id = ? AND chat_id = ?", (user_id, chat_id))
+        conn.execute("DELETE FROM chats WHERE user_id = ? AND chat_id = ?", (user_id, chat_id))
+
+
+# ----------------------------------------------------
+# MESSAGES (append-only, paginated reads)
+# ----------------------------------------------------
+def append_messages(user_id: str, chat_id: str, messages: list[dict], ts: float | None = None) -> int:
+    """Append [{"role", "content"}, ...]; writes only the new rows. Returns the new message count."""
+    ts = ts or time.time()
+    conn = get_conn()
+    with conn:
+        # Take the write lock before reading the next seq: two sessions appending to
+        # the same chat would otherwise both read the same start and collide
+        conn.execute("BEGIN IMMEDIATE")
+        start = conn.execute(
+            "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE user_id = ? AND chat_id = ?",
+            (user_id, chat_id),
+        ).fetchone()[0]
+        conn.executemany(
+            "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (user_id, chat_id, start + i, m["role"], m["content"], ts)
+                for i, m in enumerate(messages)
+            ],
+        )
+        n = start + len(messages)
+        conn.execute(
+            "UPDATE chats SET n_messages = ?, last_updated = ? WHERE user_id = ? AND chat_id = ?",
+            (n, ts, user_id, chat_id),
+        )
+    return n
+
+
+def load_messages(
+    user_id: str,
+    chat_id: str,
+    limit: int | None = None,
+    before_seq: int | None = None,
+) -> list[dict]:
+    """
+    Messages in chronological order. With `limit`, only the newest `limit`
+    messages (older than `before_seq`, if given) are returned.
+    """
+    query = "SELECT seq, role, content FROM messages WHERE user_id = ? AND chat_id = ?"
+    params = [user_id, chat_id]
+    if before_seq is not None:
+        query += " AND seq < ?"
+        params.append(before_seq)
+    query += " ORDER BY seq DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    rows = get_conn().execute(query, params).fetchall()
+    return [{"seq": seq, "role": role, "content": content} for seq, role, content in reversed(rows)]
+
+
+# ----------------------------------------------------
+# ROLLING SUMMARIES (see backend/history.py)
+# ----------------------------------------------------
+def get_summary(user_id: str, chat_id: str):
+    """(summary, upto_seq): the summary covers messages with seq < upto_seq. (None, 0) if none."""
+    row = get_conn().execute(
+        "SELECT summary, upto_seq FROM chat_summaries WHERE user_id = ? AND chat_id = ?",
+        (user_id, chat_id),
+    ).fetchone()
+    return (row[0], row[1]) if row else (None, 0)
+
+
+def save_summary(user_id: str, chat_id: str, summary: str, upto_seq: int):
+    conn = get_conn()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO chat_summaries VALUES (?, ?, ?, ?, ?)",
+            (user_id, chat_id, summary, upto_seq, time.time()),
+        )
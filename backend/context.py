@@ -0,0 +1,188 @@
+# backend/context.py
+# Context assembly for RAG prompts: retrieved chunks → compact excerpt block.
+#   1) MMR over the candidates' stored embeddings (relevant but not redundant;
+#      applied by tools_rag.retrieve)
+#   2) merge chunks of the same deck whose text overlaps (the splitter's chunk_overlap)
+#   3) trim to RAG_CONTEXT_TOKENS
+
+import os
+import threading
+from collections import deque
+
+import numpy as np
+
+from backend.history import count_tokens
+
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1200"))
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))   # 1.0 = pure relevance order
+# Shortest shared tail/head (chars) that counts as chunk overlap; longest checked
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 300
+# Don't bother appending a truncated excerpt shorter than this
+MIN_EXCERPT_TOKENS = 40
+
+HEADER = "Relevant excerpts from course materials:\n\n"
+
+_calls = deque(maxlen=500)     # (verbatim tokens, sent tokens) per call
+_lock = threading.Lock()
+
+
+# -------------------------------------------------------
+# MMR
+# -------------------------------------------------------
+def mmr(vectors, k: int, lam: float = RAG_MMR_LAMBDA) -> list[int]:
+    """
+    Maximal marginal relevance over candidates given best-first. Relevance is
+    the (fused) rank, since lexical hits have no query similarity; redundancy
+    is cosine similarity between the candidates' stored embeddings.
+    """
+    n = len(vectors)
+    if n <= 1 or lam >= 1.0:
+        return list(range(min(k, n)))
+
+    m = np.asarray(vectors, dtype=np.float32)
+    m = m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+    sims = m @ m.T
+    relevance = 1.0 - np.arange(n, dtype=np.float32) / n
+
+    selected = [0]
+    while len(selected) < min(k, n):
+        rest = [i for i in range(n) if i not in selected]
+        redundancy = sims[np.ix_(rest, selected)].max(axis=1)
+        scores = lam * relevance[rest] - (1.0 - lam) * redundancy
+        selected.append(rest[int(np.argmax(scores))])
+    return selected
+
+
+# -------------------------------------------------------
+# Overlap merging
+# -------------------------------------------------------
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest tail of `a` that is also the head of `b` (0 if < MIN_OVERLAP_CHARS)."""
+    for n in range(min(len(a), len(b), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if a.endswith(b[:n]):
+            return n
+    return 0
+
+
+def merge_overlapping(blocks: list[dict]) -> list[dict]:
+    """
+    blocks: [{"source", "text", "rank"}] best-first. Same-deck blocks that
+    contain each other or overlap tail-to-head are joined into one block
+    (ranked as its best part); order of first appearance is kept.
+    """
+    out = []
+    for block in blocks:
+        block = dict(block)
+        merged = True
+        while merged:
+            merged = False
+            for other in out:
+                if other["source"] != block["source"]:
+                    continue
+                a, b = other["text"], block["text"]
+                if b in a:
+                    text = a
+                elif a in b:
+                    text = b
+                elif _overlap(a, b):
+                    text = a + b[_overlap(a, b):]
+                elif _overlap(b, a):
+                    text = b + a[_overlap(b, a):]
+                else:
+                    continue
+                out.remove(other)
+                block = {
+                    "source": block["source"],
+                    "text": text,
+                    "rank": min(other["rank"], block["rank"]),
+                }
+                merged = True
+                break
+        out.append(block)
+    return sorted(out, key=lambda blk: blk["rank"])
+
+
+# -------------------------------------------------------
+# Budget + rendering
+# -------------------------------------------------------
+def _render_block(block: dict) -> str:
+    return f"[From {block['source']}]\n{block['text']}\n\n"
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut to about max_tokens, at the last sentence end if there is one."""
+    cut = text[: max(0, max_tokens) * 4]
+    end = cut.rfind(". ")
+    return cut[: end + 1] if end > len(cut) // 2 else cut
+
+
+def trim_to_budget(blocks: list[dict], budget: int) -> list[dict]:
+    """Whole blocks in rank order while they fit; the first one that doesn't is truncated."""
+    used = count_tokens(HEADER)
+    out = []
+    for block in blocks:
+        cost = count_tokens(_render_block(block))
+        if used + cost <= budget:
+            out.append(block)
+            used += cost
+            continue
+        room = budget - used - count_tokens(_render_block(dict(block, text="")))
+        if room >= MIN_EXCERPT_TOKENS:
+            out.append(dict(block, text=_truncate(block["text"], room)))
+        break
+    return out
+
+
+def render(blocks: list[dict]) -> str:
+    return HEADER + "".join(_render_block(b) for b in blocks)
+
+
+def verbatim(hits: list) -> str:
+    """The old, uncompressed rendering of retrieval hits (also used for the savings report)."""
+    response = "📚 **Relevant excerpts from course materials:**\n\n"
+    for hit in hits:
+        response += f"**From {hit['source']}:**\n{hit['document']}\n\n---\n\n"
+    return response
+
+
+def assemble(hits: list, budget: int = RAG_CONTEXT_TOKENS):
+    """
+    hits: best-first retrieval hits (see tools_rag.retrieve), already
+    diversified. Returns (excerpt text, report) where report has
+    {"verbatim_tokens", "sent_tokens", "saved_tokens", "chunks", "blocks"}.
+    """
+    blocks = [
+        {"source": hit["source"], "text": hit["document"].strip(), "rank": rank}
+        for rank, hit in enumerate(hits)
+    ]
+    blocks = trim_to_budget(merge_overlapping(blocks), budget)
+    text = render(blocks)
+
+    before = count_tokens(verbatim(hits))
+    after = count_tokens(text)
+    report = {
+        "verbatim_tokens": before,
+        "sent_tokens": after,
+        "saved_tokens": max(0, before - after),
+        "chunks": len(hits),
+        "blocks": len(blocks),
+    }
+    with _lock:
+        _calls.append((before, after))
+    return text, report
+
+
+def stats() -> dict:
+    """Token savings over the last 500 calls."""
+    with _lock:
+        calls = list(_calls)
+    before = sum(c[0] for c in calls)
+    after = sum(c[1] for c in calls)
+    return {
+        "calls": len(calls),
+        "verbatim_tokens": before,
+        "sent_tokens": after,
+        "saved_tokens": max(0, before - after),
+        "saved_pct": round(100 * (before - after) / before, 1) if before else 0.0,
+    }
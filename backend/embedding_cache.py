@@ -0,0 +1,169 @@
+# backend/embedding_cache.py
+# Bounded LRU cache for text embeddings, with an optional SQLite tier
+
+import re
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(text: str, lowercase: bool = False) -> str:
+    """Key normalization: trim, collapse whitespace and (optionally) lowercase."""
+    text = _WS.sub(" ", text).strip()
+    return text.lower() if lowercase else text
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed on (model id, normalized text).
+
+    - memory tier: OrderedDict LRU with `max_items` entries
+    - disk tier (optional): SQLite file, so a restarted worker starts warm;
+      holds at most `max_disk_rows` vectors, oldest written dropped first
+
+    Keys are lowercased only with lowercase=True, i.e. for models whose
+    tokenizer is uncased; otherwise "Python" and "python" embed differently.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 4096,
+        disk_path: str | None = None,
+        max_disk_rows: int = 100_000,
+        lowercase: bool = False,
+    ):
+        self.max_items = max_items
+        self.disk_path = disk_path
+        self.max_disk_rows = max_disk_rows
+        self.lowercase = lowercase
+        self._disk_rows = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk_path:
+            try:
+                self._db = sqlite3.connect(disk_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS embeddings (
+                        model TEXT,
+                        text_key TEXT,
+                        vec BLOB,
+                        PRIMARY KEY (model, text_key)
+                    )
+                    """
+                )
+                self._db.commit()
+                self._disk_rows = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                self._trim_disk_locked()
+            except sqlite3.Error as e:
+                # Disk tier is best-effort; keep serving from memory
+                print(f"[EMBED CACHE DISK ERROR] {e}")
+                self._db = None
+
+    # ----------------------------------------------------
+    # LOOKUP
+    # ----------------------------------------------------
+    def get_many(self, model: str, texts: list[str]) -> list:
+        """Return cached vectors (or None) in the same order as `texts`."""
+        keys = [normalize_text(t, self.lowercase) for t in texts]
+        out = [None] * len(keys)
+        missing = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._items.get((model, key))
+                if vec is not None:
+                    self._items.move_to_end((model, key))
+                    out[i] = vec
+                    self.hits += 1
+                else:
+                    missing.append(i)
+
+            if missing and self._db is not None:
+                for i in missing:
+                    row = self._db.execute(
+                        "SELECT vec FROM embeddings WHERE model = ? AND text_key = ?",
+                        (model, keys[i]),
+                    ).fetchone()
+                    if row:
+                        vec = array("f", row[0]).tolist()
+                        self._put_locked((model, keys[i]), vec)
+                        out[i] = vec
+                        self.disk_hits += 1
+
+            self.misses += sum(1 for i in missing if out[i] is None)
+
+        return out
+
+    # ----------------------------------------------------
+    # INSERT
+    # ----------------------------------------------------
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]):
+        rows = []
+        with self._lock:
+            for text, vec in zip(texts, vectors):
+                key = normalize_text(text, self.lowercase)
+                self._put_locked((model, key), vec)
+                rows.append((model, key, array("f", vec).tobytes()))
+
+            if self._db is not None and rows:
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (model, text_key, vec) VALUES (?, ?, ?)",
+                        rows,
+                    )
+                    self._db.commit()
+                    self._disk_rows += len(rows)   # upper bound: replaced keys don't add rows
+                    self._trim_disk_locked()
+                except sqlite3.Error as e:
+                    print(f"[EMBED CACHE DISK ERROR] {e}")
+
+    def _trim_disk_locked(self):
+        if self._disk_rows <= self.max_disk_rows:
+            return
+        self._disk_rows = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._disk_rows - self.max_disk_rows
+        if excess > 0:
+            # INSERT OR REPLACE gives a rewritten key a fresh rowid, so rowid order is write order
+            self._db.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)",
+                (excess,),
+            )
+            self._db.commit()
+            self._disk_rows = self.max_disk_rows
+
+    def _put_locked(self, key, vec):
+        self._items[key] = vec
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    # ----------------------------------------------------
+    # INTROSPECTION
+    # ----------------------------------------------------
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_items": self.max_items,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "disk_path": self.disk_path if self._db is not None else None,
+            "disk_rows": self._disk_rows if self._db is not None else None,
+            "max_disk_rows": self.max_disk_rows,
+        }
@@ -0,0 +1,287 @@
+# backend/embeddings.py
+# Process-wide embedding service: one SentenceTransformer shared by RAG + memory
+
+import os
+import sys
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+from backend.embedding_cache import EmbeddingCache
+from backend.startup import lazy_resource, timed
+
+# ----------------------------------------------------
+# CONFIG
+# ----------------------------------------------------
+MODEL_NAME = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBED_DEVICE = os.getenv("EMBED_DEVICE", "").strip() or None   # None → auto (cpu/cuda)
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0") or 0)      # 0 → torch default
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64") or 64)
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096") or 4096)
+# Micro-batching of single-text encodes (concurrent sessions): wait up to
+# EMBED_BATCH_WAIT_MS for up to EMBED_MICROBATCH_SIZE queries, then one forward pass
+EMBED_MICROBATCH = os.getenv("EMBED_MICROBATCH", "1") == "1"
+EMBED_MICROBATCH_SIZE = int(os.getenv("EMBED_MICROBATCH_SIZE", "32") or 32)
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "3") or 3)
+
+# On-disk cache tier: set EMBED_CACHE_DB="" to keep the cache in memory only
+if os.path.exists("/mount/data"):
+    _default_cache_db = "/mount/data/embedding_cache.db"              # Streamlit Cloud
+else:
+    _default_cache_db = os.path.join(os.getcwd(), "local_data", "embedding_cache.db")
+EMBED_CACHE_DB = os.getenv("EMBED_CACHE_DB", _default_cache_db).strip() or None
+EMBED_CACHE_DB_ROWS = int(os.getenv("EMBED_CACHE_DB_ROWS", "100000") or 100000)
+
+# Cache keys are lowercased only for models with an uncased tokenizer
+_UNCASED_MODELS = {
+    "sentence-transformers/all-MiniLM-L6-v2",
+    "sentence-transformers/all-MiniLM-L12-v2",
+    "sentence-transformers/paraphrase-MiniLM-L6-v2",
+}
+EMBED_CACHE_LOWERCASE = MODEL_NAME in _UNCASED_MODELS or "uncased" in MODEL_NAME.lower()
+
+_stats = {
+    "model": MODEL_NAME,
+    "device": None,
+    "threads": None,
+    "load_time_s": None,
+    "rss_before_load_mb": None,
+    "rss_after_load_mb": None,
+    "model_params_mb": None,
+}
+
+
+# ----------------------------------------------------
+# HELPERS
+# ----------------------------------------------------
+def _rss_mb():
+    """Current resident set size of this process in MB (None if unknown)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, KB on Linux
+        return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+    except Exception:
+        return None
+
+
+@lazy_resource("embedding_cache")
+def _cache():
+    # Opened on first lookup, not at import: importing the module touches no files
+    if EMBED_CACHE_DB:
+        os.makedirs(os.path.dirname(EMBED_CACHE_DB) or ".", exist_ok=True)
+    return EmbeddingCache(
+        max_items=EMBED_CACHE_SIZE,
+        disk_path=EMBED_CACHE_DB,
+        max_disk_rows=EMBED_CACHE_DB_ROWS,
+        lowercase=EMBED_CACHE_LOWERCASE,
+    )
+
+
+@lazy_resource("embedding_model")
+def _model():
+    with timed("import:sentence_transformers"):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+    if EMBED_THREADS > 0:
+        torch.set_num_threads(EMBED_THREADS)
+
+    rss_before = _rss_mb()
+    t0 = time.perf_counter()
+    model = SentenceTransformer(MODEL_NAME, device=EMBED_DEVICE)
+    load_time = time.perf_counter() - t0
+
+    n_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+
+    _stats.update(
+        device=str(model.device),
+        threads=torch.get_num_threads(),
+        load_time_s=round(load_time, 3),
+        rss_before_load_mb=rss_before,
+        rss_after_load_mb=_rss_mb(),
+        model_params_mb=round(n_bytes / (1024 * 1024), 1),
+    )
+    return model
+
+
+# ----------------------------------------------------
+# PUBLIC API
+# ----------------------------------------------------
+def get_model():
+    """Return the shared SentenceTransformer, loading it on first use."""
+    return _model.get()
+
+
+def _encode_uncached(texts: list[str], batch_size: int) -> list[list[float]]:
+    vectors = get_model().encode(
+        list(texts),
+        batch_size=batch_size,
+        show_progress_bar=False,
+        convert_to_numpy=True,
+    )
+    return vectors.tolist()
+
+
+def encode_many(
+    texts: list[str],
+    batch_size: int = EMBED_BATCH_SIZE,
+    use_cache: bool = True,
+) -> list[list[float]]:
+    """
+    Embed a batch of texts in one forward pass per `batch_size` items.
+    Cached texts are served from the LRU/disk cache; only misses hit the model.
+    Pass use_cache=False for bulk jobs (index builds) that would flush the LRU.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    if not use_cache:
+        return _encode_uncached(texts, batch_size)
+
+    cache = _cache.get()
+    out = cache.get_many(MODEL_NAME, texts)
+    missing = [i for i, v in enumerate(out) if v is None]
+    if missing:
+        # Identical texts in one call are encoded once
+        todo = list(dict.fromkeys(texts[i] for i in missing))
+        fresh = dict(zip(todo, _encode_uncached(todo, batch_size)))
+        cache.put_many(MODEL_NAME, todo, [fresh[t] for t in todo])
+        for i in missing:
+            out[i] = fresh[texts[i]]
+    return out
+
+
+# ----------------------------------------------------
+# MICRO-BATCHING
+# ----------------------------------------------------
+class MicroBatcher:
+    """
+    Collects single-text encode requests from many threads and runs them as
+    one batched encode: a worker thread takes the first waiting request, then
+    gathers more for up to max_wait_ms or max_batch items (no wait for a lone
+    request when the scheduler is idle).
+    submit(text) returns a concurrent.futures.Future with the vector.
+    """
+
+    def __init__(self, encode_fn, max_batch: int = EMBED_MICROBATCH_SIZE, max_wait_ms: float = EMBED_BATCH_WAIT_MS):
+        self.encode_fn = encode_fn            # list[str] → list[vector]
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._last_size = 0
+        self._batches = 0
+        self._items = 0
+        self._sizes = deque(maxlen=500)       # texts per batch
+        self._waits_ms = deque(maxlen=500)    # submit → batch start, per text
+        self._encode_ms = deque(maxlen=500)   # forward pass, per batch
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embed-microbatch", daemon=True)
+                self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        # A lone request while idle runs at once; the wait window only applies under load
+        if self._queue.empty() and self._last_size <= 1:
+            return batch
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            self._last_size = len(batch)
+            if not batch:
+                continue
+            t0 = time.perf_counter()
+            # Identical texts in one window (same question from several students) are encoded once
+            texts = list(dict.fromkeys(text for text, _, _ in batch))
+            try:
+                vectors = dict(zip(texts, self.encode_fn(texts)))
+            except Exception as e:
+                print(f"[EMBED BATCH ERROR] {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for text, future, _ in batch:
+                future.set_result(vectors[text])
+
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._sizes.append(len(texts))
+                self._waits_ms.extend((t0 - submitted) * 1000 for _, _, submitted in batch)
+                self._encode_ms.append((time.perf_counter() - t0) * 1000)
+
+    def stats(self) -> dict:
+        """Batch sizes and wait-window times over the last 500 batches."""
+        with self._lock:
+            sizes = sorted(self._sizes)
+            waits = sorted(self._waits_ms)
+            encode_ms = list(self._encode_ms)
+            batches, items = self._batches, self._items
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": round(self.max_wait_s * 1000, 2),
+            "batches": batches,
+            "items": items,
+            "queued": self._queue.qsize(),
+            "mean_batch": round(sum(sizes) / len(sizes), 2) if sizes else None,
+            "p50_batch": sizes[len(sizes) // 2] if sizes else None,
+            "max_batch_seen": sizes[-1] if sizes else None,
+            "p50_wait_ms": round(waits[len(waits) // 2], 3) if waits else None,
+            "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else None,
+            "mean_encode_ms": round(sum(encode_ms) / len(encode_ms), 3) if encode_ms else None,
+        }
+
+
+batcher = MicroBatcher(lambda texts: _encode_uncached(texts, EMBED_BATCH_SIZE))
+
+
+def encode(text: str) -> list[float]:
+    """Embed a single text (cache first; misses are micro-batched with concurrent callers)."""
+    if not EMBED_MICROBATCH:
+        return encode_many([text])[0]
+    cache = _cache.get()
+    vector = cache.get_many(MODEL_NAME, [text])[0]
+    if vector is None:
+        vector = batcher.submit(text).result()
+        cache.put_many(MODEL_NAME, [text], [vector])
+    return vector
+
+
+def stats() -> dict:
+    """Load time, device and memory footprint of the embedding service."""
+    out = dict(_stats)
+    out["loaded"] = _model.loaded
+    out["rss_mb"] = _rss_mb()
+    out["cache"] = _cache.get().stats()
+    out["microbatch"] = dict(batcher.stats(), enabled=EMBED_MICROBATCH)
+    return out
@@ -0,0 +1,233 @@
+# backend/graph_async.py
+# Async version of the assistant graph:
+#   - memory recall and routing run concurrently
+#   - web search can start speculatively next to RAG (cancelled when RAG is good enough)
+#   - blocking embedding / Chroma / HTTP calls run on a dedicated thread pool
+
+import os
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import HumanMessage, AIMessage
+from langgraph.graph import StateGraph, END
+
+from backend.graph_ml_assistant import (
+    GraphState,
+    _llm_teacher,
+    _answer_is_cacheable,
+    _cache_context,
+    _format_memories,
+    _prompt_history,
+    _record_llm_tokens,
+    _memory_to_store,
+    _rag_prompt,
+    _web_prompt,
+    _general_prompt,
+)
+from backend.answer_cache import answer_cache
+from backend.tools_rag import retrieve, format_context, rag_is_sufficient
+from backend.tools_web import aweb_search
+from backend.router_agent import aclassify_query
+from backend.quiz_agent import generate_quiz
+from backend.memory import recall_memory, store_memory
+from backend.history import build_window
+from backend import tracing
+from backend.startup import lazy_resource
+from backend.streaming import astream_reply
+
+ASYNC_BLOCKING_WORKERS = int(os.getenv("ASYNC_BLOCKING_WORKERS", "8"))
+# Speculative web search next to RAG:
+#   "score" (default) → start it as soon as the dense scores come back marginal/low
+#   "1"/"always"      → start it together with RAG (costs a Tavily call per RAG turn)
+#   "0"               → only after RAG turned out insufficient
+SPECULATIVE_WEB = os.getenv("SPECULATIVE_WEB", "score").strip().lower()
+
+_blocking_pool = ThreadPoolExecutor(
+    max_workers=ASYNC_BLOCKING_WORKERS,
+    thread_name_prefix="assistant-blocking",
+)
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Run a blocking call (embedding, Chroma, HTTP) on the shared thread pool.
+    The caller's contextvars go along, so LangChain callbacks (token streaming) still apply.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_blocking_pool, ctx.run, functools.partial(fn, *args, **kwargs))
+
+
+# -------------------------------------------------------
+# Nodes
+# -------------------------------------------------------
+async def _recall(state: GraphState) -> str:
+    messages = state.get("messages") or []
+    if not messages or not isinstance(messages[-1], HumanMessage):
+        return ""
+    recalled = await run_blocking(
+        recall_memory, messages[-1].content, k=3, user_id=state.get("user_id")
+    )
+    return _format_memories(recalled)
+
+
+async def prepare_node(state: GraphState) -> GraphState:
+    """history + memory_retriever + router, concurrently (they are independent)."""
+    last_input = state["messages"][-1].content
+    (window, history), memory, route_info = await asyncio.gather(
+        run_blocking(
+            build_window,
+            state["messages"],
+            user_id=state.get("user_id"),
+            chat_id=state.get("chat_id"),
+        ),
+        _recall(state),
+        aclassify_query(last_input),
+    )
+    state["window"], state["history"] = window, history
+    state["memory"] = memory
+    state["route"] = route_info.get("type")
+    state["chapter"] = route_info.get("chapter")
+    return state
+
+
+async def _ateacher_answer(state: GraphState, system_msg, cache_route, ctx: str = "") -> GraphState:
+    question = state["messages"][-1].content
+    cacheable = cache_route is not None and _answer_is_cacheable(state)
+    if cacheable:
+        ctx = _cache_context(state, ctx)
+        with tracing.span("answer_cache"):
+            cached = await run_blocking(answer_cache.lookup, question, cache_route, ctx)
+        tracing.annotate(answer_cache="miss" if cached is None else "hit")
+        if cached is not None:
+            state["messages"].append(AIMessage(content=cached))
+            return state
+    elif cache_route is not None:
+        answer_cache.bypass()
+        tracing.annotate(answer_cache="bypass")
+
+    prompt = [system_msg] + _prompt_history(state)
+    with tracing.span("llm"):
+        result = await _llm_teacher.get().ainvoke(prompt)
+    _record_llm_tokens(prompt, result)
+    if cacheable:
+        await run_blocking(answer_cache.store, question, cache_route, ctx, result.content)
+    state["messages"].append(result)
+    return state
+
+
+async def teacher_rag_or_web_anode(state: GraphState) -> GraphState:
+    user_msg = state["messages"][-1].content
+    loop = asyncio.get_running_loop()
+    web_tasks = []
+
+    def start_web():
+        if not web_tasks:
+            web_tasks.append(asyncio.ensure_future(aweb_search(user_msg, max_results=5)))
+
+    def on_score(top_similarity, confidence):
+        # Called on the blocking pool, right after the dense query; scheduled
+        # before run_blocking's result, so start_web() has run when retrieve returns
+        if confidence != "high":
+            loop.call_soon_threadsafe(start_web)
+
+    if SPECULATIVE_WEB in ("1", "always"):
+        start_web()
+
+    with tracing.span("course_docs_search"):
+        result = await run_blocking(
+            retrieve,
+            user_msg,
+            on_score=on_score if SPECULATIVE_WEB == "score" else None,
+            chapter=state.get("chapter"),
+        )
+        rag_context = await run_blocking(format_context, result)
+    tracing.annotate(
+        top_similarity=result["top_similarity"],
+        confidence=result["confidence"],
+        rag_scope=next(iter(result["scope"].values())) if result["scope"] else "all",
+    )
+    if rag_is_sufficient(result):
+        tracing.annotate(source="rag")
+        for task in web_tasks:
+            task.cancel()
+        return await _ateacher_answer(state, *_rag_prompt(state, rag_context))
+
+    # --- WEB FALLBACK ---
+    tracing.annotate(source="web")
+    with tracing.span("web_search", speculative=bool(web_tasks)):
+        if web_tasks:
+            web = await web_tasks[0]
+        else:
+            web = await aweb_search(user_msg, max_results=5)
+    return await _ateacher_answer(state, *_web_prompt(state, web))
+
+
+async def teacher_general_anode(state: GraphState) -> GraphState:
+    return await _ateacher_answer(state, *_general_prompt(state))
+
+
+async def quiz_anode(state: GraphState) -> GraphState:
+    quiz = await run_blocking(generate_quiz, chapter=state.get("chapter"), n_questions=5)
+    state["messages"].append(AIMessage(content=quiz))
+    return state
+
+
+async def memory_writer_anode(state: GraphState) -> GraphState:
+    text = _memory_to_store(state)
+    if text:
+        await run_blocking(store_memory, text, user_id=state.get("user_id"))
+    return state
+
+
+# -------------------------------------------------------
+# Graph
+# -------------------------------------------------------
+def build_async_graph():
+    builder = StateGraph(GraphState)
+
+    def add_node(name, fn, final=False):
+        builder.add_node(name, tracing.traced_node(name, fn, final=final))
+
+    add_node("prepare", prepare_node)
+    add_node("teacher_rag_or_web", teacher_rag_or_web_anode)
+    add_node("teacher_general", teacher_general_anode)
+    add_node("quiz", quiz_anode)
+    add_node("memory_writer", memory_writer_anode, final=True)
+
+    builder.set_entry_point("prepare")
+    builder.add_conditional_edges(
+        "prepare",
+        lambda state: state.get("route"),
+        {
+            "rag_query": "teacher_rag_or_web",
+            "general_explanation": "teacher_general",
+            "quiz_request": "quiz",
+        },
+    )
+
+    builder.add_edge("teacher_rag_or_web", "memory_writer")
+    builder.add_edge("teacher_general", "memory_writer")
+    builder.add_edge("quiz", "memory_writer")
+    builder.add_edge("memory_writer", END)
+
+    return builder.compile()
+
+
+_async_graph_app = lazy_resource("async_graph_app")(build_async_graph)
+
+
+def get_async_graph():
+    return _async_graph_app.get()
+
+
+async def ainvoke(state: GraphState) -> GraphState:
+    """One assistant turn on the async graph."""
+    return await get_async_graph().ainvoke(state)
+
+
+def astream_turn(state: GraphState, holder: dict):
+    """Async generator of reply tokens for one turn; final state in holder["state"]."""
+    return astream_reply(get_async_graph(), state, holder)
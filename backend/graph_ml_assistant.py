@@ -2,6 +2,8 @@
 
 import os
 import sys
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 
 from typing_extensions import TypedDict
@@ -12,7 +14,6 @@ from langchain_core.messages import (
     AIMessage,
     SystemMessage,
 )
-from langchain_groq import ChatGroq
 from langgraph.graph import StateGraph, END
 
 # Ensure project root is on path
@@ -20,11 +21,16 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
-from backend.tools_rag import course_docs_search
+from backend.tools_rag import retrieve, format_context, rag_is_sufficient
 from backend.tools_web import web_search
 from backend.router_agent import classify_query
 from backend.quiz_agent import generate_quiz
 from backend.memory import recall_memory, store_memory
+from backend.history import build_window, count_tokens, message_tokens
+from backend import tracing
+from backend.answer_cache import answer_cache, context_key, ANSWER_CACHE_ENABLED
+from backend.startup import lazy_resource, timed
+from backend.streaming import stream_reply
 
 
 class GraphState(TypedDict, total=False):
@@ -32,12 +38,94 @@ class GraphState(TypedDict, total=False):
     route: Optional[str]
     chapter: Optional[str]
     memory: Optional[str]
+    user_id: Optional[str]
+    chat_id: Optional[str]
+    window: Optional[List[AnyMessage]]   # history actually sent to the teacher (see backend/history.py)
+    history: Optional[dict]              # token report for this turn
+    trace_id: Optional[str]              # see backend/tracing.py
 
 
-llm_teacher = ChatGroq(
-    model="llama-3.1-8b-instant",
-    temperature=0.3,
-)
+@lazy_resource("llm_teacher")
+def _llm_teacher():
+    with timed("import:langchain_groq"):
+        from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model="llama-3.1-8b-instant",
+        temperature=0.3,
+    )
+
+
+def _answer_is_cacheable(state: GraphState) -> bool:
+    """
+    Cached answers are not reused when per-user memory shaped the reply.
+    Earlier turns are fine: they are part of the cache key (see _cache_context).
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return False
+    messages = state.get("messages", [])
+    return not state.get("memory") and bool(messages) and isinstance(messages[-1], HumanMessage)
+
+
+def _cache_context(state: GraphState, ctx: str) -> str:
+    """
+    Answer-cache context key: the grounding context plus the history window sent
+    before the question (summary + earlier turns). A first turn keeps the bare
+    context, so standalone questions still share entries across chats.
+    """
+    earlier = _prompt_history(state)[:-1]
+    if not earlier:
+        return ctx
+    return context_key([ctx] + [f"{m.type}:{m.content}" for m in earlier])
+
+
+def _teacher_answer(state: GraphState, system_msg: SystemMessage, cache_route: str | None, ctx: str = "") -> GraphState:
+    """
+    Answer with llm_teacher, going through the semantic answer cache when allowed.
+    cache_route=None never caches (e.g. degraded answers while web search is down).
+    """
+    question = state["messages"][-1].content
+    cacheable = cache_route is not None and _answer_is_cacheable(state)
+    if cacheable:
+        ctx = _cache_context(state, ctx)
+        with tracing.span("answer_cache"):
+            cached = answer_cache.lookup(question, cache_route, ctx)
+        tracing.annotate(answer_cache="miss" if cached is None else "hit")
+        if cached is not None:
+            state["messages"].append(AIMessage(content=cached))
+            return state
+    elif cache_route is not None:
+        answer_cache.bypass()
+        tracing.annotate(answer_cache="bypass")
+
+    prompt = [system_msg] + _prompt_history(state)
+    with tracing.span("llm"):
+        result = _llm_teacher.get().invoke(prompt)
+    _record_llm_tokens(prompt, result)
+    if cacheable:
+        answer_cache.store(question, cache_route, ctx, result.content)
+    state["messages"].append(result)
+    return state
+
+
+def _record_llm_tokens(prompt: list, result):
+    """Tokens in/out for the trace: provider usage when reported, else the history estimate."""
+    usage = getattr(result, "usage_metadata", None) or {}
+    tracing.count("tokens_in", usage.get("input_tokens") or sum(message_tokens(m) for m in prompt))
+    tracing.count("tokens_out", usage.get("output_tokens") or count_tokens(result.content))
+
+
+def _prompt_history(state: GraphState) -> list:
+    return state.get("window") or state["messages"]
+
+
+def history_node(state: GraphState) -> GraphState:
+    state["window"], state["history"] = build_window(
+        state.get("messages") or [],
+        user_id=state.get("user_id"),
+        chat_id=state.get("chat_id"),
+    )
+    return state
 
 
 def router_node(state: GraphState) -> GraphState:
@@ -59,26 +147,30 @@ def memory_retriever_node(state: GraphState) -> GraphState:
         state["memory"] = ""
         return state
 
-    recalled = recall_memory(last_msg.content, k=3)
-    if recalled:
-        memory_text = "\n".join(f"- {m}" for m in recalled)
-        state["memory"] = f"Relevant long-term memories:\n{memory_text}"
-    else:
-        state["memory"] = ""
-
+    state["memory"] = _format_memories(
+        recall_memory(last_msg.content, k=3, user_id=state.get("user_id"))
+    )
     return state
 
 
-def memory_writer_node(state: GraphState) -> GraphState:
+def _format_memories(recalled: list[str]) -> str:
+    if not recalled:
+        return ""
+    memory_text = "\n".join(f"- {m}" for m in recalled)
+    return f"Relevant long-term memories:\n{memory_text}"
+
+
+def _memory_to_store(state: GraphState) -> Optional[str]:
+    """Text the memory writer should persist for this turn (None → nothing)."""
     messages = state.get("messages", [])
     if len(messages) < 2:
-        return state
+        return None
 
     last_ai = messages[-1]
     last_user = messages[-2]
 
     if not isinstance(last_ai, AIMessage) or not isinstance(last_user, HumanMessage):
-        return state
+        return None
 
     user_text = last_user.content.lower()
     ai_text = last_ai.content
@@ -90,20 +182,25 @@ def memory_writer_node(state: GraphState) -> GraphState:
         for t in explicit_triggers:
             cleaned = cleaned.replace(t, "")
         cleaned = cleaned.strip()
-        if cleaned:
-            store_memory(cleaned)
-        return state
+        return cleaned or None
 
     if len(ai_text) > 200:
-        store_memory(ai_text)
+        return ai_text
 
+    return None
+
+
+def memory_writer_node(state: GraphState) -> GraphState:
+    text = _memory_to_store(state)
+    if text:
+        store_memory(text, user_id=state.get("user_id"))
     return state
 
 
 def _rag_is_useful(rag_text: str) -> bool:
     """
-    Heuristic to decide if RAG has enough information.
-    Adjust as needed.
+    Heuristic to decide if RAG has enough information (text only).
+    The teacher nodes use the score-based tools_rag.rag_is_sufficient instead.
     """
     if not rag_text:
         return False
@@ -128,35 +225,27 @@ def _rag_is_useful(rag_text: str) -> bool:
     return True
 
 
-def teacher_rag_or_web_node(state: GraphState) -> GraphState:
-    """
-    Primary path for course-related questions:
-    1) Try RAG from course docs
-    2) If insufficient → fallback to online web search
-    """
-    user_msg = state["messages"][-1].content
+# -------------------------------------------------------
+# Teacher prompts (shared by the sync nodes and backend.graph_async)
+# Each returns (system message, answer-cache route or None, cache context key)
+# -------------------------------------------------------
+def _rag_prompt(state: GraphState, rag_context: str):
     memory_context = state.get("memory", "") or ""
+    system_content = (
+        "You are a Machine Learning course assistant.\n"
+        "Answer using the COURSE EXCERPTS provided.\n"
+        "If the excerpts do not contain enough info, say so briefly.\n\n"
+    )
+    if memory_context:
+        system_content += f"{memory_context}\n\n"
+    system_content += f"COURSE EXCERPTS:\n{rag_context}\n"
 
-    rag_context = course_docs_search.invoke(user_msg)
-    use_rag = _rag_is_useful(rag_context)
-
-    if use_rag:
-        system_content = (
-            "You are a Machine Learning course assistant.\n"
-            "Answer using the COURSE EXCERPTS provided.\n"
-            "If the excerpts do not contain enough info, say so briefly.\n\n"
-        )
-        if memory_context:
-            system_content += f"{memory_context}\n\n"
-        system_content += f"COURSE EXCERPTS:\n{rag_context}\n"
-        system_msg = SystemMessage(content=system_content)
+    # The excerpts are a deterministic rendering of the retrieved chunks
+    return SystemMessage(content=system_content), "rag_query", context_key([rag_context])
 
-        result = llm_teacher.invoke([system_msg] + state["messages"])
-        state["messages"].append(result)
-        return state
 
-    # --- WEB FALLBACK ---
-    web = web_search(user_msg, max_results=5)
+def _web_prompt(state: GraphState, web: dict):
+    memory_context = state.get("memory", "") or ""
 
     if not web["ok"]:
         system_content = (
@@ -166,10 +255,7 @@ def teacher_rag_or_web_node(state: GraphState) -> GraphState:
         )
         if memory_context:
             system_content += f"{memory_context}\n\n"
-        system_msg = SystemMessage(content=system_content)
-        result = llm_teacher.invoke([system_msg] + state["messages"])
-        state["messages"].append(result)
-        return state
+        return SystemMessage(content=system_content), None, ""
 
     sources_block = "\n".join(
         f"- {r['title']} ({r['url']})\n  {r['content']}"
@@ -187,13 +273,11 @@ def teacher_rag_or_web_node(state: GraphState) -> GraphState:
         system_content += f"{memory_context}\n\n"
     system_content += f"WEB SOURCES:\n{sources_block}\n"
 
-    system_msg = SystemMessage(content=system_content)
-    result = llm_teacher.invoke([system_msg] + state["messages"])
-    state["messages"].append(result)
-    return state
+    ctx = context_key(r["url"] for r in web["results"] if r.get("url"))
+    return SystemMessage(content=system_content), "web", ctx
 
 
-def teacher_general_node(state: GraphState) -> GraphState:
+def _general_prompt(state: GraphState):
     memory_context = state.get("memory", "") or ""
 
     content = (
@@ -205,10 +289,51 @@ def teacher_general_node(state: GraphState) -> GraphState:
         content += "\nHere is long-term memory about this student or past sessions:\n"
         content += memory_context
 
-    system_msg = SystemMessage(content=content)
-    result = llm_teacher.invoke([system_msg] + state["messages"])
-    state["messages"].append(result)
-    return state
+    return SystemMessage(content=content), "general_explanation", ""
+
+
+# Web search started while RAG is still running (marginal / low retrieval score)
+_prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="web-prefetch")
+
+
+def teacher_rag_or_web_node(state: GraphState) -> GraphState:
+    """
+    Primary path for course-related questions:
+    1) Try RAG from course docs
+    2) If the retrieval scores are too weak → fallback to online web search
+       (prefetched as soon as the dense scores are known)
+    """
+    user_msg = state["messages"][-1].content
+    prefetch = []
+
+    def on_score(top_similarity, confidence):
+        if confidence != "high" and not prefetch:
+            ctx = contextvars.copy_context()
+            prefetch.append(_prefetch_pool.submit(ctx.run, web_search, user_msg, 5))
+
+    with tracing.span("course_docs_search"):
+        result = retrieve(user_msg, on_score=on_score, chapter=state.get("chapter"))
+        rag_context = format_context(result)
+    tracing.annotate(
+        top_similarity=result["top_similarity"],
+        confidence=result["confidence"],
+        rag_scope=next(iter(result["scope"].values())) if result["scope"] else "all",
+    )
+    if rag_is_sufficient(result):
+        tracing.annotate(source="rag")
+        if prefetch:
+            prefetch[0].cancel()
+        return _teacher_answer(state, *_rag_prompt(state, rag_context))
+
+    # --- WEB FALLBACK ---
+    tracing.annotate(source="web")
+    with tracing.span("web_search", prefetched=bool(prefetch)):
+        web = prefetch[0].result() if prefetch else web_search(user_msg, max_results=5)
+    return _teacher_answer(state, *_web_prompt(state, web))
+
+
+def teacher_general_node(state: GraphState) -> GraphState:
+    return _teacher_answer(state, *_general_prompt(state))
 
 
 def quiz_node(state: GraphState) -> GraphState:
@@ -222,17 +347,23 @@ def quiz_node(state: GraphState) -> GraphState:
 def build_graph():
     builder = StateGraph(GraphState)
 
-    builder.add_node("memory_retriever", memory_retriever_node)
-    builder.add_node("router", router_node)
+    def add_node(name, fn, final=False):
+        # Every node is a span of the turn's trace; the last one closes it
+        builder.add_node(name, tracing.traced_node(name, fn, final=final))
+
+    add_node("history", history_node)
+    add_node("memory_retriever", memory_retriever_node)
+    add_node("router", router_node)
 
     # NOTE: this node now handles BOTH: RAG + web fallback
-    builder.add_node("teacher_rag_or_web", teacher_rag_or_web_node)
+    add_node("teacher_rag_or_web", teacher_rag_or_web_node)
 
-    builder.add_node("teacher_general", teacher_general_node)
-    builder.add_node("quiz", quiz_node)
-    builder.add_node("memory_writer", memory_writer_node)
+    add_node("teacher_general", teacher_general_node)
+    add_node("quiz", quiz_node)
+    add_node("memory_writer", memory_writer_node, final=True)
 
-    builder.set_entry_point("memory_retriever")
+    builder.set_entry_point("history")
+    builder.add_edge("history", "memory_retriever")
     builder.add_edge("memory_retriever", "router")
 
     builder.add_conditional_edges(
@@ -253,4 +384,21 @@ def build_graph():
     return builder.compile()
 
 
-graph_app = build_graph()
+_graph_app = lazy_resource("graph_app")(build_graph)
+
+
+def stream_turn(state: GraphState, holder: dict):
+    """
+    Run one turn and yield the reply as LLM tokens arrive (teacher / quiz nodes).
+    The final state (full reply included) ends up in holder["state"].
+    """
+    return stream_reply(_graph_app.get(), state, holder)
+
+
+def __getattr__(name):
+    # `graph_app` / `llm_teacher` are built on first access, not at import time
+    if name == "graph_app":
+        return _graph_app.get()
+    if name == "llm_teacher":
+        return _llm_teacher.get()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
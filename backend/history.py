@@ -0,0 +1,178 @@
+# backend/history.py
+# Token-budgeted chat history for the teacher prompts:
+#   - the newest turns are kept verbatim within HISTORY_TOKEN_BUDGET
+#   - older turns are folded into a rolling summary, cached per chat in chat_store
+#     and extended incrementally (only the newly folded turns are summarized)
+
+import os
+import threading
+from collections import deque
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from backend import chat_store
+from backend.startup import lazy_resource, timed
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+# When the window overflows, fold down to this fraction of the budget, so the
+# summary is extended every few turns instead of on every turn
+HISTORY_FOLD_TARGET = float(os.getenv("HISTORY_FOLD_TARGET", "0.6"))
+HISTORY_SUMMARY_WORDS = int(os.getenv("HISTORY_SUMMARY_WORDS", "200"))
+# Rough Llama-3 ratio for English text; per-message overhead for role markers
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_SYSTEM = (
+    "You maintain a running summary of a tutoring conversation between a student "
+    "and a Machine Learning course assistant.\n"
+    f"Update the summary with the new turns. Keep it under {HISTORY_SUMMARY_WORDS} words.\n"
+    "Keep: topics covered, what the student asked and struggled with, facts the "
+    "student shared about themselves, and conclusions reached.\n"
+    "Return only the updated summary."
+)
+
+_turns = deque(maxlen=500)     # (tokens in full history, tokens sent) per turn
+_lock = threading.Lock()
+_summaries_made = 0
+
+
+@lazy_resource("history_llm")
+def _history_llm():
+    with timed("import:langchain_groq"):
+        from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model="llama-3.1-8b-instant",
+        temperature=0.0,
+    )
+
+
+# -------------------------------------------------------
+# Token counting
+# -------------------------------------------------------
+def count_tokens(text: str) -> int:
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+def message_tokens(message) -> int:
+    return count_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS
+
+
+# -------------------------------------------------------
+# Windowing
+# -------------------------------------------------------
+def _window_start(messages: list, costs: list[int], budget: int, floor: int = 0) -> int:
+    """
+    Index of the oldest message kept verbatim: as many of the newest messages
+    as fit in `budget` (the last message always), starting on a user turn.
+    """
+    start = len(messages) - 1
+    used = costs[start]
+    while start > floor and used + costs[start - 1] <= budget:
+        start -= 1
+        used += costs[start]
+    while start < len(messages) - 1 and not isinstance(messages[start], HumanMessage):
+        start += 1
+    return start
+
+
+def _render(messages: list) -> str:
+    return "\n".join(
+        f"{'Student' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}"
+        for m in messages
+    )
+
+
+def summarize(previous: str | None, messages: list) -> str:
+    """Extend `previous` (may be None) with `messages`; one LLM call."""
+    prompt = f"CURRENT SUMMARY:\n{previous or '(none yet)'}\n\nNEW TURNS:\n{_render(messages)}"
+    result = _history_llm.get().invoke(
+        [SystemMessage(content=SUMMARY_SYSTEM), HumanMessage(content=prompt)]
+    )
+    return result.content.strip()
+
+
+def summary_message(summary: str) -> SystemMessage:
+    return SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+
+
+def build_window(
+    messages: list,
+    user_id: str | None = None,
+    chat_id: str | None = None,
+    budget: int = HISTORY_TOKEN_BUDGET,
+):
+    """
+    Returns (window, report):
+      window — messages to send after the system prompt: an optional summary
+               message followed by the newest turns
+      report — {"full_tokens", "sent_tokens", "saved_tokens", "summarized"}
+
+    `messages[i]` must be the chat's message with seq i (app.py passes the whole
+    chat), which is what the cached summary's upto_seq refers to. Without a
+    chat id nothing is cached, and older turns are dropped instead of summarized.
+    """
+    global _summaries_made
+
+    if not messages:
+        return [], {"full_tokens": 0, "sent_tokens": 0, "saved_tokens": 0, "summarized": False}
+
+    costs = [message_tokens(m) for m in messages]
+    full = sum(costs)
+    keyed = bool(user_id and chat_id)
+
+    summary, upto = chat_store.get_summary(user_id, chat_id) if keyed else (None, 0)
+    if upto >= len(messages):
+        # Stale summary (history was shorter than what it covers): ignore it
+        summary, upto = None, 0
+
+    summarized = False
+    summary_cost = count_tokens(summary) + MESSAGE_OVERHEAD_TOKENS if summary else 0
+
+    if sum(costs[upto:]) + summary_cost > budget:
+        target = int(budget * HISTORY_FOLD_TARGET) - summary_cost
+        start = _window_start(messages, costs, max(target, 0), floor=upto)
+
+        if keyed and start > upto:
+            try:
+                summary = summarize(summary, messages[upto:start])
+                chat_store.save_summary(user_id, chat_id, summary, start)
+                summarized = True
+                with _lock:
+                    _summaries_made += 1
+            except Exception as e:
+                # Keep the previous summary; the turns in between are just dropped this time
+                print(f"[HISTORY ERROR] {e}")
+        upto = start
+
+    window = messages[upto:]
+    if summary:
+        window = [summary_message(summary)] + window
+
+    sent = sum(message_tokens(m) for m in window)
+    report = {
+        "full_tokens": full,
+        "sent_tokens": sent,
+        "saved_tokens": max(0, full - sent),
+        "summarized": summarized,
+    }
+    with _lock:
+        _turns.append((full, sent))
+    return window, report
+
+
+def stats() -> dict:
+    """Token savings over the last 500 turns."""
+    with _lock:
+        turns = list(_turns)
+        summaries = _summaries_made
+    full = sum(t[0] for t in turns)
+    sent = sum(t[1] for t in turns)
+    return {
+        "turns": len(turns),
+        "full_tokens": full,
+        "sent_tokens": sent,
+        "saved_tokens": max(0, full - sent),
+        "saved_pct": round(100 * (full - sent) / full, 1) if full else 0.0,
+        "summaries": summaries,
+    }
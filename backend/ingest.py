@@ -0,0 +1,197 @@
+# backend/ingest.py
+# Parallel slide extraction (PPTX/PDF) feeding the vector index directly
+# (replaces preprocess_pptx.ipynb)
+#
+#   python -m backend.ingest                  # extract changed decks + sync the index
+#   python -m backend.ingest --no-index       # extract only (writes processed_texts/)
+#   python -m backend.ingest --force          # re-extract every deck
+
+import os
+import sys
+import io
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend import build_index
+
+# Folder locations
+INPUT_DIR = os.path.join(PROJECT_ROOT, "course_materials")   # where the PPTX/PDF slides live
+OUTPUT_DIR = build_index.TEXT_DIR                              # extracted text (optional copy)
+MANIFEST_PATH = os.path.join(build_index.DB_DIR, "ingest_manifest.json")
+
+EXTENSIONS = (".pptx", ".pdf")
+
+
+# ----------------------------
+# Extraction (runs in worker processes)
+# ----------------------------
+def iter_pptx_text(path):
+    """Yield the text of every shape, slide by slide."""
+    from pptx import Presentation
+
+    prs = Presentation(path)
+    for slide in prs.slides:
+        for shape in slide.shapes:
+            if hasattr(shape, "text"):
+                yield shape.text + "\n"
+
+
+def iter_pdf_text(path):
+    """Yield the text of every page."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    for page in reader.pages:
+        yield (page.extract_text() or "") + "\n"
+
+
+def extract_text(path: str) -> str:
+    # Stream pieces into one buffer instead of repeated `text += ...`
+    pieces = iter_pptx_text(path) if path.lower().endswith(".pptx") else iter_pdf_text(path)
+    buf = io.StringIO()
+    for piece in pieces:
+        buf.write(piece)
+    return buf.getvalue()
+
+
+def _extract_worker(path: str):
+    return os.path.basename(path), extract_text(path)
+
+
+# ----------------------------
+# Change detection
+# ----------------------------
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def text_name(filename: str) -> str:
+    """Name of the extracted document, e.g. 9_CLOUD_AI_Intro.pptx → 9_CLOUD_AI_Intro.txt."""
+    return os.path.splitext(filename)[0] + ".txt"
+
+
+def scan_sources(input_dir: str, manifest: dict, force: bool = False):
+    """
+    Split source decks into (changed, unchanged, fingerprints).
+    Same mtime + size → unchanged without reading; otherwise the content hash decides.
+    """
+    changed, unchanged, fingerprints = [], [], {}
+    for filename in sorted(os.listdir(input_dir)):
+        if not filename.lower().endswith(EXTENSIONS):
+            continue
+        path = os.path.join(input_dir, filename)
+        st = os.stat(path)
+        prev = manifest.get(filename, {})
+
+        if not force and prev.get("mtime") == st.st_mtime and prev.get("size") == st.st_size:
+            fingerprints[filename] = prev
+            unchanged.append(filename)
+            continue
+
+        digest = _file_sha256(path)
+        fingerprints[filename] = {"mtime": st.st_mtime, "size": st.st_size, "sha256": digest}
+        if not force and prev.get("sha256") == digest:
+            unchanged.append(filename)
+        else:
+            changed.append(filename)
+    return changed, unchanged, fingerprints
+
+
+# ----------------------------
+# Pipeline
+# ----------------------------
+def run(
+    input_dir: str = INPUT_DIR,
+    index: bool = True,
+    write_texts: bool = True,
+    force: bool = False,
+    workers: int | None = None,
+) -> dict:
+    t0 = time.perf_counter()
+    manifest = build_index.load_manifest(MANIFEST_PATH)
+
+    changed, unchanged, fingerprints = scan_sources(input_dir, manifest, force=force)
+
+    # Decks deleted from input_dir: drop their generated text too, or the
+    # processed_texts/ pass below would index them again as text-only decks
+    removed = sorted(f for f in manifest if f not in fingerprints)
+    for filename in removed:
+        path = os.path.join(OUTPUT_DIR, text_name(filename))
+        if os.path.exists(path):
+            os.remove(path)
+            print(f" ✕ {filename} removed → deleted {text_name(filename)}")
+
+    # Unchanged decks are kept in the index by name; a deck the index does not
+    # know yet (e.g. after --no-index or a model change) has to be re-extracted
+    if index:
+        indexed = build_index.indexed_documents()
+        changed += [f for f in unchanged if text_name(f) not in indexed]
+        unchanged = [f for f in unchanged if text_name(f) in indexed]
+
+    documents = {}
+    if changed:
+        print(f"Extracting {len(changed)} deck(s) ...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_extract_worker, os.path.join(input_dir, f)) for f in changed]
+            for fut in as_completed(futures):
+                filename, text = fut.result()
+                name = text_name(filename)
+                documents[name] = text
+                print(f" → {filename} ({len(text)} chars)")
+
+                if write_texts:
+                    os.makedirs(OUTPUT_DIR, exist_ok=True)
+                    with open(os.path.join(OUTPUT_DIR, name), "w", encoding="utf-8") as f:
+                        f.write(text)
+
+    kept = {text_name(f) for f in unchanged}
+
+    stats = {"extracted": sorted(changed), "skipped": len(unchanged), "removed": removed}
+    if index:
+        # Text-only decks (no PPTX/PDF source) still come from processed_texts/
+        sourced = {text_name(f) for f in fingerprints}
+        if os.path.isdir(OUTPUT_DIR):
+            for name, text in build_index.load_documents(OUTPUT_DIR).items():
+                if name not in sourced:
+                    documents[name] = text
+        stats["index"] = build_index.sync_index(documents, keep=kept)
+
+    build_index.save_manifest(fingerprints, MANIFEST_PATH)
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    print(
+        f"✅ Ingest done: {len(changed)} extracted, {len(unchanged)} unchanged, "
+        f"{len(removed)} removed ({stats['seconds']}s)"
+    )
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract course slides and sync the vector DB.")
+    parser.add_argument("--input-dir", default=INPUT_DIR)
+    parser.add_argument("--no-index", action="store_true", help="only extract, do not touch the vector DB")
+    parser.add_argument("--no-write-texts", action="store_true", help="do not write processed_texts/*.txt")
+    parser.add_argument("--force", action="store_true", help="re-extract every deck")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    run(
+        input_dir=args.input_dir,
+        index=not args.no_index,
+        write_texts=not args.no_write_texts,
+        force=args.force,
+        workers=args.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
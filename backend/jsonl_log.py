@@ -0,0 +1,126 @@
+# backend/jsonl_log.py
+# Append-only JSONL logs (router decisions, traces) written off the request path,
+# with size-based rotation
+
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+
+_writers = []
+
+
+class JsonlWriter:
+    """
+    Background appender for JSONL files: write(path, record) queues the record
+    and returns; a daemon thread appends whatever is queued in one open per file.
+    A file that has reached `max_bytes` is renamed to <path>.1 (replacing the
+    previous .1) before the next append, so a log never takes more than about
+    2 × max_bytes on disk. max_bytes=0 disables rotation.
+    """
+
+    def __init__(self, name: str, max_bytes: int, error_tag: str, batch_size: int = 256):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.error_tag = error_tag
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+        self.rotations = 0
+        _writers.append(self)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def write(self, path: str | None, record: dict):
+        if not path:
+            return
+        self._ensure_thread()
+        self._queue.put((path, record))
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            by_path = {}
+            for path, record in batch:
+                by_path.setdefault(path, []).append(record)
+            try:
+                for path, records in by_path.items():
+                    try:
+                        self._append(path, records)
+                    except (OSError, TypeError, ValueError) as e:
+                        self.failed += len(records)
+                        print(f"[{self.error_tag}] {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _append(self, path: str, records: list[dict]):
+        lines = "".join(json.dumps(rec) + "\n" for rec in records)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if self.max_bytes and os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+            os.replace(path, path + ".1")
+            self.rotations += 1
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(lines)
+        self.written += len(records)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until everything queued so far is on disk (False on timeout)."""
+        if self._thread is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "written": self.written,
+            "failed": self.failed,
+            "rotations": self.rotations,
+            "pending": self._queue.unfinished_tasks,
+        }
+
+
+def read_jsonl(path: str, rotated: bool = True):
+    """Records of a JSONL log, oldest first (including <path>.1 when `rotated`); bad lines are skipped."""
+    for p in ([path + ".1"] if rotated else []) + [path]:
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+
+
+@atexit.register
+def _flush_on_exit():
+    for writer in _writers:
+        if not writer.flush(timeout=5):
+            print(f"[{writer.error_tag}] pending records not written before exit")
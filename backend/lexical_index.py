@@ -0,0 +1,134 @@
+# backend/lexical_index.py
+# Compact in-memory BM25 index over the course chunks + reciprocal-rank fusion
+
+import re
+import math
+from array import array
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    """
+    a an and are as at be by can could did do does explain for from how i in is it
+    me of on or please tell that the this to was what when where which who why will
+    with you your about describe difference between give show mean means
+    """.split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Inverted index with array-backed postings:
+        term id → array('I') of doc positions + array('I') of term frequencies
+    Documents are kept alongside so lexical hits can be returned without Chroma.
+    """
+
+    def __init__(self, ids, documents, metadatas=None, k1: float = 1.5, b: float = 0.75):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas) if metadatas else [{} for _ in self.ids]
+        self.k1 = k1
+        self.b = b
+
+        self.vocab = {}                 # term → term id
+        self.post_docs = []             # term id → array('I') of doc positions
+        self.post_tfs = []              # term id → array('I') of term frequencies
+        self.doc_len = array("I")
+
+        for pos, doc in enumerate(self.documents):
+            counts = {}
+            tokens = tokenize(doc)
+            for tok in tokens:
+                counts[tok] = counts.get(tok, 0) + 1
+            self.doc_len.append(len(tokens))
+            for tok, tf in counts.items():
+                tid = self.vocab.get(tok)
+                if tid is None:
+                    tid = self.vocab[tok] = len(self.post_docs)
+                    self.post_docs.append(array("I"))
+                    self.post_tfs.append(array("I"))
+                self.post_docs[tid].append(pos)
+                self.post_tfs[tid].append(tf)
+
+        n = len(self.documents)
+        self.avgdl = (sum(self.doc_len) / n) if n else 0.0
+        self.idf = array(
+            "d",
+            (math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for p in self.post_docs),
+        )
+
+    def __len__(self):
+        return len(self.documents)
+
+    def query_terms(self, query: str) -> list[str]:
+        """Content terms of the query (stopwords dropped, order kept, deduplicated)."""
+        return list(dict.fromkeys(t for t in tokenize(query) if t not in STOPWORDS))
+
+    def positions(self, where: dict) -> set[int]:
+        """Doc positions whose metadata equals every key/value of `where`."""
+        return {
+            pos for pos, meta in enumerate(self.metadatas)
+            if all((meta or {}).get(key) == value for key, value in where.items())
+        }
+
+    def search(
+        self, query: str, k: int = 5, terms: list[str] | None = None, allowed: set[int] | None = None
+    ) -> list[tuple[int, float]]:
+        """Top-k (doc position, BM25 score), best first; `allowed` restricts the candidate positions."""
+        terms = self.query_terms(query) if terms is None else terms
+        scores = {}
+        k1, b, avgdl = self.k1, self.b, self.avgdl or 1.0
+        for term in terms:
+            tid = self.vocab.get(term)
+            if tid is None:
+                continue
+            idf = self.idf[tid]
+            for pos, tf in zip(self.post_docs[tid], self.post_tfs[tid]):
+                if allowed is not None and pos not in allowed:
+                    continue
+                norm = k1 * (1 - b + b * self.doc_len[pos] / avgdl)
+                scores[pos] = scores.get(pos, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]
+
+    def contains_all(self, pos: int, terms: list[str]) -> bool:
+        doc_terms = set(tokenize(self.documents[pos]))
+        return all(t in doc_terms for t in terms)
+
+    def confident_search(
+        self, query: str, k: int = 5, max_terms: int = 3, max_df: float = 0.05, allowed: set[int] | None = None
+    ):
+        """
+        Lexical-only fast path for short keyword queries ("LSTM", "YOLO", "CAP theorem").
+        Returns hits only when every content term is a rare course term (in at
+        most a `max_df` fraction of the chunks) and every returned chunk
+        contains all of them; otherwise None. The hits are only lexical
+        matches: callers still have to judge their relevance.
+        """
+        terms = self.query_terms(query)
+        if not terms or len(terms) > max_terms:
+            return None
+        df_cap = max(1, int(len(self) * max_df))
+        for term in terms:
+            tid = self.vocab.get(term)
+            if tid is None or len(self.post_docs[tid]) > df_cap:
+                return None
+
+        hits = self.search(query, k=k, terms=terms, allowed=allowed)
+        if len(hits) < min(k, len(self) if allowed is None else len(allowed)):
+            return None
+        if not all(self.contains_all(pos, terms) for pos, _ in hits):
+            return None
+        return hits
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[str]:
+    """Fuse several best-first id lists: score(id) = Σ 1 / (k + rank)."""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
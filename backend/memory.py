@@ -2,8 +2,17 @@
 # Streamlit Cloud + Local SAFE long-term memory storage using ChromaDB
 
 import os
-import chromadb
-from sentence_transformers import SentenceTransformer
+import time
+import queue
+import atexit
+import hashlib
+import threading
+
+import numpy as np
+
+from backend import embeddings, tracing
+from backend.embedding_cache import normalize_text
+from backend.startup import lazy_resource, timed
 
 # ----------------------------------------------------
 # ENV DETECTION (Cloud vs Local)
@@ -15,61 +24,372 @@ else:
 
 os.makedirs(MEMORY_DIR, exist_ok=True)
 
+# Writes go through a background queue (set MEMORY_WRITE_BEHIND=0 to write inline)
+MEMORY_WRITE_BEHIND = os.getenv("MEMORY_WRITE_BEHIND", "1") == "1"
+MEMORY_BATCH_SIZE = int(os.getenv("MEMORY_BATCH_SIZE", "16"))
+MEMORY_FLUSH_INTERVAL_S = float(os.getenv("MEMORY_FLUSH_INTERVAL_S", "1.0"))
+# A new memory this similar (cosine) to a stored one is not stored again
+MEMORY_DEDUP_THRESHOLD = float(os.getenv("MEMORY_DEDUP_THRESHOLD", "0.95"))
+
+# Per-user bounds: least recently recalled memories go first
+MEMORY_MAX_PER_USER = int(os.getenv("MEMORY_MAX_PER_USER", "200"))
+MEMORY_TTL_DAYS = float(os.getenv("MEMORY_TTL_DAYS", "90"))     # since last recall (or creation)
+
 # ----------------------------------------------------
-# EMBEDDING MODEL
+# MIGRATION (memories stored before per-user partitioning)
 # ----------------------------------------------------
-_model = SentenceTransformer("all-MiniLM-L6-v2")
+# Written once the store has been checked, so the scan runs on first open only
+_PARTITIONED_MARKER = os.path.join(MEMORY_DIR, ".user_partitioned")
+
+
+def quarantine_unpartitioned(collection, quarantine) -> int:
+    """
+    Move memories without a user_id into `quarantine`. No user's filter matches
+    them and eviction never reaches them, but their owner is unknown, so they
+    are kept aside rather than deleted. Returns the number moved.
+    """
+    found = collection.get(include=["metadatas"])
+    legacy = [
+        mem_id for mem_id, meta in zip(found["ids"], found["metadatas"])
+        if "user_id" not in (meta or {})
+    ]
+    if not legacy:
+        return 0
+
+    rows = collection.get(ids=legacy, include=["documents", "embeddings", "metadatas"])
+    now = time.time()
+    quarantine.upsert(
+        ids=rows["ids"],
+        documents=rows["documents"],
+        embeddings=rows["embeddings"],
+        metadatas=[dict(meta or {}, quarantined=now) for meta in rows["metadatas"]],
+    )
+    collection.delete(ids=rows["ids"])
+    return len(rows["ids"])
+
 
 # ----------------------------------------------------
 # CHROMADB CLIENT (PERSISTENT & WRITABLE)
 # ----------------------------------------------------
-chroma = chromadb.PersistentClient(path=MEMORY_DIR)
+@lazy_resource("memory_collection")
+def _memory_collection():
+    with timed("import:chromadb"):
+        import chromadb
+
+    chroma = chromadb.PersistentClient(path=MEMORY_DIR)
+    collection = chroma.get_or_create_collection(
+        name="long_term_memory",
+        metadata={"hnsw:space": "cosine"},
+    )
+    if not os.path.exists(_PARTITIONED_MARKER):
+        try:
+            quarantine = chroma.get_or_create_collection(
+                name="long_term_memory_legacy",
+                metadata={"hnsw:space": "cosine"},
+            )
+            moved = quarantine_unpartitioned(collection, quarantine)
+            if moved:
+                print(f"[MEMORY] Moved {moved} memories without a user_id to 'long_term_memory_legacy'")
+            with open(_PARTITIONED_MARKER, "w") as f:
+                f.write(f"{time.time()}\n")
+        except Exception as e:
+            print(f"[MEMORY WRITE ERROR] migration of unpartitioned memories failed: {e}")
+    return collection
+
+
+def get_memory_collection():
+    return _memory_collection.get()
+
+
+def __getattr__(name):
+    # Backwards compatibility: `from backend.memory import memory_collection`
+    if name == "memory_collection":
+        return get_memory_collection()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-memory_collection = chroma.get_or_create_collection(
-    name="long_term_memory",
-    metadata={"hnsw:space": "cosine"},
-)
 
 # ----------------------------------------------------
 # HELPERS
 # ----------------------------------------------------
 def _embed(text: str):
-    return _model.encode([text])[0].tolist()
+    return embeddings.encode(text)
+
+
+def memory_id(text: str, user_id: str | None = None) -> str:
+    """Content-hash id: the same text of the same user gets the same id in every process."""
+    key = f"{user_id or ''}\0{normalize_text(text, lowercase=True)}"
+    return "mem-" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def _user_filter(user_id: str | None) -> dict:
+    # Memories are partitioned by user; "" is the partition for callers without a user
+    return {"user_id": user_id or ""}
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    m = np.asarray(vectors, dtype=np.float32)
+    return m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+
+
+def _novel(user_id: str | None, texts: list[str], vectors: list) -> list[int]:
+    """
+    Indices of texts that are not near-duplicates of a memory already stored
+    for this user or of an earlier text in the same batch (cosine ≥ MEMORY_DEDUP_THRESHOLD).
+    """
+    stored_sim = [0.0] * len(texts)
+    collection = get_memory_collection()
+    try:
+        if collection.count():                       # nothing stored yet: nothing to compare with
+            res = collection.query(
+                query_embeddings=vectors,
+                n_results=1,
+                where=_user_filter(user_id),
+                include=["distances"],
+            )
+            for i, dists in enumerate(res.get("distances") or []):
+                if dists:
+                    stored_sim[i] = 1.0 - dists[0]   # cosine space: distance = 1 - similarity
+    except Exception as e:
+        # Only in-batch duplicates are caught for this batch
+        print(f"[MEMORY ERROR] near-duplicate check against stored memories failed: {e}")
+
+    unit = _unit_rows(vectors)
+    keep = []
+    for i in range(len(texts)):
+        if stored_sim[i] >= MEMORY_DEDUP_THRESHOLD:
+            continue
+        if keep and float(np.max(unit[keep] @ unit[i])) >= MEMORY_DEDUP_THRESHOLD:
+            continue
+        keep.append(i)
+    return keep
 
 
 # ----------------------------------------------------
-# STORE MEMORY (WRITE)
+# STORE MEMORY (WRITE) + EVICTION
 # ----------------------------------------------------
-def store_memory(text: str) -> bool:
-    if not text or not text.strip():
-        return False
+def write_memories(texts: list[str], user_id: str | None = None) -> int:
+    """Embed, deduplicate and upsert one user's batch synchronously. Returns the number stored."""
+    by_id = {}
+    for text in texts:
+        if text and text.strip():
+            by_id.setdefault(memory_id(text, user_id), text)
+    if not by_id:
+        return 0
 
     try:
-        memory_collection.add(
-            embeddings=[_embed(text)],
-            documents=[text],
-            ids=[str(abs(hash(text)))[:16]],
-        )
-        return True
+        ids = list(by_id)
+        docs = [by_id[i] for i in ids]
+        vectors = embeddings.encode_many(docs, use_cache=False)
+        keep = _novel(user_id, docs, vectors)
+        if keep:
+            now = time.time()
+            meta = {"user_id": user_id or "", "created": now, "last_recalled": now}
+            get_memory_collection().upsert(
+                ids=[ids[i] for i in keep],
+                documents=[docs[i] for i in keep],
+                embeddings=[vectors[i] for i in keep],
+                metadatas=[dict(meta) for _ in keep],
+            )
+        return len(keep)
     except Exception as e:
         # Never crash the app because of memory
         print(f"[MEMORY WRITE ERROR] {e}")
+        return 0
+
+
+def touch_memories(ids: list[str], ts: float | None = None):
+    """Mark memories as recalled now (they move to the back of the eviction order)."""
+    if not ids:
+        return
+    ts = ts or time.time()
+    try:
+        collection = get_memory_collection()
+        found = collection.get(ids=list(ids), include=["metadatas"])
+        if found["ids"]:
+            collection.update(
+                ids=found["ids"],
+                metadatas=[dict(m or {}, last_recalled=ts) for m in found["metadatas"]],
+            )
+    except Exception as e:
+        print(f"[MEMORY WRITE ERROR] {e}")
+
+
+def evict_memories(
+    user_id: str | None,
+    max_items: int = MEMORY_MAX_PER_USER,
+    ttl_days: float = MEMORY_TTL_DAYS,
+) -> int:
+    """Drop a user's memories not recalled within the TTL, then the least recently recalled over capacity."""
+    try:
+        collection = get_memory_collection()
+        found = collection.get(where=_user_filter(user_id), include=["metadatas"])
+        entries = sorted(
+            zip(found["ids"], found["metadatas"]),
+            key=lambda e: (e[1] or {}).get("last_recalled", 0.0),
+            reverse=True,
+        )
+        cutoff = time.time() - ttl_days * 86400
+        drop = [
+            mem_id for rank, (mem_id, meta) in enumerate(entries)
+            if rank >= max_items or (meta or {}).get("last_recalled", 0.0) < cutoff
+        ]
+        if drop:
+            collection.delete(ids=drop)
+        return len(drop)
+    except Exception as e:
+        print(f"[MEMORY WRITE ERROR] {e}")
+        return 0
+
+
+class MemoryWriter:
+    """
+    Write-behind queue: store_memory() / recall touches return immediately and
+    a daemon thread writes in batches of up to `batch_size`, waiting at most
+    `interval_s` to fill one. Users that got new memories are evicted down to
+    their capacity after each batch.
+    """
+
+    def __init__(self, batch_size: int = MEMORY_BATCH_SIZE, interval_s: float = MEMORY_FLUSH_INTERVAL_S):
+        self.batch_size = batch_size
+        self.interval_s = interval_s
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.evicted = 0
+        self.batches = 0
+        self.failed = 0
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, text: str, user_id: str | None = None):
+        self._ensure_thread()
+        self.enqueued += 1
+        self._queue.put(("store", user_id, text))
+
+    def submit_touch(self, ids: list[str]):
+        self._ensure_thread()
+        self._queue.put(("touch", None, list(ids)))
+
+    def _write_batch(self, batch: list):
+        texts_by_user = {}
+        touched = []
+        for kind, user_id, payload in batch:
+            if kind == "store":
+                texts_by_user.setdefault(user_id, []).append(payload)
+            else:
+                touched.extend(payload)
+
+        touch_memories(list(dict.fromkeys(touched)))
+        for user_id, texts in texts_by_user.items():
+            stored = write_memories(texts, user_id)
+            self.written += stored
+            if stored:
+                self.evicted += evict_memories(user_id)
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.interval_s
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._write_batch(batch)
+                self.batches += 1
+            except Exception as e:
+                # One bad batch must not kill the writer thread
+                self.failed += len(batch)
+                print(f"[MEMORY WRITE ERROR] batch of {len(batch)} dropped: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until everything queued so far is written (False on timeout)."""
+        if self._thread is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "evicted": self.evicted,
+            "batches": self.batches,
+            "failed": self.failed,
+            "pending": self._queue.unfinished_tasks,
+        }
+
+
+writer = MemoryWriter()
+
+
+@atexit.register
+def _flush_on_exit():
+    if not writer.flush(timeout=10):
+        print("[MEMORY WRITE ERROR] pending memories not written before exit")
+
+
+def store_memory(text: str, user_id: str | None = None) -> bool:
+    """Queue `text` for this user's long-term memory (written inline if MEMORY_WRITE_BEHIND=0)."""
+    if not text or not text.strip():
         return False
+    if not MEMORY_WRITE_BEHIND:
+        stored = write_memories([text], user_id)
+        if stored:
+            evict_memories(user_id)
+        return stored > 0
+    writer.submit(text, user_id)
+    return True
 
 
 # ----------------------------------------------------
 # RECALL MEMORY (READ)
 # ----------------------------------------------------
-def recall_memory(query: str, k: int = 3) -> list[str]:
+def recall_memory(query: str, k: int = 3, user_id: str | None = None) -> list[str]:
+    """Top-k memories of this user only (the `where` filter keeps the scan to their partition)."""
     if not query or not query.strip():
         return []
 
     try:
-        results = memory_collection.query(
-            query_embeddings=[_embed(query)],
-            n_results=k,
-        )
+        query_embedding = _embed(query)
+        with tracing.span("memory_query"):
+            results = get_memory_collection().query(
+                query_embeddings=[query_embedding],
+                n_results=k,
+                where=_user_filter(user_id),
+            )
         docs = results.get("documents", [[]])
+        ids = results.get("ids", [[]])
+        if ids and ids[0]:
+            # last_recalled drives eviction; updated off the request path
+            if MEMORY_WRITE_BEHIND:
+                writer.submit_touch(ids[0])
+            else:
+                touch_memories(ids[0])
         return docs[0] if docs and docs[0] else []
     except Exception as e:
         print(f"[MEMORY READ ERROR] {e}")
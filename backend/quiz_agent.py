@@ -1,42 +1,106 @@
-from multiprocessing import pool
 import json, random, os
-from langchain_groq import ChatGroq
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
 from langchain_core.messages import SystemMessage, HumanMessage
 
+from backend.startup import lazy_resource, timed
+
 DISCUSSION_PATH = os.path.join(
     os.path.dirname(__file__), "..", "course_materials", "discussion_topics.json"
 )
 
-with open(DISCUSSION_PATH, "r", encoding="utf-8") as f:
-    TOPICS = json.load(f)
+# Pre-generated quiz variants per (chapter, n_questions), refilled in the background
+QUIZ_CACHE_ENABLED = os.getenv("QUIZ_CACHE", "1") == "1"
+QUIZ_VARIANTS = int(os.getenv("QUIZ_VARIANTS", "3"))
+QUIZ_POOL_WORKERS = int(os.getenv("QUIZ_POOL_WORKERS", "2"))
+# Fill every chapter at warm-up (one LLM call per variant per chapter)
+QUIZ_PREWARM = os.getenv("QUIZ_PREWARM", "0") == "1"
+
+_topics_mtime = None
+_topics_lock = threading.Lock()
+
+
+def _check_topics_fresh():
+    """Reload topics (+ index, + quiz cache) when discussion_topics.json changed on disk."""
+    global _topics_mtime
+    try:
+        mtime = os.path.getmtime(DISCUSSION_PATH)
+    except OSError:
+        return
+    if mtime == _topics_mtime:
+        return
+    with _topics_lock:
+        if mtime == _topics_mtime:
+            return
+        if _topics_mtime is not None:
+            _topics.reset()
+            _chapter_index.reset()
+            quiz_cache.invalidate()
+        _topics_mtime = mtime
+
+
+@lazy_resource("quiz_topics")
+def _topics():
+    with open(DISCUSSION_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-quiz_llm = ChatGroq(
-    model="llama-3.1-8b-instant",
-    temperature=0.4,
-)
 
-def generate_quiz(chapter=None, n_questions=5):
+def get_topics() -> list[dict]:
+    _check_topics_fresh()
+    return _topics.get()
+
+
+def chapter_of(topic_id: str, depth: int) -> str:
+    return ".".join(str(topic_id).split(".")[:depth])
+
+
+@lazy_resource("quiz_chapter_index")
+def _chapter_index():
     """
-    Create a quiz from discussion topics.
-    chapter="1" gives all 1.x topics.
-    chapter="1.3" gives only topic 1.3.
+    chapter → topics in file order, for every dotted prefix of every id:
+    "1" → 1.1, 1.2, ... (not 10.x); "12.1" → only 12.1 (not 12.10).
     """
-    pool = TOPICS
+    index = defaultdict(list)
+    for t in _topics.get():
+        parts = str(t["id"]).split(".")
+        for depth in range(1, len(parts) + 1):
+            index[".".join(parts[:depth])].append(t)
+    return dict(index)
 
-    if chapter:
-        pool = [t for t in TOPICS if t["id"].startswith(chapter)]
 
-    if not pool:
-        return f"No topics found for chapter {chapter}"
+def topics_for_chapter(chapter) -> list[dict]:
+    _check_topics_fresh()
+    return _chapter_index.get().get(str(chapter).strip().strip("."), [])
 
-    if chapter:
-        # keep all topics for that chapter, do NOT sample or shuffle
-        chosen = pool  
-    else:
-        # random quiz when no chapter specified
-        chosen = random.sample(pool, min(n_questions, len(pool)))
+
+def chapters() -> list[str]:
+    """Top-level chapters, in file order."""
+    return list(dict.fromkeys(chapter_of(t["id"], 1) for t in get_topics()))
+
+
+@lazy_resource("quiz_llm")
+def _quiz_llm():
+    with timed("import:langchain_groq"):
+        from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model="llama-3.1-8b-instant",
+        temperature=0.4,
+    )
+
+
+def __getattr__(name):
+    # Backwards compatibility: TOPICS / quiz_llm used to be module globals
+    if name == "TOPICS":
+        return _topics.get()
+    if name == "quiz_llm":
+        return _quiz_llm.get()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
+def _quiz_from_topics(chosen: list[dict]) -> str:
     topic_block = "\n\n".join([f"{t['id']} | {t['question']}" for t in chosen])
 
     system = SystemMessage(
@@ -66,4 +130,130 @@ def generate_quiz(chapter=None, n_questions=5):
 
     human = HumanMessage(content=topic_block)
 
-    return quiz_llm.invoke([system, human]).content
+    return _quiz_llm.get().invoke([system, human]).content
+
+
+def _select_topics(chapter, n_questions):
+    """Topics for one quiz (None when the chapter has none)."""
+    if chapter:
+        # keep all topics for that chapter, do NOT sample or shuffle
+        return topics_for_chapter(chapter) or None
+    # random quiz when no chapter specified
+    pool = get_topics()
+    return random.sample(pool, min(n_questions, len(pool))) or None
+
+
+def _build_quiz(chapter, n_questions) -> str | None:
+    chosen = _select_topics(chapter, n_questions)
+    return _quiz_from_topics(chosen) if chosen else None
+
+
+class QuizCache:
+    """
+    Ready-made quiz variants per (chapter, n_questions). A request takes one
+    variant (so repeated requests get different quizzes) and a background pool
+    tops the key back up to `variants`. A miss (cold key, generated inline by
+    the caller) schedules only one background variant; the key is filled up
+    once it is requested again. invalidate() drops everything, and
+    generations started before it are discarded when they finish.
+    """
+
+    def __init__(self, variants: int = QUIZ_VARIANTS, workers: int = QUIZ_POOL_WORKERS):
+        self.variants = variants
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quiz-cache")
+        self._ready = defaultdict(deque)
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+
+    @staticmethod
+    def key(chapter, n_questions):
+        return (str(chapter).strip().strip(".") if chapter else None, n_questions)
+
+    def take(self, chapter, n_questions) -> str | None:
+        key = self.key(chapter, n_questions)
+        with self._lock:
+            ready = self._ready[key]
+            quiz = ready.popleft() if ready else None
+            if quiz is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        # A one-off request for a chapter shouldn't cost 1 + `variants` LLM calls
+        self.refill(chapter, n_questions, limit=1 if quiz is None else None)
+        return quiz
+
+    def refill(self, chapter, n_questions, limit: int | None = None):
+        """
+        Schedule background generations until the key has `variants` ready or
+        pending (at most `limit` ready or pending, if given).
+        """
+        key = self.key(chapter, n_questions)
+        target = self.variants if limit is None else min(self.variants, limit)
+        with self._lock:
+            missing = target - len(self._ready[key]) - self._pending[key]
+            self._pending[key] += max(0, missing)
+            generation = self._generation
+        for _ in range(max(0, missing)):
+            self._pool.submit(self._fill, key, generation)
+
+    def _fill(self, key, generation):
+        chapter, n_questions = key
+        quiz = None
+        try:
+            quiz = _build_quiz(chapter, n_questions)
+        except Exception as e:
+            print(f"[QUIZ CACHE ERROR] {e}")
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._pending[key] -= 1
+            if quiz:
+                self._ready[key].append(quiz)
+                self.generated += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._ready.clear()
+            self._pending.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "generated": self.generated,
+                "ready": sum(len(v) for v in self._ready.values()),
+                "pending": sum(self._pending.values()),
+            }
+
+
+quiz_cache = QuizCache()
+
+
+def prewarm_quizzes(n_questions: int = 5):
+    """Start filling the cache for every chapter and for the random quiz."""
+    for chapter in [None] + chapters():
+        quiz_cache.refill(chapter, n_questions)
+
+
+def generate_quiz(chapter=None, n_questions=5, use_cache: bool = QUIZ_CACHE_ENABLED):
+    """
+    Create a quiz from discussion topics.
+    chapter="1" gives all 1.x topics.
+    chapter="1.3" gives only topic 1.3.
+    With the quiz cache a pre-generated variant is served when one is ready.
+    """
+    if not (topics_for_chapter(chapter) if chapter else get_topics()):
+        return f"No topics found for chapter {chapter}"
+
+    if use_cache:
+        quiz = quiz_cache.take(chapter, n_questions)
+        if quiz is not None:
+            return quiz
+
+    return _build_quiz(chapter, n_questions)
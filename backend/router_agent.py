@@ -1,16 +1,31 @@
 # backend/router_agent.py
 
 import re
-from langchain_groq import ChatGroq
 from langchain_core.messages import SystemMessage, HumanMessage
 
+from backend import router_local
+from backend.startup import lazy_resource, timed
+
 # -------------------------------------------------------
-# Router LLM (deterministic)
+# Router LLM (deterministic, created on first use)
 # -------------------------------------------------------
-router_llm = ChatGroq(
-    model="llama-3.1-8b-instant",
-    temperature=0.0
-)
+@lazy_resource("router_llm")
+def _router_llm():
+    with timed("import:langchain_groq"):
+        from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model="llama-3.1-8b-instant",
+        temperature=0.0
+    )
+
+
+def __getattr__(name):
+    # Backwards compatibility: `from backend.router_agent import router_llm`
+    if name == "router_llm":
+        return _router_llm.get()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # -------------------------------------------------------
 # Helper — Extract chapter numbers like 1, 2.1, 3.4, etc.
@@ -20,6 +35,20 @@ def extract_chapter(query: str):
     return match.group(1) if match else None
 
 
+# Outside quizzes a bare number is rarely a chapter ("a 3-layer network", "top 5"),
+# so questions only get a chapter when it is named as one
+CHAPTER_REF = re.compile(
+    r"\b(?:chapters?|ch\.?|hoofdstuk|lectures?|lessons?|les|decks?|slides?)\s*#?\s*(\d+(?:\.\d+)?)\b",
+    re.IGNORECASE,
+)
+
+
+def extract_chapter_ref(query: str):
+    """'What does chapter 7 say about attention?' → '7'; 'top 5 models' → None."""
+    match = CHAPTER_REF.search(query)
+    return match.group(1) if match else None
+
+
 # -------------------------------------------------------
 # Helper — Clean LLM output to valid route strings
 # -------------------------------------------------------
@@ -47,6 +76,52 @@ def clean_label(raw: str) -> str:
     return "general_explanation"
 
 
+# -------------------------------------------------------
+# Helpers — rule-based quiz shortcut + LLM prompt
+# -------------------------------------------------------
+QUIZ_KEYWORDS = ["quiz", "questions", "test me", "practice", "exam"]
+
+ROUTER_SYSTEM = SystemMessage(
+    content=(
+        "Classify the user's message strictly as one of:\n"
+        "- rag_query   (asks about course documents/slides)\n"
+        "- general_explanation   (asks for ML explanation)\n\n"
+        "Respond with EXACTLY one label, no numbering, no punctuation."
+    )
+)
+
+
+def _quiz_route(query: str):
+    """QUIZ INTENT (rule-based → fastest + safest); None if not a quiz request."""
+    lower = query.lower()
+    if any(k in lower for k in QUIZ_KEYWORDS):
+        return {"type": "quiz_request", "chapter": extract_chapter(query)}
+    return None
+
+
+def _local_route(query: str):
+    """Embedding fast path → (route dict or None, margin)."""
+    if not router_local.ROUTER_LOCAL_ENABLED:
+        return None, None
+    try:
+        label, margin = router_local.classify(query)
+    except Exception as e:
+        # Never block routing on the fast path; the LLM still decides
+        print(f"[LOCAL ROUTER ERROR] {e}")
+        return None, None
+    if label is None:
+        return None, margin
+    return {"type": label, "chapter": extract_chapter_ref(query)}, margin
+
+
+def _llm_route(query: str, raw_label: str, margin) -> dict:
+    cleaned = clean_label(raw_label)
+    if router_local.ROUTER_LOCAL_ENABLED:
+        # Logged LLM decisions are the training data for the local router
+        router_local.log_decision(query, cleaned, "llm", margin)
+    return {"type": cleaned, "chapter": extract_chapter_ref(query)}
+
+
 # -------------------------------------------------------
 # Main router function (very robust)
 # -------------------------------------------------------
@@ -57,35 +132,43 @@ def classify_query(query: str) -> dict:
             "type": "rag_query" | "general_explanation" | "quiz_request",
             "chapter": "1" | "2.5" | None
         }
+    Quiz requests take any number as the chapter; other questions only an
+    explicit reference ("chapter 7", "lecture 10.3").
     """
 
-    lower = query.lower()
-
     # ---------------------------------------------------
-    # 1) QUIZ INTENT (rule-based → fastest + safest)
+    # 1) QUIZ INTENT
     # ---------------------------------------------------
-    quiz_keywords = ["quiz", "questions", "test me", "practice", "exam"]
-    if any(k in lower for k in quiz_keywords):
-        chapter = extract_chapter(query)
-        return {"type": "quiz_request", "chapter": chapter}
+    quiz = _quiz_route(query)
+    if quiz:
+        return quiz
 
     # ---------------------------------------------------
-    # 2) LLM classification
+    # 2) Local embedding router (confident cases only)
     # ---------------------------------------------------
-    system = SystemMessage(
-        content=(
-            "Classify the user's message strictly as one of:\n"
-            "- rag_query   (asks about course documents/slides)\n"
-            "- general_explanation   (asks for ML explanation)\n\n"
-            "Respond with EXACTLY one label, no numbering, no punctuation."
-        )
-    )
+    local, margin = _local_route(query)
+    if local:
+        return local
 
-    result = router_llm.invoke([system, HumanMessage(content=query)])
+    # ---------------------------------------------------
+    # 3) LLM classification
+    # ---------------------------------------------------
+    result = _router_llm.get().invoke([ROUTER_SYSTEM, HumanMessage(content=query)])
     raw_label = result.content.strip()
 
-    # Clean & normalize
-    cleaned = clean_label(raw_label)
+    # Clean & normalize; always return correct structure
+    return _llm_route(query, raw_label, margin)
+
+
+async def aclassify_query(query: str) -> dict:
+    """Async twin of classify_query (non-blocking router LLM call)."""
+    quiz = _quiz_route(query)
+    if quiz:
+        return quiz
+
+    local, margin = _local_route(query)
+    if local:
+        return local
 
-    # Always return correct structure
-    return {"type": cleaned, "chapter": extract_chapter(query)}
+    result = await _router_llm.get().ainvoke([ROUTER_SYSTEM, HumanMessage(content=query)])
+    return _llm_route(query, result.content.strip(), margin)
@@ -0,0 +1,256 @@
+# backend/router_local.py
+# Local nearest-centroid router over the shared MiniLM embeddings.
+# Decides rag_query vs general_explanation in ~1 ms; classify_query falls back
+# to the router LLM when the margin between the two centroids is too small.
+#
+#   python -m backend.router_local train    # rebuild centroids from seeds + logged LLM decisions
+#   python -m backend.router_local report   # local vs LLM agreement by margin, from the decision log
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend import embeddings
+from backend.jsonl_log import JsonlWriter, read_jsonl
+from backend.startup import lazy_resource
+
+ROUTER_LOCAL_ENABLED = os.getenv("ROUTER_LOCAL", "1") == "1"
+ROUTER_LOCAL_MARGIN = float(os.getenv("ROUTER_LOCAL_MARGIN", "0.08"))
+ROUTER_MAX_COURSE_CHUNKS = 200
+
+if os.path.exists("/mount/data"):
+    _DATA_DIR = "/mount/data"                           # Streamlit Cloud
+else:
+    _DATA_DIR = os.path.join(os.getcwd(), "local_data")  # Local dev
+
+DECISION_LOG = os.getenv("ROUTER_DECISION_LOG", os.path.join(_DATA_DIR, "router_decisions.jsonl"))
+CENTROIDS_PATH = os.getenv("ROUTER_CENTROIDS", os.path.join(_DATA_DIR, "router_centroids.json"))
+# The decision log rotates to <path>.1 at this size (0 = never)
+DECISION_LOG_MAX_BYTES = int(os.getenv("ROUTER_DECISION_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+
+LABELS = ("rag_query", "general_explanation")
+
+# Phrasings that point at the course material itself
+RAG_SEEDS = [
+    "What does the slide say about this topic?",
+    "Summarize lecture 3",
+    "What did the course say about PCA?",
+    "According to the course slides, what is a data lake?",
+    "Which examples were given in the lecture on object detection?",
+    "What is covered in chapter 7 of the course?",
+    "Explain the discussion topic from the course material",
+    "In the slides, how is transfer learning explained?",
+]
+
+# Generic ML explanations, not tied to the course documents
+GENERAL_SEEDS = [
+    "Explain gradient descent",
+    "How does a decision tree work?",
+    "What is the kernel trick?",
+    "Can you give me an intuitive explanation of backpropagation?",
+    "What is the difference between bagging and boosting?",
+    "Explain overfitting with a simple example",
+    "How do I choose the learning rate?",
+    "Why do we normalize input features?",
+    "What is a random forest?",
+    "Explain the bias-variance tradeoff in simple terms",
+    "How does k-means clustering work?",
+    "What is the intuition behind attention in neural networks?",
+    "Hi, can you help me study machine learning?",
+    "Give me an analogy for how neural networks learn",
+]
+
+_log_writer = JsonlWriter("router-log", DECISION_LOG_MAX_BYTES, "ROUTER LOG ERROR")
+
+
+# -------------------------------------------------------
+# Seeds + centroids
+# -------------------------------------------------------
+def _seed_texts() -> dict:
+    """label → source → texts."""
+    from backend.quiz_agent import get_topics
+    from backend.tools_rag import get_lexical_index
+
+    chunks = get_lexical_index().documents
+    step = max(1, len(chunks) // ROUTER_MAX_COURSE_CHUNKS)
+    return {
+        "rag_query": {
+            "seeds": list(RAG_SEEDS),
+            "topics": [t["question"] for t in get_topics()],
+            "chunks": chunks[::step][:ROUTER_MAX_COURSE_CHUNKS],
+        },
+        "general_explanation": {"seeds": list(GENERAL_SEEDS)},
+    }
+
+
+def _logged_examples(path: str | None = None) -> dict:
+    """LLM-labelled queries from the decision log (the local router's training signal)."""
+    out = {label: [] for label in LABELS}
+    for rec in read_jsonl(path or DECISION_LOG):
+        if rec.get("source") == "llm" and rec.get("label") in out:
+            out[rec["label"]].append(rec["query"])
+    return out
+
+
+def _unit(v):
+    return v / max(float(np.linalg.norm(v)), 1e-12)
+
+
+def _centroid(sources: dict):
+    """
+    Mean of the per-source means: 200 course chunks must not outvote the
+    8 hand-written seeds just by being more numerous.
+    """
+    means = []
+    for texts in sources.values():
+        if texts:
+            vecs = np.asarray(embeddings.encode_many(texts, use_cache=False), dtype=np.float32)
+            vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+            means.append(_unit(vecs.mean(axis=0)))
+    return _unit(np.mean(means, axis=0))
+
+
+def train(include_log: bool = True, path: str | None = None) -> dict:
+    path = path or CENTROIDS_PATH
+    texts = _seed_texts()
+    if include_log:
+        for label, queries in _logged_examples().items():
+            texts[label]["logged"] = queries
+
+    centroids = {label: _centroid(texts[label]).tolist() for label in LABELS}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "model": embeddings.MODEL_NAME,
+                "counts": {
+                    label: {source: len(t) for source, t in texts[label].items()}
+                    for label in LABELS
+                },
+                "centroids": centroids,
+            },
+            f,
+        )
+    return {label: np.asarray(c, dtype=np.float32) for label, c in centroids.items()}
+
+
+@lazy_resource("router_centroids")
+def _centroids():
+    try:
+        with open(CENTROIDS_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("model") == embeddings.MODEL_NAME:
+            return {label: np.asarray(data["centroids"][label], dtype=np.float32) for label in LABELS}
+    except (OSError, ValueError, KeyError):
+        pass
+    # First run: build from seeds only and persist, so later processes start warm
+    return train(include_log=False)
+
+
+# -------------------------------------------------------
+# Classification + decision log
+# -------------------------------------------------------
+def log_decision(query: str, label: str, source: str, margin: float | None = None):
+    rec = {
+        "ts": time.time(),
+        "query": query,
+        "label": label,
+        "source": source,
+        "margin": None if margin is None else round(margin, 4),
+    }
+    # Appended by a background thread: routing never waits on the disk
+    _log_writer.write(DECISION_LOG, rec)
+
+
+def scores(query: str) -> dict:
+    vec = np.asarray(embeddings.encode(query), dtype=np.float32)
+    vec /= max(float(np.linalg.norm(vec)), 1e-12)
+    return {label: float(c @ vec) for label, c in _centroids.get().items()}
+
+
+def classify(query: str):
+    """
+    Returns (label, margin). label is None when the margin is below
+    ROUTER_LOCAL_MARGIN and the caller should ask the router LLM.
+    """
+    s = scores(query)
+    margin = s["rag_query"] - s["general_explanation"]
+    if abs(margin) < ROUTER_LOCAL_MARGIN:
+        return None, margin
+    label = "rag_query" if margin > 0 else "general_explanation"
+    log_decision(query, label, "local", margin)
+    return label, margin
+
+
+# -------------------------------------------------------
+# Agreement report
+# -------------------------------------------------------
+def agreement_report(path: str | None = None, margin: float = ROUTER_LOCAL_MARGIN, band: float = 0.02) -> dict:
+    """
+    How often the local router's side of the margin agrees with the LLM.
+    The LLM only labels queries the local router abstained on (|margin| below
+    ROUTER_LOCAL_MARGIN), so agreement is measured per |margin| band inside
+    that range: if the bands just under the threshold agree with the LLM,
+    the threshold can come down; if they don't, it should not.
+    """
+    n_local = 0
+    checked = []                                     # (|margin|, agrees)
+    for rec in read_jsonl(path or DECISION_LOG):
+        if rec.get("source") == "local":
+            n_local += 1
+        elif rec.get("source") == "llm" and rec.get("label") in LABELS and rec.get("margin") is not None:
+            local_label = "rag_query" if rec["margin"] > 0 else "general_explanation"
+            checked.append((abs(rec["margin"]), local_label == rec["label"]))
+
+    bands = []
+    n_bands = max(1, int(np.ceil(margin / band - 1e-9)))
+    for i in range(n_bands):
+        lo, hi = i * band, min(margin, (i + 1) * band)
+        inside = [agrees for m, agrees in checked if lo <= m < hi]
+        bands.append({
+            "margin": f"{lo:.2f}-{hi:.2f}",
+            "n": len(inside),
+            "agreement": round(sum(inside) / len(inside), 3) if inside else None,
+        })
+
+    total = n_local + len(checked)
+    return {
+        "margin": margin,
+        "decisions": total,
+        "local": n_local,
+        "llm": len(checked),
+        "local_share": round(n_local / total, 3) if total else None,
+        "agreement": round(sum(a for _, a in checked) / len(checked), 3) if checked else None,
+        "bands": bands,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local embedding router.")
+    parser.add_argument("command", choices=["train", "report"])
+    parser.add_argument("--no-log", action="store_true", help="train on seed texts only")
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        report = agreement_report()
+        print(json.dumps({k: v for k, v in report.items() if k != "bands"}))
+        print(f"{'|margin|':>12}{'n':>7}{'agree':>8}")
+        for b in report["bands"]:
+            agreement = "-" if b["agreement"] is None else f"{b['agreement']:.3f}"
+            print(f"{b['margin']:>12}{b['n']:>7}{agreement:>8}")
+        return
+
+    train(include_log=not args.no_log)
+    print(f"✅ Router centroids saved → {CENTROIDS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
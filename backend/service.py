@@ -0,0 +1,406 @@
+# backend/service.py
+# Standalone assistant service: one process hosts the (async) graph, warm models
+# and Chroma clients; any number of Streamlit processes talk to it over HTTP.
+#
+#   python -m backend.service                          # http://127.0.0.1:8765
+#   python -m backend.service --socket /tmp/assistant.sock
+#   ASSISTANT_SERVICE_URL=http://127.0.0.1:8765 streamlit run app.py
+#
+# Endpoints (JSON):
+#   POST /turn          {"user_id", "chat_id", "messages": [{"role", "content"}], "stream": bool}
+#                       stream=true → NDJSON lines {"token"} ... then {"done": true, "reply", ...}
+#   GET  /health        queue depth, workers, warm-up state
+#   GET  /metrics       service counters + trace / streaming / history / context stats
+#   GET  /trace/<id>    a finished turn trace (debug panel)
+#
+# Turns go through a bounded queue served by a fixed pool of worker tasks:
+# a full queue answers 503, a user with too many turns in flight answers 429
+# (both with Retry-After).
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend import tracing
+from backend.startup import startup_report, timed, warm_up
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8765"))
+SERVICE_SOCKET = os.getenv("SERVICE_SOCKET", "").strip() or None
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "4"))          # turns running at once
+SERVICE_QUEUE_SIZE = int(os.getenv("SERVICE_QUEUE_SIZE", "32"))   # turns waiting for a worker
+SERVICE_USER_CONCURRENCY = int(os.getenv("SERVICE_USER_CONCURRENCY", "1"))   # queued + running, per user
+SERVICE_TURN_TIMEOUT_S = float(os.getenv("SERVICE_TURN_TIMEOUT_S", "120"))
+RETRY_AFTER_S = 2
+MAX_BODY_BYTES = 2 * 2**20
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    429: "Too Many Requests",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class _Job:
+    """One queued turn; the worker pushes ("token", text) / ("done", dict) / ("error", str) events."""
+
+    def __init__(self, user_id: str, state: dict, stream: bool):
+        self.user_id = user_id
+        self.state = state
+        self.stream = stream
+        self.events = asyncio.Queue()
+        self.enqueued = time.perf_counter()
+
+
+def _to_state(body: dict) -> dict:
+    from langchain_core.messages import HumanMessage, AIMessage
+
+    user_id = body.get("user_id")
+    # Per-user admission limits and memory are keyed on it: no shared "anonymous" bucket
+    if not isinstance(user_id, str) or not user_id.strip():
+        raise ValueError("'user_id' must be a non-empty string")
+    messages = body.get("messages")
+    if not isinstance(messages, list) or not messages:
+        raise ValueError("'messages' must be a non-empty list")
+    return {
+        "user_id": user_id,
+        "chat_id": body.get("chat_id"),
+        "messages": [
+            HumanMessage(content=m["content"]) if m["role"] == "user" else AIMessage(content=m["content"])
+            for m in messages
+        ],
+    }
+
+
+class AssistantService:
+    def __init__(
+        self,
+        workers: int = SERVICE_WORKERS,
+        queue_size: int = SERVICE_QUEUE_SIZE,
+        user_concurrency: int = SERVICE_USER_CONCURRENCY,
+        turn_timeout_s: float = SERVICE_TURN_TIMEOUT_S,
+    ):
+        self.n_workers = workers
+        self.user_concurrency = user_concurrency
+        self.turn_timeout_s = turn_timeout_s
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.in_flight = defaultdict(int)      # user id → queued + running turns
+        self.running = 0
+        self.counters = defaultdict(int)
+        self.queue_wait_ms = []                # last 500 waits
+        self._workers = []
+        self.started = time.time()
+
+    # ----------------------------
+    # Lifecycle
+    # ----------------------------
+    def start(self):
+        self._workers = [
+            asyncio.ensure_future(self._worker(i)) for i in range(self.n_workers)
+        ]
+
+    async def stop(self):
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    # ----------------------------
+    # Admission (backpressure)
+    # ----------------------------
+    def submit(self, job: _Job):
+        """Enqueue a turn; returns None or (status, reason) when it is rejected."""
+        if self.in_flight.get(job.user_id, 0) >= self.user_concurrency:
+            self.counters["rejected_user_limit"] += 1
+            return 429, "too many turns in flight for this user"
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counters["rejected_queue_full"] += 1
+            return 503, "queue full"
+        self.in_flight[job.user_id] += 1
+        self.counters["accepted"] += 1
+        return None
+
+    def _release(self, job: _Job):
+        self.in_flight[job.user_id] -= 1
+        if self.in_flight[job.user_id] <= 0:
+            del self.in_flight[job.user_id]
+
+    # ----------------------------
+    # Workers
+    # ----------------------------
+    async def _worker(self, n: int):
+        while True:
+            job = await self.queue.get()
+            wait_ms = (time.perf_counter() - job.enqueued) * 1000
+            self.queue_wait_ms = self.queue_wait_ms[-499:] + [wait_ms]
+            self.running += 1
+            try:
+                await asyncio.wait_for(self._run(job), timeout=self.turn_timeout_s)
+                self.counters["completed"] += 1
+            except asyncio.TimeoutError:
+                self.counters["timeouts"] += 1
+                await job.events.put(("error", f"turn timed out after {self.turn_timeout_s:.0f}s"))
+            except Exception as e:
+                print(f"[SERVICE ERROR] {e}")
+                self.counters["errors"] += 1
+                await job.events.put(("error", str(e)))
+            finally:
+                self.running -= 1
+                self._release(job)
+                self.queue.task_done()
+
+    async def _run(self, job: _Job):
+        from backend import graph_async
+
+        holder = {}
+        if job.stream:
+            async for text in graph_async.astream_turn(job.state, holder):
+                await job.events.put(("token", text))
+            result = holder["state"]
+        else:
+            result = await graph_async.ainvoke(job.state)
+        await job.events.put((
+            "done",
+            {
+                "done": True,
+                "reply": result["messages"][-1].content,
+                "route": result.get("route"),
+                "trace_id": result.get("trace_id"),
+            },
+        ))
+
+    # ----------------------------
+    # Stats
+    # ----------------------------
+    def health(self) -> dict:
+        report = startup_report()
+        return {
+            "status": "ok",
+            "workers": self.n_workers,
+            "running": self.running,
+            "queued": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "warm": bool(report["loaded"]) and all(report["loaded"].values()),
+            "uptime_s": round(time.time() - self.started, 1),
+        }
+
+    def metrics(self) -> dict:
+        from backend import context, embeddings, history, streaming
+
+        waits = sorted(self.queue_wait_ms)
+        return {
+            "service": {
+                **self.health(),
+                "counters": dict(self.counters),
+                "users_in_flight": len(self.in_flight),
+                "queue_wait_ms": {
+                    "p50": round(waits[len(waits) // 2], 2) if waits else None,
+                    "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2) if waits else None,
+                },
+            },
+            "trace": tracing.metrics.snapshot(),
+            "first_token": streaming.first_token_stats(),
+            "history": history.stats(),
+            "context": context.stats(),
+            "embedding_batches": embeddings.batcher.stats(),
+        }
+
+    # ----------------------------
+    # HTTP (HTTP/1.1, one request per connection)
+    # ----------------------------
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, body = await self._read_request(reader)
+        except (asyncio.LimitOverrunError, ValueError, asyncio.IncompleteReadError, ConnectionError) as e:
+            await self._reject(writer, e)
+            return
+
+        try:
+            if method == "GET" and path == "/health":
+                await self._respond(writer, 200, self.health())
+            elif method == "GET" and path == "/metrics":
+                await self._respond(writer, 200, self.metrics())
+            elif method == "GET" and path.startswith("/trace/"):
+                trace = tracing.get_trace(path[len("/trace/"):])
+                await self._respond(writer, 200 if trace else 404, trace or {"error": "unknown trace"})
+            elif method == "POST" and path == "/turn":
+                await self._turn(writer, body)
+            else:
+                await self._respond(writer, 404, {"error": f"no route {method} {path}"})
+        except ConnectionError:
+            # Client went away; a running turn still finishes (memory, trace, answer cache)
+            self.counters["client_disconnects"] += 1
+        except Exception as e:
+            print(f"[SERVICE ERROR] {method} {path}: {e}")
+            try:
+                await self._respond(writer, 500, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _turn(self, writer, body: bytes):
+        try:
+            payload = json.loads(body or b"{}")
+            state = _to_state(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            await self._respond(writer, 400, {"error": f"bad turn request: {e}"})
+            return
+
+        job = _Job(state["user_id"], state, bool(payload.get("stream")))
+        rejected = self.submit(job)
+        if rejected:
+            status, reason = rejected
+            await self._respond(writer, status, {"error": reason}, {"Retry-After": str(RETRY_AFTER_S)})
+            return
+
+        if not job.stream:
+            kind, data = await job.events.get()
+            await self._respond(writer, 200 if kind == "done" else 500, data if kind == "done" else {"error": data})
+            return
+
+        # Close-delimited NDJSON stream: one JSON object per line
+        await self._head(writer, 200, "application/x-ndjson")
+        while True:
+            kind, data = await job.events.get()
+            if kind == "token":
+                line = {"token": data}
+            elif kind == "done":
+                line = data
+            else:
+                line = {"error": data}
+            writer.write((json.dumps(line) + "\n").encode("utf-8"))
+            await writer.drain()
+            if kind != "token":
+                return
+
+    @staticmethod
+    async def _read_request(reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise ValueError("malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0") or 0)
+        if length < 0:
+            raise ValueError("invalid content-length")
+        if length > MAX_BODY_BYTES:
+            raise ValueError("request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), urlsplit(target).path, body
+
+    async def _reject(self, writer, error: Exception):
+        """Answer a request that could not be read (431 / 400), then close."""
+        try:
+            if isinstance(error, asyncio.LimitOverrunError):
+                # No blank line within the stream limit (64 KiB): headers too large
+                await self._respond(writer, 431, {"error": "request headers too large"})
+            elif isinstance(error, asyncio.IncompleteReadError):
+                # Client closed mid-request; answer only if it sent something
+                if error.partial:
+                    await self._respond(writer, 400, {"error": "incomplete request"})
+            elif isinstance(error, ValueError):
+                await self._respond(writer, 400, {"error": str(error)})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _head(writer, status: int, content_type: str, extra: dict | None = None, length: int | None = None):
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}", "Connection: close"]
+        if length is not None:
+            lines.append(f"Content-Length: {length}")
+        lines += [f"{k}: {v}" for k, v in (extra or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    async def _respond(self, writer, status: int, data, extra: dict | None = None):
+        body = json.dumps(data).encode("utf-8")
+        await self._head(writer, status, "application/json", extra, length=len(body))
+        writer.write(body)
+        await writer.drain()
+
+
+# ----------------------------
+# Entry point
+# ----------------------------
+async def serve(
+    host: str = SERVICE_HOST,
+    port: int = SERVICE_PORT,
+    socket_path: str | None = SERVICE_SOCKET,
+    service: AssistantService | None = None,
+):
+    service = service or AssistantService()
+    service.start()
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(service.handle, path=socket_path)
+        where = f"unix://{socket_path}"
+    else:
+        server = await asyncio.start_server(service.handle, host=host, port=port)
+        where = f"http://{host}:{server.sockets[0].getsockname()[1]}"
+    print(f"✅ Assistant service on {where} ({service.n_workers} workers, queue {service.queue.maxsize})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+        from backend.tools_web import aclose_web_client
+
+        await aclose_web_client()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the shared assistant service.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--socket", default=SERVICE_SOCKET, help="serve on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=SERVICE_QUEUE_SIZE)
+    parser.add_argument("--user-concurrency", type=int, default=SERVICE_USER_CONCURRENCY)
+    parser.add_argument("--no-warm-up", action="store_true", help="load models on the first turn instead")
+    args = parser.parse_args(argv)
+
+    with timed("import:backend.graph_async"):
+        import backend.graph_async  # noqa: F401
+    if not args.no_warm_up:
+        warm_up(background=True)
+
+    async def _main():
+        service = AssistantService(
+            workers=args.workers,
+            queue_size=args.queue_size,
+            user_concurrency=args.user_concurrency,
+        )
+        await serve(args.host, args.port, args.socket, service)
+
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
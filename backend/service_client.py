@@ -0,0 +1,87 @@
+# backend/service_client.py
+# Thin client for backend/service.py (used by app.py when ASSISTANT_SERVICE_URL is set).
+# Only needs httpx: the UI process never loads the models or Chroma.
+#
+#   ASSISTANT_SERVICE_URL=http://127.0.0.1:8765
+#   ASSISTANT_SERVICE_URL=unix:///tmp/assistant.sock
+
+import os
+import json
+
+import httpx
+
+ASSISTANT_SERVICE_URL = os.getenv("ASSISTANT_SERVICE_URL", "").strip() or None
+SERVICE_TIMEOUT_S = float(os.getenv("SERVICE_TIMEOUT_S", "180"))
+
+
+class ServiceBusy(Exception):
+    """The service rejected the turn (503 queue full / 429 user limit)."""
+
+    def __init__(self, status: int, reason: str, retry_after: float | None):
+        super().__init__(f"{status}: {reason}")
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AssistantClient:
+    def __init__(self, url: str = ASSISTANT_SERVICE_URL, timeout_s: float = SERVICE_TIMEOUT_S):
+        if url.startswith("unix://"):
+            transport = httpx.HTTPTransport(uds=url[len("unix://"):])
+            self._http = httpx.Client(base_url="http://assistant", transport=transport, timeout=timeout_s)
+        else:
+            self._http = httpx.Client(base_url=url.rstrip("/"), timeout=timeout_s)
+
+    @staticmethod
+    def _check(response: httpx.Response):
+        if response.status_code in (429, 503):
+            response.read()
+            retry = response.headers.get("retry-after")
+            raise ServiceBusy(
+                response.status_code,
+                response.json().get("error", ""),
+                float(retry) if retry else None,
+            )
+        if response.status_code != 200:
+            response.read()
+            raise RuntimeError(f"assistant service {response.status_code}: {response.text}")
+
+    def turn(self, user_id, chat_id, messages: list[dict]) -> dict:
+        """One blocking turn → {"reply", "route", "trace_id"}."""
+        r = self._http.post(
+            "/turn",
+            json={"user_id": user_id, "chat_id": chat_id, "messages": messages, "stream": False},
+        )
+        self._check(r)
+        return r.json()
+
+    def stream_turn(self, user_id, chat_id, messages: list[dict], holder: dict):
+        """
+        Generator of reply text chunks (same contract as graph_ml_assistant.stream_turn);
+        the final {"reply", "route", "trace_id"} is left in holder["result"].
+        """
+        body = {"user_id": user_id, "chat_id": chat_id, "messages": messages, "stream": True}
+        with self._http.stream("POST", "/turn", json=body) as r:
+            self._check(r)
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if "token" in event:
+                    yield event["token"]
+                elif event.get("done"):
+                    holder["result"] = event
+                elif "error" in event:
+                    raise RuntimeError(f"assistant service: {event['error']}")
+
+    def health(self) -> dict:
+        return self._http.get("/health").json()
+
+    def metrics(self) -> dict:
+        return self._http.get("/metrics").json()
+
+    def trace(self, trace_id: str | None) -> dict | None:
+        if not trace_id:
+            return None
+        r = self._http.get(f"/trace/{trace_id}")
+        return r.json() if r.status_code == 200 else None
@@ -0,0 +1,145 @@
+# backend/startup.py
+# Deferred initialization of heavy resources + cold-start timing report
+
+import sys
+import time
+import threading
+from contextlib import contextmanager
+
+_report = {}            # name -> seconds (insertion ordered)
+_report_lock = threading.Lock()
+_resources = {}         # name -> LazyResource, in registration order
+_warm_up_thread = None
+_process_start = time.perf_counter()
+
+
+# ----------------------------------------------------
+# TIMING
+# ----------------------------------------------------
+@contextmanager
+def timed(name: str):
+    """
+    Record how long the wrapped block took under `name` in the startup report.
+    Repeated names keep the slowest run (a second `import x` is a dict lookup).
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = round(time.perf_counter() - t0, 4)
+        with _report_lock:
+            _report[name] = max(elapsed, _report.get(name, 0.0))
+
+
+# ----------------------------------------------------
+# LAZY RESOURCES
+# ----------------------------------------------------
+class LazyResource:
+    """
+    Thread-safe, build-once wrapper around a zero-argument factory.
+    The first get() builds the resource (timed as "init:<name>");
+    override() swaps in a replacement (fakes in benchmarks), reset() drops it.
+    """
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self._factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                with timed(f"init:{self.name}"):
+                    self._value = self._factory()
+                self._loaded = True
+        return self._value
+
+    def override(self, value):
+        with self._lock:
+            self._value = value
+            self._loaded = True
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self._loaded = False
+
+
+def lazy_resource(name: str):
+    """Decorator: register a factory as a named LazyResource."""
+
+    def wrap(factory):
+        res = LazyResource(name, factory)
+        _resources[name] = res
+        return res
+
+    return wrap
+
+
+def resources() -> dict:
+    return dict(_resources)
+
+
+# ----------------------------------------------------
+# WARM-UP
+# ----------------------------------------------------
+def _warm_all():
+    # Importing the graph module registers every backend resource
+    import backend.graph_ml_assistant  # noqa: F401
+
+    with timed("warm_up:total"):
+        for res in list(_resources.values()):
+            try:
+                res.get()
+            except Exception as e:
+                # Warm-up is an optimization; the request path retries on first use
+                print(f"[WARM-UP ERROR] {res.name}: {e}")
+
+
+def warm_up(background: bool = True):
+    """
+    Load every registered resource. With background=True this runs once
+    in a daemon thread and returns it; otherwise it blocks until done.
+    """
+    global _warm_up_thread
+
+    if not background:
+        _warm_all()
+        return None
+
+    with _report_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(
+                target=_warm_all, name="backend-warm-up", daemon=True
+            )
+            _warm_up_thread.start()
+    return _warm_up_thread
+
+
+def startup_report() -> dict:
+    """Per-resource import/init times plus which resources are loaded."""
+    with _report_lock:
+        timings = dict(_report)
+    return {
+        "uptime_s": round(time.perf_counter() - _process_start, 3),
+        "timings_s": timings,
+        "loaded": {name: res.loaded for name, res in _resources.items()},
+    }
+
+
+if __name__ == "__main__":
+    import json
+
+    with timed("import:backend.graph_ml_assistant"):
+        import backend.graph_ml_assistant  # noqa: F401
+    warm_up(background=False)
+    json.dump(startup_report(), sys.stdout, indent=2)
+    print()
@@ -0,0 +1,100 @@
+# backend/streaming.py
+# Token streaming from the assistant graph + first-token latency per route
+
+import time
+import threading
+from collections import defaultdict, deque
+
+from langchain_core.messages import AIMessageChunk
+
+# Nodes whose LLM tokens are part of the reply (the router's label is not)
+REPLY_NODES = {"teacher_rag_or_web", "teacher_general", "quiz"}
+
+_first_token_ms = defaultdict(lambda: deque(maxlen=500))
+_lock = threading.Lock()
+
+
+def _record_first_token(route, ms: float):
+    with _lock:
+        _first_token_ms[route or "unknown"].append(ms)
+
+
+def first_token_stats() -> dict:
+    """{route: {"count", "p50_ms", "p95_ms"}} over the last 500 turns per route."""
+    out = {}
+    with _lock:
+        items = {route: sorted(v) for route, v in _first_token_ms.items()}
+    for route, vals in items.items():
+        if vals:
+            out[route] = {
+                "count": len(vals),
+                "p50_ms": round(vals[len(vals) // 2], 1),
+                "p95_ms": round(vals[min(len(vals) - 1, int(len(vals) * 0.95))], 1),
+            }
+    return out
+
+
+class _Turn:
+    """Tracks one streamed turn: route, first-token time, final state."""
+
+    def __init__(self, holder: dict):
+        self.holder = holder
+        self.t0 = time.perf_counter()
+        self.route = None
+        self.streamed = False
+
+    def on_event(self, mode, payload):
+        """Returns the text to emit for this event (or None)."""
+        if mode == "values":
+            self.holder["state"] = payload
+            self.route = payload.get("route") or self.route
+            return None
+
+        chunk, meta = payload
+        if meta.get("langgraph_node") not in REPLY_NODES:
+            return None
+        # Full AIMessages (e.g. the quiz node's own append) repeat streamed tokens
+        if not isinstance(chunk, AIMessageChunk) or not chunk.content:
+            return None
+        if not self.streamed:
+            self.streamed = True
+            _record_first_token(self.route, (time.perf_counter() - self.t0) * 1000)
+        return chunk.content
+
+    def leftover(self):
+        """Reply text when nothing was streamed (answer-cache hits, non-LLM replies)."""
+        if self.streamed:
+            return None
+        state = self.holder.get("state") or {}
+        messages = state.get("messages") or []
+        if not messages:
+            return None
+        _record_first_token(self.route, (time.perf_counter() - self.t0) * 1000)
+        return messages[-1].content
+
+
+def stream_reply(graph, state, holder: dict):
+    """
+    Generator of reply text chunks for one turn on a compiled (sync) graph.
+    The final graph state is left in holder["state"].
+    """
+    turn = _Turn(holder)
+    for mode, payload in graph.stream(state, stream_mode=["messages", "values"]):
+        text = turn.on_event(mode, payload)
+        if text:
+            yield text
+    text = turn.leftover()
+    if text:
+        yield text
+
+
+async def astream_reply(graph, state, holder: dict):
+    """Async twin of stream_reply for the async graph."""
+    turn = _Turn(holder)
+    async for mode, payload in graph.astream(state, stream_mode=["messages", "values"]):
+        text = turn.on_event(mode, payload)
+        if text:
+            yield text
+    text = turn.leftover()
+    if text:
+        yield text
@@ -1,54 +1,387 @@
 # backend/tools_rag.py
 
 import os
+import time
+import hashlib
 from dotenv import load_dotenv
 
-import chromadb
-from sentence_transformers import SentenceTransformer
 from langchain_core.tools import tool
 
+from backend import context, embeddings, tracing
+from backend.lexical_index import BM25Index, reciprocal_rank_fusion
+from backend.startup import lazy_resource, timed
+
 load_dotenv()
 
 # Path to your vector DB
 DB_DIR = os.path.join(os.path.dirname(__file__), "..", "vectorstore")
 
-# Load embedding model (same one used in vector DB build)
-embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+# Hybrid retrieval: BM25 over the same chunks, fused with dense results (RRF)
+RAG_HYBRID = os.getenv("RAG_HYBRID", "1") == "1"
+# Short keyword queries fully answered by BM25 (rare terms, all present in every
+# hit) skip the embedder, the HNSW lookup and fusion; they count as high confidence
+RAG_LEXICAL_FAST = os.getenv("RAG_LEXICAL_FAST", "1") == "1"
+# Retrieval engine for reads: "chroma" (HNSW, default) or "numpy" (exact, in-memory matrix)
+RAG_BACKEND = os.getenv("RAG_BACKEND", "chroma").strip().lower()
+RAG_NUMPY_DTYPE = os.getenv("RAG_NUMPY_DTYPE", "float32")
+RAG_NUMPY_MMAP = os.getenv("RAG_NUMPY_MMAP", "1") == "1"
+RAG_TOP_K = 5
+RAG_CANDIDATES = 10
+# Context compression (backend/context.py): MMR over this many candidates → RAG_TOP_K,
+# overlap merging and a token budget. RAG_COMPRESS=0 restores the verbatim top-k.
+RAG_COMPRESS = os.getenv("RAG_COMPRESS", "1") == "1"
+RAG_MMR_CANDIDATES = int(os.getenv("RAG_MMR_CANDIDATES", "8"))
+# Web fallback by retrieval score (cosine similarity of the best chunk):
+# below MIN → web; MIN..CONFIDENT → marginal (web prefetched, RAG kept if
+# RAG_MIN_SUPPORT hits clear MIN); above CONFIDENT → RAG only
+RAG_MIN_SIMILARITY = float(os.getenv("RAG_MIN_SIMILARITY", "0.30"))
+RAG_CONFIDENT_SIMILARITY = float(os.getenv("RAG_CONFIDENT_SIMILARITY", "0.45"))
+RAG_MIN_SUPPORT = int(os.getenv("RAG_MIN_SUPPORT", "2"))
+# Restrict retrieval to the chapter / deck the router extracted (falls back to the whole index)
+RAG_CHAPTER_FILTER = os.getenv("RAG_CHAPTER_FILTER", "1") == "1"
+
+
+# Initialize Chroma client + load the collection (deferred to first use)
+@lazy_resource("course_chroma_collection")
+def _chroma_collection():
+    with timed("import:chromadb"):
+        import chromadb
+
+    chroma_client = chromadb.PersistentClient(path=DB_DIR)
+    return chroma_client.get_or_create_collection(
+        name="course_rag",
+        metadata={"hnsw:space": "cosine"},
+    )
+
+
+def get_chroma_collection():
+    """The writable Chroma collection (index builds always go here)."""
+    return _chroma_collection.get()
+
+
+def _index_fingerprint() -> str | None:
+    """
+    Identity of the Chroma index the NumPy matrix was exported from: the build
+    manifest's hash, or (index built without a manifest) the chunk count + ids.
+    """
+    from backend.build_index import MANIFEST_PATH
+
+    try:
+        with open(MANIFEST_PATH, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        pass
+
+    try:
+        ids = sorted(get_chroma_collection().get(include=[])["ids"])
+    except Exception as e:
+        print(f"[RAG ERROR] Could not fingerprint the course index: {e}")
+        return None
+    if not ids:
+        return None
+    digest = hashlib.sha256(f"{len(ids)}\0".encode("utf-8"))
+    for cid in ids:
+        digest.update(cid.encode("utf-8") + b"\0")
+    return "ids:" + digest.hexdigest()
+
+
+def export_numpy_index(dtype: str = RAG_NUMPY_DTYPE):
+    """Dump the Chroma collection into the NumPy matrix files and return it."""
+    from backend.vector_backend import NumpyCollection
+
+    coll = NumpyCollection.from_collection(get_chroma_collection(), dtype=dtype)
+    coll.save(fingerprint=_index_fingerprint())
+    return coll
+
+
+@lazy_resource("course_collection")
+def _collection():
+    if RAG_BACKEND != "numpy":
+        return get_chroma_collection()
+
+    from backend.vector_backend import NumpyCollection
+
+    fingerprint = _index_fingerprint()
+    if fingerprint is None or NumpyCollection.stored_fingerprint() != fingerprint:
+        # Missing or built from an older index → re-export from Chroma
+        return export_numpy_index()
+    return NumpyCollection.load(mmap=RAG_NUMPY_MMAP)
 
-# Initialize Chroma client
-chroma_client = chromadb.PersistentClient(path=DB_DIR)
 
-# Load the collection
-collection = chroma_client.get_or_create_collection(
-    name="course_rag",
-    metadata={"hnsw:space": "cosine"},
-)
+def get_collection():
+    """Read-side collection for retrieval (Chroma or the NumPy backend, per RAG_BACKEND)."""
+    return _collection.get()
+
+
+@lazy_resource("course_lexical_index")
+def _lexical_index():
+    data = get_collection().get(include=["documents", "metadatas"])
+    return BM25Index(data["ids"], data["documents"], data["metadatas"])
+
+
+def get_lexical_index() -> BM25Index:
+    return _lexical_index.get()
+
+
+def __getattr__(name):
+    # Backwards compatibility: `from backend.tools_rag import collection`
+    if name == "collection":
+        return get_collection()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ------------------------------
-# RAG TOOL: course_docs_search
+# Retrieval
 # ------------------------------
-@tool("course_docs_search", return_direct=False)
-def course_docs_search(query: str) -> str:
+def _hit(cid: str, doc: str, meta: dict | None, distance: float | None = None) -> dict:
+    meta = meta or {}
+    return {
+        "id": cid,
+        "document": doc,
+        "source": meta.get("source", "unknown"),
+        "metadata": meta,
+        "distance": None if distance is None else float(distance),   # cosine distance = 1 - similarity
+    }
+
+
+def _dense_search(query: str, n: int, query_embedding=None, where: dict | None = None) -> list[dict]:
+    # Embed query (shared embedding service, same model used in vector DB build)
+    if query_embedding is None:
+        query_embedding = embeddings.encode(query)
+
+    t0 = time.perf_counter()
+    with tracing.span("chroma_query"):
+        results = get_collection().query(
+            query_embeddings=[query_embedding],
+            n_results=n,
+            **({"where": where} if where else {}),
+        )
+    tracing.count("chroma_ms", (time.perf_counter() - t0) * 1000)
+    return [
+        _hit(cid, doc, meta, dist)
+        for cid, doc, meta, dist in zip(
+            results.get("ids", [[]])[0],
+            results.get("documents", [[]])[0],
+            results.get("metadatas", [[]])[0],
+            (results.get("distances") or [[]])[0] or [None] * n,
+        )
+    ]
+
+
+def _search(query: str, k: int = RAG_TOP_K, on_score=None, where: dict | None = None, query_embedding=None):
     """
-    Search the Machine Learning course documents (vector DB)
-    and return the most relevant passages.
+    Top-k hits for `query` (dense, BM25 or fused), best first, optionally
+    restricted to chunks whose metadata matches `where` (e.g. {"chapter": "7"}).
+    Returns (hits, query embedding or None, path). on_score(top_similarity)
+    is called as soon as the dense scores are known, before fusion.
+    """
+    if not RAG_HYBRID:
+        if query_embedding is None:
+            query_embedding = embeddings.encode(query)
+        dense = _dense_search(query, k, query_embedding, where)
+        if on_score is not None:
+            on_score(_top_similarity(dense))
+        return dense, query_embedding, "dense"
+
+    lex = get_lexical_index()
+    allowed = lex.positions(where) if where else None
+    if RAG_LEXICAL_FAST:
+        hits = lex.confident_search(query, k=k, allowed=allowed)
+        if hits:
+            return [_hit(lex.ids[p], lex.documents[p], lex.metadatas[p]) for p, _ in hits], None, "lexical"
+
+    if query_embedding is None:
+        query_embedding = embeddings.encode(query)
+    dense = _dense_search(query, max(k, RAG_CANDIDATES), query_embedding, where)
+    if on_score is not None:
+        on_score(_top_similarity(dense))
+    lexical = [
+        _hit(lex.ids[p], lex.documents[p], lex.metadatas[p])
+        for p, _ in lex.search(query, RAG_CANDIDATES, allowed=allowed)
+    ]
+
+    by_id = {hit["id"]: hit for hit in lexical + dense}     # dense entries (with distances) win
+    fused = reciprocal_rank_fusion([[h["id"] for h in dense], [h["id"] for h in lexical]])
+    return [by_id[i] for i in fused[:k]], query_embedding, "hybrid"
+
+
+def _hit_vectors(hits: list):
+    """Stored embeddings of the hits, in hit order (None if any is missing)."""
+    if not hits:
+        return None
+    try:
+        data = get_collection().get(ids=[h["id"] for h in hits], include=["embeddings"])
+    except Exception as e:
+        print(f"[RAG CONTEXT ERROR] {e}")
+        return None
+    by_id = dict(zip(data["ids"], data["embeddings"]))
+    if len(by_id) != len(hits):
+        return None
+    return [by_id[h["id"]] for h in hits]
+
+
+def _fill_distances(hits: list, vectors, query_embedding):
+    """Distances for hits that only came from BM25, from their stored embeddings."""
+    if vectors is None or query_embedding is None:
+        return
+    import numpy as np
+
+    q = np.asarray(query_embedding, dtype=np.float32)
+    q = q / max(float(np.linalg.norm(q)), 1e-12)
+    for hit, vec in zip(hits, vectors):
+        if hit["distance"] is None:
+            v = np.asarray(vec, dtype=np.float32)
+            hit["distance"] = 1.0 - float(v @ q) / max(float(np.linalg.norm(v)), 1e-12)
+
+
+def _top_similarity(hits: list) -> float | None:
+    sims = [1.0 - h["distance"] for h in hits if h.get("distance") is not None]
+    return max(sims) if sims else None
+
+
+def confidence(top_similarity: float | None) -> str:
+    """'high' | 'marginal' | 'low' for a retrieval's best cosine similarity."""
+    if top_similarity is None or top_similarity < RAG_MIN_SIMILARITY:
+        return "low"
+    if top_similarity < RAG_CONFIDENT_SIMILARITY:
+        return "marginal"
+    return "high"
+
+
+@lazy_resource("course_partitions")
+def _partitions():
+    """Chapters and decks present in the index (from the chunks' metadata)."""
+    metas = get_collection().get(include=["metadatas"])["metadatas"]
+    partitions = {
+        "chapter": {m["chapter"] for m in metas if m and m.get("chapter")},
+        "deck": {m["deck"] for m in metas if m and m.get("deck")},
+    }
+    if metas and not partitions["chapter"]:
+        # Index built before chunks carried chapter/deck metadata: scoping is a no-op
+        print(
+            "[RAG WARNING] No chapter metadata in the course index; chapter-scoped "
+            "retrieval is disabled until `python -m backend.build_index` is run."
+        )
+    return partitions
+
+
+def chapter_filter(chapter) -> dict | None:
+    """
+    Metadata filter for a router chapter: "10.3" → that deck, "7" (or "12.1"
+    when deck 12 has no sub-decks) → the whole chapter; None when the index
+    has no such chapter.
     """
-    # Embed query
-    query_embedding = embedder.encode([query]).tolist()[0]
+    if not chapter:
+        return None
+    parts = str(chapter).strip().strip(".").split(".")
+    known = _partitions.get()
+    deck = ".".join(parts[:2])
+    if len(parts) > 1 and deck in known["deck"]:
+        return {"deck": deck}
+    if parts[0] in known["chapter"]:
+        return {"chapter": parts[0]}
+    return None
 
-    # Retrieve top 5 chunks
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=5
+
+def _retrieve_once(query: str, k: int, on_score, where: dict | None, query_embedding=None) -> dict:
+    n = max(k, RAG_MMR_CANDIDATES) if RAG_COMPRESS else k
+    hits, query_embedding, path = _search(
+        query, k=n, on_score=on_score, where=where, query_embedding=query_embedding
     )
 
-    documents = results.get("documents", [[]])[0]
-    sources = results.get("metadatas", [[]])[0]
+    vectors = _hit_vectors(hits) if RAG_COMPRESS or path == "hybrid" else None
+    _fill_distances(hits, vectors, query_embedding)
+    if RAG_COMPRESS and vectors is not None:
+        hits = [hits[i] for i in context.mmr(vectors, k)]
+    hits = hits[:k]
+
+    top = _top_similarity(hits)
+    # BM25 fast path: confident_search's own rule is the gate (no query embedding,
+    # so no similarity); `where` already kept its hits inside the scope
+    conf = "high" if path == "lexical" and hits else confidence(top)
+    if path == "lexical" and on_score is not None:
+        on_score(top, conf)
+    return {
+        "query": query,
+        "hits": hits,
+        "top_similarity": top,
+        "confidence": conf,
+        "path": path,
+        "scope": where,
+        "_embedding": query_embedding,
+    }
+
 
-    response = "📚 **Relevant excerpts from course materials:**\n\n"
-    for i, doc in enumerate(documents):
-        src = sources[i].get("source", "unknown")
-        response += f"**From {src}:**\n{doc}\n\n---\n\n"
+def retrieve(query: str, k: int = RAG_TOP_K, on_score=None, chapter=None) -> dict:
+    """
+    Structured retrieval.
+    Returns:
+        {
+          "query": str,
+          "hits": [{"id", "document", "source", "metadata", "distance"}, ...],   # best first
+          "top_similarity": float|None,    # None when no hit could be scored (BM25 fast path)
+          "confidence": "high"|"marginal"|"low",
+          "path": "lexical"|"dense"|"hybrid",
+          "scope": {"chapter": ...}|{"deck": ...}|None,   # metadata filter that was applied
+        }
+    With a known `chapter` only that chapter's chunks are searched; when that
+    finds nothing useful (no hits / low confidence) the whole index is searched.
+    on_score(top_similarity, confidence) fires right after the dense query, so
+    callers can start a web prefetch while fusion / MMR still run.
+    The query is only embedded when BM25 alone is not confident.
+    """
+    def _scored(top, conf=None, scoped=False):
+        conf = conf or confidence(top)
+        # A weak chapter-scoped score is not final: the unscoped search follows
+        if on_score is not None and not (scoped and conf == "low"):
+            on_score(top, conf)
 
-    return response
+    where = chapter_filter(chapter) if RAG_CHAPTER_FILTER else None
+    query_embedding = None
+    if where:
+        result = _retrieve_once(query, k, lambda top, conf=None: _scored(top, conf, scoped=True), where)
+        if result["hits"] and result["confidence"] != "low":
+            result.pop("_embedding")
+            return result
+        query_embedding = result["_embedding"]
+
+    result = _retrieve_once(query, k, _scored, None, query_embedding)
+    result.pop("_embedding")
+    return result
+
+
+def rag_is_sufficient(result: dict) -> bool:
+    """
+    Score-gated RAG-vs-web decision: 'high' → RAG, 'low' → web; 'marginal'
+    needs RAG_MIN_SUPPORT hits above RAG_MIN_SIMILARITY.
+    """
+    if not result["hits"]:
+        return False
+    if result["confidence"] != "marginal":
+        return result["confidence"] == "high"
+    support = sum(
+        1 for h in result["hits"]
+        if h["distance"] is not None and 1.0 - h["distance"] >= RAG_MIN_SIMILARITY
+    )
+    return support >= RAG_MIN_SUPPORT
+
+
+def format_context(result: dict) -> str:
+    """Excerpt block for the prompt (compressed unless RAG_COMPRESS=0)."""
+    if not RAG_COMPRESS:
+        return context.verbatim(result["hits"])
+    text, report = context.assemble(result["hits"])
+    tracing.count("context_tokens_saved", report["saved_tokens"])
+    return text
+
+
+# ------------------------------
+# RAG TOOL: course_docs_search
+# ------------------------------
+@tool("course_docs_search", return_direct=False)
+def course_docs_search(query: str) -> str:
+    """
+    Search the Machine Learning course documents (vector DB)
+    and return the most relevant passages.
+    """
+    return format_context(retrieve(query, k=RAG_TOP_K))
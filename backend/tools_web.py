@@ -1,9 +1,320 @@
 # backend/tools_web.py
 
 import os
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import weakref
+import threading
+from concurrent.futures import Future
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from backend.embedding_cache import normalize_text
 
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY", "").strip()
+TAVILY_BASE_URL = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com").rstrip("/")
+
+WEB_CONNECT_TIMEOUT = float(os.getenv("WEB_CONNECT_TIMEOUT", "3.05"))
+WEB_READ_TIMEOUT = float(os.getenv("WEB_READ_TIMEOUT", "15"))
+WEB_POOL_SIZE = int(os.getenv("WEB_POOL_SIZE", "16"))
+WEB_MAX_INFLIGHT = int(os.getenv("WEB_MAX_INFLIGHT", "8"))
+# Distinct queries tracked for coalescing; beyond this, new queries fetch uncoalesced
+WEB_MAX_PENDING = int(os.getenv("WEB_MAX_PENDING", "64"))
+WEB_CACHE_TTL_S = float(os.getenv("WEB_CACHE_TTL_S", str(6 * 3600)))
+
+# On-disk result cache: set WEB_CACHE_DB="" to disable
+if os.path.exists("/mount/data"):
+    _default_cache_db = "/mount/data/web_cache.db"              # Streamlit Cloud
+else:
+    _default_cache_db = os.path.join(os.getcwd(), "local_data", "web_cache.db")
+WEB_CACHE_DB = os.getenv("WEB_CACHE_DB", _default_cache_db).strip() or None
+
+
+def _normalize_results(data: dict) -> list[dict]:
+    results = data.get("results", []) or []
+    # Normalize fields
+    return [
+        {
+            "title": r.get("title", "") or "",
+            "url": r.get("url", "") or "",
+            "content": r.get("content", "") or "",
+        }
+        for r in results
+    ]
+
+
+class WebSearchClient:
+    """
+    Tavily /search client:
+      - one pooled keep-alive HTTP session (sync) / httpx client (async)
+      - TTL result cache on disk, keyed by normalized query + max_results
+      - identical concurrent queries share one in-flight request
+        (at most `max_inflight` distinct requests at a time; the in-flight
+        map holds at most `max_pending` queries, waiting ones included)
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str = TAVILY_BASE_URL,
+        cache_path: str | None = WEB_CACHE_DB,
+        ttl_s: float = WEB_CACHE_TTL_S,
+        max_inflight: int = WEB_MAX_INFLIGHT,
+        max_pending: int = WEB_MAX_PENDING,
+        timeout: tuple = (WEB_CONNECT_TIMEOUT, WEB_READ_TIMEOUT),
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.ttl_s = ttl_s
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=WEB_POOL_SIZE, max_retries=1)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._async_state = weakref.WeakKeyDictionary()   # event loop → (client, slots, in-flight)
+
+        self._inflight = {}                # cache key → Future
+        self._inflight_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._max_inflight = max_inflight
+        self._max_pending = max_pending
+
+        self.requests = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        if cache_path:
+            try:
+                os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(cache_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS web_cache (key TEXT PRIMARY KEY, results TEXT, created REAL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS web_cache_created ON web_cache (created)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"[WEB CACHE ERROR] {e}")
+                self._db = None
+
+    # ----------------------------
+    # Cache
+    # ----------------------------
+    @staticmethod
+    def cache_key(query: str, max_results: int) -> str:
+        return hashlib.sha1(f"{normalize_text(query, lowercase=True)}\0{max_results}".encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT results, created FROM web_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if not row or time.time() - row[1] > self.ttl_s:
+            return None
+        self.cache_hits += 1
+        return json.loads(row[0])
+
+    def _cache_put(self, key: str, results: list[dict]):
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                now = time.time()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO web_cache (key, results, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(results), now),
+                )
+                # Expired rows are never served again: drop them instead of letting the file grow
+                self._db.execute("DELETE FROM web_cache WHERE created < ?", (now - self.ttl_s,))
+                self._db.commit()
+        except sqlite3.Error as e:
+            print(f"[WEB CACHE ERROR] {e}")
+
+    # ----------------------------
+    # Request
+    # ----------------------------
+    def _api_key(self) -> str:
+        return (self.api_key if self.api_key is not None else os.getenv("TAVILY_API_KEY", "")).strip()
+
+    def _payload(self, query: str, max_results: int) -> dict:
+        return {
+            "api_key": self._api_key(),
+            "query": query,
+            "search_depth": "basic",
+            "max_results": max_results,
+            "include_answer": False,
+            "include_raw_content": False,
+        }
+
+    def _fetch(self, query: str, max_results: int) -> dict:
+        try:
+            self.requests += 1
+            resp = self.session.post(
+                f"{self.base_url}/search",
+                json=self._payload(query, max_results),
+                timeout=self.timeout,
+            )
+            resp.raise_for_status()
+            return {"ok": True, "results": _normalize_results(resp.json()), "error": None}
+        except Exception as e:
+            return {"ok": False, "results": [], "error": str(e) or type(e).__name__}
+
+    def search(self, query: str, max_results: int = 5) -> dict:
+        if not self._api_key():
+            return {
+                "ok": False,
+                "results": [],
+                "error": "Missing TAVILY_API_KEY environment variable.",
+            }
+
+        key = self.cache_key(query, max_results)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return {"ok": True, "results": cached, "error": None}
+
+        with self._inflight_lock:
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner and len(self._inflight) >= self._max_pending:
+                fut = None                  # map full: fetch without coalescing
+            elif owner:
+                fut = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if fut is None:
+            with self._slots:
+                result = self._fetch(query, max_results)
+            if result["ok"]:
+                self._cache_put(key, result["results"])
+            return result
+        if not owner:
+            return fut.result()
+
+        try:
+            with self._slots:
+                result = self._fetch(query, max_results)
+            if result["ok"]:
+                self._cache_put(key, result["results"])
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    # ----------------------------
+    # Async variant
+    # ----------------------------
+    def _loop_state(self):
+        """Per-event-loop httpx client, request slots and in-flight map."""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        # Loops that were closed without aclose(): their sockets died with them
+        for dead in [lp for lp in list(self._async_state.keys()) if lp.is_closed()]:
+            self._async_state.pop(dead, None)
+        state = self._async_state.get(loop)
+        if state is None:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(max_connections=WEB_POOL_SIZE),
+            )
+            state = self._async_state[loop] = (client, asyncio.Semaphore(self._max_inflight), {})
+        return state
+
+    async def _afetch(self, key: str, query: str, max_results: int) -> dict:
+        client, slots, _ = self._loop_state()
+        try:
+            async with slots:
+                self.requests += 1
+                resp = await client.post(f"{self.base_url}/search", json=self._payload(query, max_results))
+            resp.raise_for_status()
+            result = {"ok": True, "results": _normalize_results(resp.json()), "error": None}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return {"ok": False, "results": [], "error": str(e) or type(e).__name__}
+        # SQLite is blocking: keep it off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self._cache_put, key, result["results"])
+        return result
+
+    async def asearch(self, query: str, max_results: int = 5) -> dict:
+        if not self._api_key():
+            return {
+                "ok": False,
+                "results": [],
+                "error": "Missing TAVILY_API_KEY environment variable.",
+            }
+
+        key = self.cache_key(query, max_results)
+        cached = await asyncio.get_running_loop().run_in_executor(None, self._cache_get, key)
+        if cached is not None:
+            return {"ok": True, "results": cached, "error": None}
+
+        _, _, inflight = self._loop_state()
+        entry = inflight.get(key)
+        if entry is None and len(inflight) >= self._max_pending:
+            return await self._afetch(key, query, max_results)      # map full: uncoalesced
+        if entry is None:
+            task = asyncio.ensure_future(self._afetch(key, query, max_results))
+            entry = inflight[key] = [task, 0]
+            task.add_done_callback(lambda _: inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            # shield: one waiter giving up must not cancel the request for the others
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # ...but when the last waiter gives up (e.g. RAG was good enough), cancel it
+            if entry[1] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+    async def aclose(self):
+        """Close the running loop's httpx client (call before the loop shuts down)."""
+        state = self._async_state.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            for entry in list(state[2].values()):
+                entry[0].cancel()
+            await state[0].aclose()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight) + sum(len(st[2]) for st in list(self._async_state.values())),
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> WebSearchClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WebSearchClient()
+    return _client
 
 
 def web_search(query: str, max_results: int = 5) -> dict:
@@ -16,39 +327,15 @@ def web_search(query: str, max_results: int = 5) -> dict:
           "error": str|None
         }
     """
-    if not TAVILY_API_KEY:
-        return {
-            "ok": False,
-            "results": [],
-            "error": "Missing TAVILY_API_KEY environment variable.",
-        }
+    return get_client().search(query, max_results=max_results)
 
-    try:
-        resp = requests.post(
-            "https://api.tavily.com/search",
-            json={
-                "api_key": TAVILY_API_KEY,
-                "query": query,
-                "search_depth": "basic",
-                "max_results": max_results,
-                "include_answer": False,
-                "include_raw_content": False,
-            },
-            timeout=20,
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        results = data.get("results", []) or []
-        # Normalize fields
-        norm = []
-        for r in results:
-            norm.append(
-                {
-                    "title": r.get("title", "") or "",
-                    "url": r.get("url", "") or "",
-                    "content": r.get("content", "") or "",
-                }
-            )
-        return {"ok": True, "results": norm, "error": None}
-    except Exception as e:
-        return {"ok": False, "results": [], "error": str(e)}
+
+async def aweb_search(query: str, max_results: int = 5) -> dict:
+    """Async twin of web_search (same cache and request coalescing)."""
+    return await get_client().asearch(query, max_results=max_results)
+
+
+async def aclose_web_client():
+    """Release the async HTTP client of the running event loop (service shutdown)."""
+    if _client is not None:
+        await _client.aclose()
@@ -0,0 +1,261 @@
+# backend/tracing.py
+# Per-turn traces for the assistant graph:
+#   - every graph node is a span (traced_node wraps the node functions)
+#   - code inside a node adds sub-spans (span()) and turn attributes (annotate()/count())
+#   - finished traces go to a JSONL file, a ring buffer (debug panel) and a metrics registry
+
+import os
+import time
+import uuid
+import asyncio
+import functools
+import threading
+import contextvars
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from backend.jsonl_log import JsonlWriter
+
+TRACE_ENABLED = os.getenv("TRACE", "1") == "1"
+TRACE_KEEP = int(os.getenv("TRACE_KEEP", "200"))
+
+# JSONL export: set TRACE_LOG="" to disable
+if os.path.exists("/mount/data"):
+    _default_trace_log = "/mount/data/traces.jsonl"               # Streamlit Cloud
+else:
+    _default_trace_log = os.path.join(os.getcwd(), "local_data", "traces.jsonl")
+TRACE_LOG = os.getenv("TRACE_LOG", _default_trace_log).strip() or None
+# The trace log rotates to <path>.1 at this size (0 = never)
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+
+_current = contextvars.ContextVar("assistant_trace", default=None)
+_active = {}                          # trace id → Trace (turn still running)
+_recent = deque(maxlen=TRACE_KEEP)    # finished traces, newest last
+_lock = threading.Lock()
+# finish() runs on the event loop in the async graph: the file append happens on this thread
+_log_writer = JsonlWriter("trace-log", TRACE_LOG_MAX_BYTES, "TRACE ERROR")
+
+
+class Trace:
+    """One assistant turn: spans (node + sub-spans) and turn-level attributes."""
+
+    def __init__(self, trace_id: str | None = None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.spans = []
+        self.attrs = {}
+        self._node = None                 # node currently running (parent of sub-spans)
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, t_start: float, t_end: float, parent: str | None = None, **attrs):
+        span = {
+            "name": name,
+            "parent": parent,
+            "start_ms": round((t_start - self._t0) * 1000, 2),
+            "dur_ms": round((t_end - t_start) * 1000, 2),
+        }
+        if attrs:
+            span["attrs"] = attrs
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+            attrs = dict(self.attrs)
+        total = max((s["start_ms"] + s["dur_ms"] for s in spans), default=0.0)
+        return {
+            "trace_id": self.trace_id,
+            "ts": self.started,
+            "total_ms": round(total, 2),
+            "attrs": attrs,
+            "spans": spans,
+        }
+
+
+# -------------------------------------------------------
+# Metrics registry (in-process)
+# -------------------------------------------------------
+class Metrics:
+    """Counters + latency windows (last 500 samples) fed by finished traces."""
+
+    def __init__(self, window: int = 500):
+        self._counters = defaultdict(int)
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] += n
+
+    def observe(self, name: str, ms: float):
+        with self._lock:
+            self._latencies[name].append(ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = {name: sorted(v) for name, v in self._latencies.items()}
+        out = {"counters": counters, "latency_ms": {}}
+        for name, vals in latencies.items():
+            if vals:
+                out["latency_ms"][name] = {
+                    "count": len(vals),
+                    "p50": round(vals[len(vals) // 2], 2),
+                    "p95": round(vals[min(len(vals) - 1, int(len(vals) * 0.95))], 2),
+                }
+        return out
+
+
+metrics = Metrics()
+
+
+def _record_metrics(trace: dict):
+    metrics.incr("turns")
+    metrics.observe("turn", trace["total_ms"])
+    for s in trace["spans"]:
+        metrics.observe(s["name"] if s["parent"] is None else f"{s['parent']}.{s['name']}", s["dur_ms"])
+    for key, value in trace["attrs"].items():
+        if isinstance(value, str):
+            metrics.incr(f"{key}:{value}")           # route:rag_query, source:web, answer_cache:hit ...
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics.incr(key, value)                  # tokens_in, tokens_out, ...
+
+
+def _export(trace: dict):
+    _log_writer.write(TRACE_LOG, trace)
+
+
+# -------------------------------------------------------
+# Recording API (no-ops outside a traced node)
+# -------------------------------------------------------
+def current_trace():
+    return _current.get()
+
+
+def annotate(**attrs):
+    """Set turn-level attributes (route, source, answer_cache, ...)."""
+    trace = _current.get()
+    if trace is not None:
+        with trace._lock:
+            trace.attrs.update(attrs)
+
+
+def count(name: str, n: float = 1):
+    """Add to a numeric turn attribute (tokens, Chroma time, ...)."""
+    trace = _current.get()
+    if trace is not None:
+        with trace._lock:
+            trace.attrs[name] = round(trace.attrs.get(name, 0) + n, 3)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Sub-span inside the current node (e.g. chroma_query, llm, web_search)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, t0, time.perf_counter(), parent=trace._node, **attrs)
+
+
+# -------------------------------------------------------
+# Node wrapping
+# -------------------------------------------------------
+def _trace_for(state: dict) -> Trace:
+    trace_id = state.get("trace_id")
+    with _lock:
+        trace = _active.get(trace_id) if trace_id else None
+        if trace is None:
+            trace = Trace(trace_id)
+            _active[trace.trace_id] = trace
+    state["trace_id"] = trace.trace_id
+    return trace
+
+
+def finish(trace_id: str, state: dict | None = None) -> dict | None:
+    """Close a trace: export it, feed the metrics registry, keep it for the debug panel."""
+    with _lock:
+        trace = _active.pop(trace_id, None)
+    if trace is None:
+        return None
+    if state:
+        if state.get("route"):
+            trace.attrs.setdefault("route", state["route"])
+        report = state.get("history") or {}
+        if report:
+            trace.attrs.setdefault("history_saved_tokens", report.get("saved_tokens", 0))
+    data = trace.to_dict()
+    with _lock:
+        _recent.append(data)
+    _record_metrics(data)
+    _export(data)
+    return data
+
+
+def traced_node(name: str, fn, final: bool = False):
+    """
+    Wrap a graph node (sync or async) in a span named `name`.
+    The trace id travels in state["trace_id"]; the `final` node closes the trace.
+    """
+    if not TRACE_ENABLED:
+        return fn
+
+    def _enter(state):
+        trace = _trace_for(state)
+        trace._node = name
+        return trace, _current.set(trace), time.perf_counter()
+
+    def _exit(state, trace, token, t0, error=None):
+        trace.add_span(name, t0, time.perf_counter(), **({"error": error} if error else {}))
+        trace._node = None
+        _current.reset(token)
+        if error:
+            trace.attrs["error"] = f"{name}: {error}"
+        if final or error:
+            finish(trace.trace_id, state)
+
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state):
+            trace, token, t0 = _enter(state)
+            try:
+                result = await fn(state)
+            except Exception as e:
+                _exit(state, trace, token, t0, error=str(e))
+                raise
+            _exit(result if result is not None else state, trace, token, t0)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        trace, token, t0 = _enter(state)
+        try:
+            result = fn(state)
+        except Exception as e:
+            _exit(state, trace, token, t0, error=str(e))
+            raise
+        _exit(result if result is not None else state, trace, token, t0)
+        return result
+
+    return wrapper
+
+
+def get_trace(trace_id: str) -> dict | None:
+    with _lock:
+        for trace in reversed(_recent):
+            if trace["trace_id"] == trace_id:
+                return trace
+    return None
+
+
+def recent_traces(n: int = 20) -> list[dict]:
+    with _lock:
+        return list(_recent)[-n:]
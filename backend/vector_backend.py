@@ -0,0 +1,230 @@
+# backend/vector_backend.py
+# Exact-search NumPy backend for the (small) course corpus, Chroma-compatible interface
+#
+#   python -m backend.vector_backend export   # dump course_rag → vectorstore/course_matrix.*
+#   python -m backend.vector_backend bench    # compare Chroma vs NumPy query latency
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+MATRIX_PREFIX = os.path.join(PROJECT_ROOT, "vectorstore", "course_matrix")
+
+
+def _matches(meta: dict, where: dict | None) -> bool:
+    """Subset of Chroma's `where` syntax: equality, $eq, $ne, $in, $nin, $and, $or."""
+    if not where:
+        return True
+    meta = meta or {}
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(_matches(meta, c) for c in cond):
+                return False
+        elif key == "$or":
+            if not any(_matches(meta, c) for c in cond):
+                return False
+        elif isinstance(cond, dict):
+            op, val = next(iter(cond.items()))
+            have = meta.get(key)
+            ok = {
+                "$eq": lambda: have == val,
+                "$ne": lambda: have != val,
+                "$in": lambda: have in val,
+                "$nin": lambda: have not in val,
+            }.get(op)
+            if ok is None:
+                raise ValueError(f"Unsupported where operator: {op}")
+            if not ok():
+                return False
+        elif meta.get(key) != cond:
+            return False
+    return True
+
+
+class NumpyCollection:
+    """
+    All chunk embeddings in one contiguous (n, dim) matrix with L2-normalized rows,
+    so cosine similarity for a batch of queries is a single matrix product.
+    Implements the parts of the Chroma collection API the backend uses:
+    query(), get(), count().
+
+    A float16 matrix halves the file on disk; NumPy has no fast float16
+    matmul, so it is upcast to float32 once, on the first query.
+    """
+
+    def __init__(self, ids, documents, metadatas, matrix):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = [m or {} for m in metadatas]
+        self.matrix = matrix
+        self._pos = {cid: i for i, cid in enumerate(self.ids)}
+        self._scan = matrix if matrix.dtype == np.float32 else None
+
+    # ----------------------------
+    # Build / persist
+    # ----------------------------
+    @classmethod
+    def from_collection(cls, collection, dtype: str = "float32"):
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        matrix = np.asarray(data["embeddings"], dtype=np.float32).reshape(len(data["ids"]), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = (matrix / np.maximum(norms, 1e-12)).astype(dtype)
+        return cls(data["ids"], data["documents"], data["metadatas"], matrix)
+
+    def save(self, prefix: str = MATRIX_PREFIX, fingerprint: str | None = None):
+        np.save(prefix + ".npy", np.ascontiguousarray(self.matrix))
+        with open(prefix + ".json", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "fingerprint": fingerprint,
+                    "dtype": str(self.matrix.dtype),
+                    "ids": self.ids,
+                    "documents": self.documents,
+                    "metadatas": self.metadatas,
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, prefix: str = MATRIX_PREFIX, mmap: bool = True):
+        with open(prefix + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        matrix = np.load(prefix + ".npy", mmap_mode="r" if mmap else None)
+        obj = cls(meta["ids"], meta["documents"], meta["metadatas"], matrix)
+        obj.fingerprint = meta.get("fingerprint")
+        return obj
+
+    @staticmethod
+    def stored_fingerprint(prefix: str = MATRIX_PREFIX):
+        try:
+            with open(prefix + ".json", "r", encoding="utf-8") as f:
+                return json.load(f).get("fingerprint")
+        except (OSError, ValueError):
+            return None
+
+    # ----------------------------
+    # Chroma-compatible API
+    # ----------------------------
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _scan_matrix(self) -> np.ndarray:
+        """float32 view of the matrix that queries multiply against."""
+        if self._scan is None:
+            self._scan = np.ascontiguousarray(self.matrix, dtype=np.float32)
+        return self._scan
+
+    def _allowed(self, where):
+        if not where:
+            return None
+        return np.array([i for i, m in enumerate(self.metadatas) if _matches(m, where)], dtype=np.int64)
+
+    def query(self, query_embeddings, n_results: int = 10, where=None, include=None):
+        include = include or ["documents", "metadatas", "distances"]
+        q = np.asarray(query_embeddings, dtype=np.float32)
+        if q.ndim == 1:
+            q = q[None, :]
+        q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+
+        allowed = self._allowed(where)
+        scan = self._scan_matrix()
+        matrix = scan if allowed is None else scan[allowed]
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+        if matrix.shape[0] == 0:
+            for key in out:
+                out[key] = [[] for _ in range(len(q))]
+            return {k: v for k, v in out.items() if k == "ids" or k in include}
+
+        # (n_queries, n_chunks) cosine similarities in one product
+        sims = q @ matrix.T
+        k = min(n_results, sims.shape[1])
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+
+        for row, cand in zip(sims, top):
+            cand = cand[np.argsort(-row[cand])]
+            pos = cand if allowed is None else allowed[cand]
+            out["ids"].append([self.ids[p] for p in pos])
+            out["documents"].append([self.documents[p] for p in pos])
+            out["metadatas"].append([self.metadatas[p] for p in pos])
+            out["distances"].append((1.0 - row[cand]).tolist())
+            out["embeddings"].append(scan[pos])
+        return {k: v for k, v in out.items() if k == "ids" or k in include}
+
+    def get(self, ids=None, where=None, include=None):
+        include = ["documents", "metadatas"] if include is None else include
+        if ids is not None:
+            pos = [self._pos[i] for i in ids if i in self._pos]
+        else:
+            allowed = self._allowed(where)
+            pos = list(range(len(self.ids))) if allowed is None else allowed.tolist()
+        if ids is not None and where:
+            pos = [p for p in pos if _matches(self.metadatas[p], where)]
+
+        out = {"ids": [self.ids[p] for p in pos]}
+        if "documents" in include:
+            out["documents"] = [self.documents[p] for p in pos]
+        if "metadatas" in include:
+            out["metadatas"] = [self.metadatas[p] for p in pos]
+        if "embeddings" in include:
+            out["embeddings"] = np.asarray(self.matrix[pos], dtype=np.float32)
+        return out
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def _bench(n_queries: int, k: int, batch: int):
+    from backend.tools_rag import get_chroma_collection
+
+    chroma = get_chroma_collection()
+    data = chroma.get(include=["embeddings"])
+    emb = np.asarray(data["embeddings"], dtype=np.float32)
+    rng = np.random.default_rng(0)
+    queries = emb[rng.integers(0, len(emb), n_queries)] + rng.normal(0, 0.01, (n_queries, emb.shape[1])).astype(np.float32)
+
+    engines = {"chroma": chroma}
+    for dtype in ("float32", "float16"):
+        engines[f"numpy-{dtype}"] = NumpyCollection.from_collection(chroma, dtype=dtype)
+
+    print(f"{len(emb)} chunks, {n_queries} queries, k={k}")
+    for name, engine in engines.items():
+        t0 = time.perf_counter()
+        for q in queries:
+            engine.query(query_embeddings=[q.tolist()], n_results=k)
+        single = (time.perf_counter() - t0) / n_queries * 1000
+
+        t0 = time.perf_counter()
+        for i in range(0, n_queries, batch):
+            engine.query(query_embeddings=queries[i:i + batch].tolist(), n_results=k)
+        batched = (time.perf_counter() - t0) / n_queries * 1000
+        print(f"{name:>14}: {single:.3f} ms/query single, {batched:.3f} ms/query in batches of {batch}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NumPy exact-search backend for course_rag.")
+    parser.add_argument("command", choices=["export", "bench"])
+    parser.add_argument("--dtype", default=os.getenv("RAG_NUMPY_DTYPE", "float32"), choices=["float32", "float16"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        from backend.tools_rag import export_numpy_index
+
+        coll = export_numpy_index(dtype=args.dtype)
+        print(f"✅ Exported {coll.count()} chunks → {MATRIX_PREFIX}.npy ({args.dtype})")
+    else:
+        _bench(args.queries, args.k, args.batch)
+
+
+if __name__ == "__main__":
+    main()
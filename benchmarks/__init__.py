@@ -0,0 +1,2 @@
+# benchmarks/
+# Offline benchmarks (fake Groq / Tavily): python -m benchmarks.components
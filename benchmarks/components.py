@@ -0,0 +1,134 @@
+# benchmarks/components.py
+# Offline component benchmarks: fake Groq/Tavily, real embeddings + Chroma.
+#
+#   python -m benchmarks.components                                   # print table
+#   python -m benchmarks.components --save benchmarks/baseline.json   # record a baseline
+#   python -m benchmarks.components --compare benchmarks/baseline.json
+
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks import harness
+from benchmarks.fakes import install_fakes
+
+GENERAL_QUERIES = [
+    "Explain gradient descent",
+    "How does a decision tree work?",
+    "What is the kernel trick?",
+    "What is the difference between bagging and boosting?",
+    "Explain overfitting with a simple example",
+    "How does k-means clustering work?",
+]
+
+
+def _queries(n: int, seed: int) -> list[str]:
+    """Deterministic mix of course questions (discussion topics) and generic ML questions."""
+    from backend.quiz_agent import get_topics
+
+    rng = random.Random(seed)
+    course = [f"According to the course, {t['question']}" for t in get_topics()]
+    pool = course + GENERAL_QUERIES
+    return [rng.choice(pool) for _ in range(n)]
+
+
+def run(n: int = 50, seed: int = 0, latencies: dict | None = None, answer_cache: bool = False) -> dict:
+    from langchain_core.messages import HumanMessage
+
+    workdir = tempfile.mkdtemp(prefix="assistant-bench-")
+    fakes = install_fakes(workdir, answer_cache=answer_cache, **(latencies or {}))
+
+    from backend import graph_ml_assistant, memory
+    from backend.tools_rag import course_docs_search, retrieve, rag_is_sufficient
+    from backend.router_agent import classify_query
+    from backend.quiz_agent import generate_quiz, chapters
+
+    queries = _queries(n, seed)
+    rag_results = [retrieve(q) for q in queries[:10]]
+    rng = random.Random(seed)
+    chapter_list = chapters()
+    graph_app = graph_ml_assistant.graph_app
+
+    results = {}
+    results["retrieve"] = harness.measure(retrieve, queries)
+    results["course_docs_search"] = harness.measure(course_docs_search.invoke, queries)
+    results["recall_memory"] = harness.measure(lambda q: memory.recall_memory(q, k=3, user_id="bench"), queries)
+    results["store_memory"] = harness.measure(
+        lambda q: memory.store_memory(f"{q} (note {rng.random()})", user_id="bench"), queries
+    )
+    results["store_memory+flush"] = harness.measure(
+        lambda q: (memory.store_memory(f"{q} (note {rng.random()})", user_id="bench"), memory.writer.flush()),
+        queries,
+    )
+    results["classify_query"] = harness.measure(classify_query, queries)
+    # Cache off: this times topic selection + the (fake) LLM call, not a deque pop
+    results["generate_quiz"] = harness.measure(
+        lambda ch: generate_quiz(chapter=ch, n_questions=5, use_cache=False),
+        [rng.choice(chapter_list) for _ in range(max(5, n // 5))],
+    )
+    results["rag_is_sufficient"] = harness.measure(rag_is_sufficient, (rag_results * (n // len(rag_results) + 1))[:n])
+    results["graph_app.invoke"] = harness.measure(
+        lambda q: graph_app.invoke({"messages": [HumanMessage(content=q)], "user_id": "bench"}),
+        queries,
+    )
+    memory.writer.flush()
+    fakes["web"].stop()
+
+    return {
+        "environment": harness.environment(),
+        "config": {
+            "n": n,
+            "seed": seed,
+            "latencies": latencies or {},
+            "answer_cache": answer_cache,
+        },
+        "calls": {name: getattr(f, "calls", None) or getattr(f, "requests", None) for name, f in fakes.items()},
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline component benchmarks (fake LLM + fake web).")
+    parser.add_argument("--n", type=int, default=50, help="calls per component")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake teacher/quiz LLM latency (s)")
+    parser.add_argument("--router-latency", type=float, default=0.1, help="fake router LLM latency (s)")
+    parser.add_argument("--web-latency", type=float, default=0.4, help="fake Tavily latency (s)")
+    parser.add_argument("--answer-cache", action="store_true", help="keep the semantic answer cache on")
+    parser.add_argument("--save", metavar="PATH", help="write the report as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="compare p95 against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 slowdown (fraction)")
+    args = parser.parse_args(argv)
+
+    report = run(
+        n=args.n,
+        seed=args.seed,
+        latencies={
+            "llm_latency_s": args.llm_latency,
+            "router_latency_s": args.router_latency,
+            "web_latency_s": args.web_latency,
+        },
+        answer_cache=args.answer_cache,
+    )
+    harness.print_table(report["results"])
+    print(json.dumps(report["calls"]))
+
+    if args.save:
+        harness.save_report(report, args.save)
+        print(f"✅ Saved → {args.save}")
+    if args.compare:
+        regressions = harness.compare(report, args.compare, tolerance=args.tolerance)
+        if regressions:
+            print(f"❌ Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# benchmarks/embed_batching.py
+# Query-embedding throughput with and without the micro-batching scheduler
+# (backend/embeddings.py: MicroBatcher) at several numbers of concurrent callers.
+#
+#   python -m benchmarks.embed_batching
+#   python -m benchmarks.embed_batching --concurrency 1 8 32 --n 512 --wait-ms 3 --max-batch 32
+#   python -m benchmarks.embed_batching --save benchmarks/embed_batching.json
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend import embeddings
+from benchmarks import harness
+from benchmarks.components import _queries
+
+
+def _direct(text: str):
+    # What every session did before: its own batch-of-one forward pass (no cache)
+    return embeddings._encode_uncached([text], 1)[0]
+
+
+def _timed_calls(fn, texts: list[str], concurrency: int) -> dict:
+    """Call fn(text) for every text from `concurrency` threads; summarize per-call latency."""
+    def call(text):
+        t0 = time.perf_counter()
+        fn(text)
+        return time.perf_counter() - t0
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(call, texts))
+    return harness.summarize(latencies, time.perf_counter() - t_start)
+
+
+def run(concurrency: list[int], n: int = 256, max_batch: int = 32, wait_ms: float = 3.0, seed: int = 0) -> dict:
+    # Unique texts: every call is a cache miss and reaches the model
+    texts = [f"{q} ({i})" for i, q in enumerate(_queries(n, seed))]
+    embeddings.get_model()
+    _direct(texts[0])                                          # warm-up
+
+    batcher = embeddings.MicroBatcher(
+        lambda batch: embeddings._encode_uncached(batch, max_batch),
+        max_batch=max_batch,
+        max_wait_ms=wait_ms,
+    )
+    batcher.submit(texts[0]).result()
+
+    rows = []
+    for c in concurrency:
+        direct = _timed_calls(_direct, texts, c)
+        before = batcher.stats()
+        batched = _timed_calls(lambda t: batcher.submit(t).result(), texts, c)
+        after = batcher.stats()
+        n_batches = after["batches"] - before["batches"]
+        row = {
+            "concurrency": c,
+            "direct": direct,
+            "microbatch": batched,
+            "mean_batch": round((after["items"] - before["items"]) / max(1, n_batches), 2),
+            "speedup": round(batched["throughput_per_s"] / direct["throughput_per_s"], 2)
+            if direct["throughput_per_s"] else None,
+        }
+        rows.append(row)
+        _print_row(row)
+
+    return {
+        "environment": harness.environment(),
+        "config": {
+            "model": embeddings.MODEL_NAME,
+            "device": embeddings.stats()["device"],
+            "n": n,
+            "max_batch": max_batch,
+            "wait_ms": wait_ms,
+        },
+        "results": rows,
+    }
+
+
+def _print_header():
+    print(
+        f"{'callers':>8}{'direct/s':>10}{'batched/s':>11}{'speedup':>9}{'batch':>7}"
+        f"{'direct p95':>12}{'batched p95':>13}"
+    )
+
+
+def _print_row(r: dict):
+    print(
+        f"{r['concurrency']:>8}{r['direct']['throughput_per_s']:>10.1f}{r['microbatch']['throughput_per_s']:>11.1f}"
+        f"{(r['speedup'] or 0):>8.2f}x{r['mean_batch']:>7.1f}"
+        f"{r['direct']['p95_ms']:>12.2f}{r['microbatch']['p95_ms']:>13.2f}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embedding throughput: per-call encode vs micro-batching.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--n", type=int, default=256, help="encodes per concurrency level")
+    parser.add_argument("--max-batch", type=int, default=embeddings.EMBED_MICROBATCH_SIZE)
+    parser.add_argument("--wait-ms", type=float, default=embeddings.EMBED_BATCH_WAIT_MS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    _print_header()
+    report = run(args.concurrency, n=args.n, max_batch=args.max_batch, wait_ms=args.wait_ms, seed=args.seed)
+    print(json.dumps(report["config"]))
+    if args.save:
+        harness.save_report(report, args.save)
+        print(f"✅ Saved → {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# benchmarks/fakes.py
+# Deterministic stand-ins for Groq and Tavily, so the backend can be timed offline
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+COURSE_WORDS = ("course", "slide", "lecture", "chapter", "according to")
+
+
+# -------------------------------------------------------
+# Fake chat model (Groq)
+# -------------------------------------------------------
+class FakeChatModel(BaseChatModel):
+    """Chat model that sleeps `latency_s` and returns reply(messages)."""
+
+    reply: Callable[[list], str]
+    latency_s: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _result(self, messages) -> ChatResult:
+        self.calls += 1
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply(messages)))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency_s)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency_s)
+        return self._result(messages)
+
+
+def _last_human(messages) -> str:
+    for m in reversed(messages):
+        if isinstance(m, HumanMessage):
+            return m.content
+    return ""
+
+
+def teacher_reply(messages) -> str:
+    # Long enough (> 200 chars) that the memory writer stores it, like real answers
+    question = _last_human(messages)[:80]
+    return f"Answer to: {question}. " + "This is a deterministic benchmark answer. " * 8
+
+
+def router_reply(messages) -> str:
+    query = _last_human(messages).lower()
+    return "rag_query" if any(w in query for w in COURSE_WORDS) else "general_explanation"
+
+
+def quiz_reply(messages) -> str:
+    ids = [line.split(" | ")[0] for line in _last_human(messages).split("\n\n") if line]
+    return "\n\n".join(
+        f"## Topic {i} — benchmark\n\n**Question:** ?\n\n**Multiple Choice Question:**\n"
+        "```mcq\nA) a\nB) b\nC) c\nD) d\n```"
+        for i in ids
+    )
+
+
+def summary_reply(messages) -> str:
+    return "The student and assistant discussed several ML topics (benchmark summary)."
+
+
+# -------------------------------------------------------
+# Fake Tavily /search endpoint
+# -------------------------------------------------------
+class FakeTavilyServer:
+    """Local HTTP server speaking enough of Tavily's /search API for tools_web."""
+
+    def __init__(self, latency_s: float = 0.0, status: int = 200):
+        self.latency_s = latency_s
+        self.status = status                # set to e.g. 503 to simulate an upstream outage
+        self.requests = 0
+        self.connections = set()            # client (host, port) pairs: keep-alive reuse shows as one
+        self._server = None
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                payload = json.loads(body or b"{}")
+                fake.requests += 1
+                fake.connections.add(self.client_address)
+                time.sleep(fake.latency_s)
+                if fake.status != 200:
+                    data = b'{"detail": "stand-in error"}'
+                    self.send_response(fake.status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                query = payload.get("query", "")
+                data = json.dumps({
+                    "results": [
+                        {
+                            "title": f"Result {i} for {query[:40]}",
+                            "url": f"https://example.org/{i}",
+                            "content": f"Stand-in web content {i} about {query}.",
+                        }
+                        for i in range(int(payload.get("max_results", 5)))
+                    ]
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass            # client timed out / gave up first
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self._server.serve_forever, name="fake-tavily", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+# -------------------------------------------------------
+# Install
+# -------------------------------------------------------
+def install_fakes(
+    workdir: str,
+    llm_latency_s: float = 0.3,
+    router_latency_s: float = 0.1,
+    web_latency_s: float = 0.4,
+    answer_cache: bool = False,
+) -> dict:
+    """
+    Swap every external dependency for a local fake:
+      - llm_teacher / router_llm / quiz_llm / history_llm → FakeChatModel
+      - Tavily → FakeTavilyServer through a real WebSearchClient (no result cache)
+      - long-term memory → in-memory Chroma collection
+      - router decision log, router centroids, embedding cache DB → `workdir`
+    Returns the fakes, for call counts.
+    """
+    from backend import embeddings, graph_ml_assistant, history, memory, router_agent, router_local, quiz_agent, tools_web
+
+    os.makedirs(workdir, exist_ok=True)
+
+    fakes = {
+        "llm_teacher": FakeChatModel(reply=teacher_reply, latency_s=llm_latency_s),
+        "router_llm": FakeChatModel(reply=router_reply, latency_s=router_latency_s),
+        "quiz_llm": FakeChatModel(reply=quiz_reply, latency_s=llm_latency_s),
+        "history_llm": FakeChatModel(reply=summary_reply, latency_s=llm_latency_s),
+    }
+    graph_ml_assistant._llm_teacher.override(fakes["llm_teacher"])
+    router_agent._router_llm.override(fakes["router_llm"])
+    quiz_agent._quiz_llm.override(fakes["quiz_llm"])
+    history._history_llm.override(fakes["history_llm"])
+
+    web = fakes["web"] = FakeTavilyServer(latency_s=web_latency_s).start()
+    tools_web._client = tools_web.WebSearchClient(api_key="benchmark", base_url=web.url, cache_path=None)
+
+    import chromadb
+
+    memory._memory_collection.override(
+        chromadb.EphemeralClient().get_or_create_collection(
+            name=f"bench_memory_{uuid.uuid4().hex[:8]}",
+            metadata={"hnsw:space": "cosine"},
+        )
+    )
+
+    router_local.DECISION_LOG = os.path.join(workdir, "router_decisions.jsonl")
+    router_local.CENTROIDS_PATH = os.path.join(workdir, "router_centroids.json")
+    router_local._centroids.reset()
+    embeddings.EMBED_CACHE_DB = os.path.join(workdir, "embedding_cache.db")
+    embeddings._cache.reset()
+    # Repeated benchmark questions would otherwise be answered from the cache
+    graph_ml_assistant.ANSWER_CACHE_ENABLED = answer_cache
+    return fakes
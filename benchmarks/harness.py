@@ -0,0 +1,104 @@
+# benchmarks/harness.py
+# Timing, percentiles, peak RSS and baseline comparison shared by the benchmarks
+
+import os
+import sys
+import json
+import math
+import time
+import platform
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unknown)."""
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, KB on Linux
+        return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+    except Exception:
+        return None
+
+
+def percentile(sorted_vals: list, p: float):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_vals:
+        return None
+    rank = max(0, min(len(sorted_vals) - 1, math.ceil(p / 100 * len(sorted_vals)) - 1))
+    return sorted_vals[rank]
+
+
+def summarize(latencies_s: list, wall_s: float) -> dict:
+    ms = sorted(x * 1000 for x in latencies_s)
+    return {
+        "n": len(ms),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "mean_ms": round(sum(ms) / len(ms), 3),
+        "throughput_per_s": round(len(ms) / wall_s, 2) if wall_s > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def measure(fn, inputs: list, warmup: int = 1) -> dict:
+    """Call fn(x) for every input (after `warmup` untimed calls) and summarize."""
+    for x in inputs[:warmup]:
+        fn(x)
+    latencies = []
+    t_start = time.perf_counter()
+    for x in inputs:
+        t0 = time.perf_counter()
+        fn(x)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - t_start)
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def save_report(report: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, path)
+
+
+def compare(report: dict, baseline_path: str, tolerance: float = 0.2, metric: str = "p95_ms") -> list[str]:
+    """
+    Components whose `metric` got worse than the baseline by more than
+    `tolerance` (fraction). Prints a comparison table.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = []
+    print(f"\n{'component':<28}{'baseline':>12}{'now':>12}{'change':>10}  ({metric})")
+    for name, now in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get(metric):
+            print(f"{name:<28}{'-':>12}{now[metric]:>12.2f}")
+            continue
+        change = now[metric] / base[metric] - 1
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"{name:<28}{base[metric]:>12.2f}{now[metric]:>12.2f}{change:>+10.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def print_table(results: dict):
+    print(f"{'component':<28}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'RSS MB':>9}")
+    for name, r in results.items():
+        print(
+            f"{name:<28}{r['n']:>6}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+            f"{(r['throughput_per_s'] or 0):>10.1f}{(r['peak_rss_mb'] or 0):>9.0f}"
+        )
@@ -0,0 +1,230 @@
+# benchmarks/retrieval_eval.py
+# Offline retrieval evaluation over a grid of chunking / k / retrieval-mode settings.
+#
+#   python -m benchmarks.retrieval_eval                          # default grid
+#   python -m benchmarks.retrieval_eval --chunk-sizes 300 500 800 --overlaps 0 100 --ks 3 5 10
+#   python -m benchmarks.retrieval_eval --save benchmarks/retrieval_eval.json
+#
+# Questions: discussion_topics.json (labelled with the decks of their chapter)
+# plus benchmarks/data/retrieval_gold.json (hand-labelled question → decks).
+# A hit is a retrieved chunk from one of the question's decks.
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend import embeddings
+from backend.build_index import TEXT_DIR, load_documents, make_splitter, chunk_id, deck_metadata
+from backend.lexical_index import BM25Index, reciprocal_rank_fusion
+from backend.vector_backend import NumpyCollection
+from benchmarks import harness
+
+GOLD_PATH = os.path.join(os.path.dirname(__file__), "data", "retrieval_gold.json")
+TOPICS_PATH = os.path.join(PROJECT_ROOT, "course_materials", "discussion_topics.json")
+MODES = ("dense", "hybrid")
+
+
+# -------------------------------------------------------
+# Eval set
+# -------------------------------------------------------
+def deck_chapter(filename: str) -> str | None:
+    """Leading number of a deck file name: '10_3_CLOUD_AI_...' → '10'."""
+    return deck_metadata(filename).get("chapter")
+
+
+def load_eval_set(text_dir: str = TEXT_DIR, gold_path: str = GOLD_PATH, topics: bool = True) -> list[dict]:
+    """[{"question", "sources", "set"}]; topic questions are labelled with their chapter's decks."""
+    items = []
+    with open(gold_path, "r", encoding="utf-8") as f:
+        for g in json.load(f):
+            items.append({"question": g["question"], "sources": set(g["sources"]), "set": "gold"})
+
+    if topics:
+        decks = [f for f in os.listdir(text_dir) if f.endswith(".txt")]
+        with open(TOPICS_PATH, "r", encoding="utf-8") as f:
+            for t in json.load(f):
+                chapter = str(t["id"]).split(".")[0]
+                sources = {d for d in decks if deck_chapter(d) == chapter}
+                if sources:
+                    items.append({"question": t["question"], "sources": sources, "set": "topics"})
+    return items
+
+
+# -------------------------------------------------------
+# Index build (in memory: exact NumPy search + BM25)
+# -------------------------------------------------------
+def build_index(documents: dict, chunk_size: int, chunk_overlap: int, dtype: str = "float32") -> dict:
+    t0 = time.perf_counter()
+    splitter = make_splitter(chunk_size, chunk_overlap)
+    ids, docs, metas, seen = [], [], [], set()
+    for name, text in documents.items():
+        for chunk in splitter.split_text(text):
+            cid = chunk_id(name, chunk)
+            if cid in seen:
+                continue
+            seen.add(cid)
+            ids.append(cid)
+            docs.append(chunk)
+            metas.append(deck_metadata(name))
+
+    vectors = np.asarray(embeddings.encode_many(docs, use_cache=False), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    dense = NumpyCollection(ids, docs, metas, vectors.astype(dtype))
+    lexical = BM25Index(ids, docs, metas)
+    build_s = time.perf_counter() - t0
+
+    return {
+        "dense": dense,
+        "lexical": lexical,
+        "n_chunks": len(ids),
+        "build_s": round(build_s, 2),
+        "index_mb": round((dense.matrix.nbytes + sum(len(d.encode("utf-8")) for d in docs)) / 2**20, 2),
+    }
+
+
+def retrieve(index: dict, query: str, query_vec, k: int, mode: str, candidates: int) -> list[str]:
+    """Sources of the top-k chunks, best first (same fusion as tools_rag._search)."""
+    dense = index["dense"]
+    res = dense.query(query_embeddings=[query_vec], n_results=max(k, candidates) if mode == "hybrid" else k)
+    if mode == "dense":
+        return [m["source"] for m in res["metadatas"][0][:k]]
+
+    lex = index["lexical"]
+    lexical = [p for p, _ in lex.search(query, candidates)]
+    fused = reciprocal_rank_fusion([res["ids"][0], [lex.ids[p] for p in lexical]])[:k]
+    source_of = dict(zip(res["ids"][0], (m["source"] for m in res["metadatas"][0])))
+    source_of.update({lex.ids[p]: lex.metadatas[p]["source"] for p in lexical})
+    return [source_of[cid] for cid in fused]
+
+
+def score(ranked_sources: list[list[str]], items: list[dict], k: int) -> dict:
+    """recall@k (any gold deck in the top k) and MRR@k (rank of the first gold chunk)."""
+    hits, rr = 0, 0.0
+    for sources, item in zip(ranked_sources, items):
+        for rank, src in enumerate(sources[:k], start=1):
+            if src in item["sources"]:
+                hits += 1
+                rr += 1.0 / rank
+                break
+    n = max(1, len(items))
+    return {"recall": round(hits / n, 4), "mrr": round(rr / n, 4)}
+
+
+# -------------------------------------------------------
+# Grid
+# -------------------------------------------------------
+def run_grid(
+    chunk_sizes: list[int],
+    overlaps: list[int],
+    ks: list[int],
+    modes: list[str] = MODES,
+    candidates: int = 10,
+    topics: bool = True,
+) -> dict:
+    documents = load_documents()
+    items = load_eval_set(topics=topics)
+    questions = [it["question"] for it in items]
+
+    t0 = time.perf_counter()
+    query_vecs = embeddings.encode_many(questions, use_cache=False)
+    embed_ms = (time.perf_counter() - t0) / max(1, len(questions)) * 1000
+
+    rows = []
+    for size in chunk_sizes:
+        for overlap in overlaps:
+            if overlap >= size:
+                continue
+            index = build_index(documents, size, overlap)
+            for mode in modes:
+                for k in ks:
+                    latencies, ranked = [], []
+                    for q, vec in zip(questions, query_vecs):
+                        t = time.perf_counter()
+                        ranked.append(retrieve(index, q, vec, k, mode, candidates))
+                        latencies.append(time.perf_counter() - t)
+
+                    row = {
+                        "chunk_size": size,
+                        "chunk_overlap": overlap,
+                        "mode": mode,
+                        "k": k,
+                        "n_chunks": index["n_chunks"],
+                        "index_mb": index["index_mb"],
+                        "build_s": index["build_s"],
+                        **score(ranked, items, k),
+                    }
+                    for name in ("gold", "topics"):
+                        subset = [i for i, it in enumerate(items) if it["set"] == name]
+                        if subset:
+                            s = score([ranked[i] for i in subset], [items[i] for i in subset], k)
+                            row[f"recall_{name}"] = s["recall"]
+                    lat = harness.summarize(latencies, sum(latencies))
+                    row["query_p50_ms"] = lat["p50_ms"]
+                    row["query_p95_ms"] = lat["p95_ms"]
+                    rows.append(row)
+                    _print_row(row)
+
+    return {
+        "environment": harness.environment(),
+        "config": {
+            "model": embeddings.MODEL_NAME,
+            "questions": len(items),
+            "gold_questions": sum(1 for it in items if it["set"] == "gold"),
+            "candidates": candidates,
+            "query_embed_ms": round(embed_ms, 3),
+        },
+        "results": rows,
+    }
+
+
+def _print_header():
+    print(
+        f"{'size':>5}{'ovl':>5}{'mode':>8}{'k':>4}{'chunks':>8}{'MB':>7}{'build s':>9}"
+        f"{'recall':>8}{'MRR':>7}{'gold':>7}{'p50 ms':>8}{'p95 ms':>8}"
+    )
+
+
+def _print_row(r: dict):
+    print(
+        f"{r['chunk_size']:>5}{r['chunk_overlap']:>5}{r['mode']:>8}{r['k']:>4}{r['n_chunks']:>8}"
+        f"{r['index_mb']:>7.2f}{r['build_s']:>9.1f}{r['recall']:>8.3f}{r['mrr']:>7.3f}"
+        f"{r.get('recall_gold', 0):>7.3f}{r['query_p50_ms']:>8.2f}{r['query_p95_ms']:>8.2f}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retrieval recall/latency over chunking and k settings.")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[300, 500, 800])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, 100])
+    parser.add_argument("--ks", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--candidates", type=int, default=10, help="per-retriever candidates before fusion")
+    parser.add_argument("--gold-only", action="store_true", help="skip the discussion-topic questions")
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    _print_header()
+    report = run_grid(
+        args.chunk_sizes,
+        args.overlaps,
+        args.ks,
+        modes=args.modes,
+        candidates=args.candidates,
+        topics=not args.gold_only,
+    )
+    print(json.dumps(report["config"]))
+    if args.save:
+        harness.save_report(report, args.save)
+        print(f"✅ Saved → {args.save}")
+
+
+if __name__ == "__main__":
+    main()
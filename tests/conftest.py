@@ -0,0 +1,12 @@
+# tests/conftest.py
+import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Keep module-level default paths (caches, logs, traces) out of the working tree
+os.environ.setdefault("EMBED_CACHE_DB", "")
+os.environ.setdefault("WEB_CACHE_DB", "")
+os.environ.setdefault("TRACE_LOG", "")
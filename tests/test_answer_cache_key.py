@@ -0,0 +1,40 @@
+# tests/test_answer_cache_key.py
+# Which turns may use the semantic answer cache, and under which key
+
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("langchain_groq")
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from backend import graph_ml_assistant as g
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(g, "ANSWER_CACHE_ENABLED", True)
+
+
+def test_follow_up_turns_are_cacheable_without_memory():
+    first = {"messages": [HumanMessage(content="what is an lstm?")]}
+    follow_up = {"messages": [HumanMessage(content="hi"), AIMessage(content="hello"), HumanMessage(content="and a gru?")]}
+    assert g._answer_is_cacheable(first)
+    assert g._answer_is_cacheable(follow_up)
+    assert not g._answer_is_cacheable(dict(follow_up, memory="likes pytorch"))
+    assert not g._answer_is_cacheable({"messages": [AIMessage(content="hello")]})
+
+
+def test_cache_context_includes_the_history_window():
+    q = HumanMessage(content="and a gru?")
+    assert g._cache_context({"messages": [q]}, "ctx") == "ctx"
+
+    a = {"messages": [HumanMessage(content="lstm?"), AIMessage(content="gates"), q]}
+    b = {"messages": [HumanMessage(content="cnn?"), AIMessage(content="filters"), q]}
+    assert g._cache_context(a, "ctx") != "ctx"
+    assert g._cache_context(a, "ctx") != g._cache_context(b, "ctx")
+    assert g._cache_context(a, "ctx") == g._cache_context(dict(a), "ctx")
+
+    # The window sent to the teacher (summary + recent turns) is what counts
+    summarized = dict(a, window=[SystemMessage(content="Summary: cnn"), q])
+    assert g._cache_context(summarized, "ctx") != g._cache_context(a, "ctx")
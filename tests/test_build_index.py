@@ -0,0 +1,60 @@
+# tests/test_build_index.py
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("dotenv")
+
+from backend import build_index, tools_rag
+
+
+class StoredIds:
+    """The slice of a Chroma collection sync_index uses."""
+
+    def __init__(self, ids):
+        self.ids = set(ids)
+
+    def get(self, include=None):
+        return {"ids": sorted(self.ids)}
+
+    def upsert(self, ids, **kwargs):
+        self.ids |= set(ids)
+
+    def delete(self, ids):
+        self.ids -= set(ids)
+
+    def count(self):
+        return len(self.ids)
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    coll = StoredIds(["deck.txt-aaaa", "deck.txt-bbbb"])
+    monkeypatch.setattr(tools_rag, "get_chroma_collection", lambda: coll)
+    monkeypatch.setattr(tools_rag, "RAG_BACKEND", "chroma")
+    return coll
+
+
+def test_empty_full_sync_is_refused(tmp_path, collection, capsys):
+    manifest = str(tmp_path / "manifest.json")
+    stats = build_index.sync_index({}, manifest_path=manifest, rebuild=True)
+    assert stats["refused"]
+    assert collection.count() == 2
+    assert build_index.load_manifest(manifest) == {}
+    assert "[INDEX WARNING]" in capsys.readouterr().out
+
+
+def test_empty_sync_with_allow_empty(tmp_path, collection):
+    pytest.importorskip("langchain_text_splitters")
+    manifest = str(tmp_path / "manifest.json")
+    stats = build_index.sync_index({}, manifest_path=manifest, allow_empty=True, verbose=False)
+    assert "refused" not in stats
+    assert stats["deleted"] == 2 and collection.count() == 0
+    assert build_index.load_manifest(manifest)["documents"] == {}
+
+
+def test_cli_exits_nonzero_on_empty_text_dir(tmp_path, collection):
+    with pytest.raises(SystemExit) as exc:
+        build_index.main(["--text-dir", str(tmp_path)])
+    assert exc.value.code == 1
+    assert collection.count() == 2
@@ -0,0 +1,140 @@
+# tests/test_chat_store.py
+
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from backend import chat_store
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "chats.db")
+    get_conn = chat_store.get_conn
+    monkeypatch.setattr(chat_store, "get_conn", lambda p=path: get_conn(p))
+    return path
+
+
+def test_legacy_rows_are_migrated(tmp_path, monkeypatch):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE chats (user_id TEXT, chat_id TEXT, name TEXT, messages TEXT, last_updated REAL)")
+    msgs = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    conn.execute("INSERT INTO chats VALUES ('u1', 'c1', 'First', ?, 100.0)", (json.dumps(msgs),))
+    conn.execute("INSERT INTO chats VALUES ('u1', 'c2', 'Broken', 'not json', 50.0)")
+    conn.commit()
+    conn.close()
+
+    get_conn = chat_store.get_conn
+    monkeypatch.setattr(chat_store, "get_conn", lambda p=path: get_conn(p))
+
+    chats = chat_store.list_chats("u1")
+    assert list(chats) == ["c1", "c2"]
+    assert chats["c1"] == {"name": "First", "last_updated": 100.0, "n_messages": 2}
+    assert chats["c2"]["n_messages"] == 0
+    assert [m["content"] for m in chat_store.load_messages("u1", "c1")] == ["hi", "hello"]
+    assert "chats_legacy" not in {r[0] for r in get_conn(path).execute("SELECT name FROM sqlite_master")}
+
+
+def _legacy_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE chats (user_id TEXT, chat_id TEXT, name TEXT, messages TEXT, last_updated REAL)")
+    msgs = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    conn.execute("INSERT INTO chats VALUES ('u1', 'c1', 'First', ?, 100.0)", (json.dumps(msgs),))
+    conn.commit()
+    conn.close()
+
+
+def _message_count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    path = str(tmp_path / "legacy.db")
+    _legacy_db(path)
+
+    def crash(conn):
+        raise RuntimeError("killed mid-migration")
+
+    migrate = chat_store._migrate_legacy
+    monkeypatch.setattr(chat_store, "_migrate_legacy", crash)
+    with pytest.raises(RuntimeError):
+        chat_store._init_schema(chat_store._connect(path))
+    assert "messages" in chat_store._columns(sqlite3.connect(path), "chats")   # still the old layout
+
+    monkeypatch.setattr(chat_store, "_migrate_legacy", migrate)
+    chat_store._init_schema(chat_store._connect(path))
+    chat_store._init_schema(chat_store._connect(path))      # second open: nothing left to do
+    assert _message_count(path) == 2
+
+
+def test_concurrent_first_opens_migrate_once(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    _legacy_db(path)
+    errors = []
+
+    def open_db():
+        try:
+            chat_store._init_schema(chat_store._connect(path))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=open_db) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert _message_count(path) == 2
+    assert "chats_legacy" not in chat_store._tables(sqlite3.connect(path))
+
+
+def test_append_and_paginate(db):
+    chat_store.create_chat("u1", "c1", "Chat", ts=1.0)
+    n = chat_store.append_messages("u1", "c1", [{"role": "user", "content": f"m{i}"} for i in range(5)], ts=2.0)
+    assert n == 5
+    assert chat_store.append_messages("u1", "c1", [{"role": "assistant", "content": "m5"}], ts=3.0) == 6
+    assert chat_store.list_chats("u1")["c1"] == {"name": "Chat", "last_updated": 3.0, "n_messages": 6}
+
+    newest = chat_store.load_messages("u1", "c1", limit=2)
+    assert [(m["seq"], m["content"]) for m in newest] == [(4, "m4"), (5, "m5")]
+    older = chat_store.load_messages("u1", "c1", limit=3, before_seq=newest[0]["seq"])
+    assert [m["seq"] for m in older] == [1, 2, 3]
+    assert chat_store.load_messages("u2", "c1") == []
+
+
+def test_concurrent_appends_get_distinct_seqs(db):
+    chat_store.create_chat("u1", "c1", "Chat")
+
+    def writer(tag):
+        for i in range(20):
+            chat_store.append_messages("u1", "c1", [{"role": "user", "content": f"{tag}{i}"}])
+
+    threads = [threading.Thread(target=writer, args=(t,)) for t in "ab"]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    msgs = chat_store.load_messages("u1", "c1")
+    assert [m["seq"] for m in msgs] == list(range(40))
+    assert chat_store.list_chats("u1")["c1"]["n_messages"] == 40
+
+
+def test_delete_chat_removes_messages_and_summary(db):
+    chat_store.create_chat("u1", "c1", "Chat")
+    chat_store.append_messages("u1", "c1", [{"role": "user", "content": "hi"}])
+    chat_store.save_summary("u1", "c1", "greeting", upto_seq=1)
+    assert chat_store.get_summary("u1", "c1") == ("greeting", 1)
+
+    chat_store.delete_chat("u1", "c1")
+    assert chat_store.list_chats("u1") == {}
+    assert chat_store.load_messages("u1", "c1") == []
+    assert chat_store.get_summary("u1", "c1") == (None, 0)
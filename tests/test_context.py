@@ -0,0 +1,64 @@
+# tests/test_context.py
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+from backend import context
+
+
+SENT = "Backpropagation applies the chain rule layer by layer. "
+
+
+def test_mmr_skips_near_duplicates():
+    vectors = [[1.0, 0.0], [0.999, 0.01], [0.0, 1.0], [0.7, 0.7]]
+    assert context.mmr(vectors, k=2, lam=0.5) == [0, 2]
+    # Pure relevance keeps the rank order
+    assert context.mmr(vectors, k=3, lam=1.0) == [0, 1, 2]
+    assert context.mmr(vectors[:1], k=3) == [0]
+
+
+def test_merge_overlapping_same_deck_only():
+    a = "Gradient descent moves the weights against the gradient of the loss function"
+    b = "against the gradient of the loss function, scaled by the learning rate."
+    blocks = [
+        {"source": "1_intro.txt", "text": a, "rank": 0},
+        {"source": "2_other.txt", "text": b, "rank": 1},
+        {"source": "1_intro.txt", "text": b, "rank": 2},
+        {"source": "1_intro.txt", "text": "the weights against", "rank": 3},   # contained in a
+    ]
+    merged = context.merge_overlapping(blocks)
+    assert [(m["source"], m["rank"]) for m in merged] == [("1_intro.txt", 0), ("2_other.txt", 1)]
+    assert merged[0]["text"] == a + ", scaled by the learning rate."
+
+
+def test_short_overlap_is_not_merged():
+    blocks = [
+        {"source": "d", "text": "ends with loss", "rank": 0},
+        {"source": "d", "text": "loss starts here", "rank": 1},
+    ]
+    assert len(context.merge_overlapping(blocks)) == 2
+
+
+def test_trim_to_budget_truncates_the_first_block_that_does_not_fit():
+    blocks = [{"source": f"d{i}", "text": SENT * 20, "rank": i} for i in range(3)]
+    one = context.count_tokens(context._render_block(blocks[0]))
+    budget = context.count_tokens(context.HEADER) + one + 100
+
+    out = context.trim_to_budget(blocks, budget)
+    assert [b["source"] for b in out] == ["d0", "d1"]
+    assert out[0]["text"] == blocks[0]["text"]
+    assert out[1]["text"].endswith(".") and len(out[1]["text"]) < len(blocks[1]["text"])
+    assert context.count_tokens(context.render(out)) <= budget
+
+    # Too little room left for a useful excerpt: stop instead
+    assert len(context.trim_to_budget(blocks, budget - 80)) == 1
+
+
+def test_assemble_reports_savings():
+    hits = [{"source": "d0", "document": SENT * 10}, {"source": "d0", "document": SENT * 10}]
+    text, report = context.assemble(hits, budget=1000)
+    assert text.startswith(context.HEADER)
+    assert report["chunks"] == 2 and report["blocks"] == 1
+    assert report["saved_tokens"] == report["verbatim_tokens"] - report["sent_tokens"] > 0
@@ -0,0 +1,61 @@
+# tests/test_embedding_cache.py
+
+from backend.embedding_cache import EmbeddingCache, normalize_text
+
+MODEL = "test-model"
+
+
+def vec(i: int) -> list[float]:
+    return [float(i), 0.5, -1.0]
+
+
+def test_normalize_text():
+    assert normalize_text("  What is\n an   LSTM? ") == "What is an LSTM?"
+    assert normalize_text("  What is\n an   LSTM? ", lowercase=True) == "what is an lstm?"
+
+
+def test_lru_evicts_least_recently_used():
+    cache = EmbeddingCache(max_items=2)
+    cache.put_many(MODEL, ["a", "b"], [vec(1), vec(2)])
+    assert cache.get_many(MODEL, ["a"]) == [vec(1)]      # "a" is now most recent
+    cache.put_many(MODEL, ["c"], [vec(3)])
+    assert cache.get_many(MODEL, ["a", "b", "c"]) == [vec(1), None, vec(3)]
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+
+
+def test_keys_are_per_model_and_case_sensitive_by_default():
+    cache = EmbeddingCache()
+    cache.put_many(MODEL, ["Python  list"], [vec(1)])
+    assert cache.get_many(MODEL, ["Python list", "python list"]) == [vec(1), None]
+    assert cache.get_many("other-model", ["Python list"]) == [None]
+
+    uncased = EmbeddingCache(lowercase=True)
+    uncased.put_many(MODEL, ["Python list"], [vec(1)])
+    assert uncased.get_many(MODEL, ["python LIST"]) == [vec(1)]
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    EmbeddingCache(disk_path=path).put_many(MODEL, ["lstm"], [vec(1)])
+
+    warm = EmbeddingCache(disk_path=path)
+    assert warm.get_many(MODEL, ["lstm"]) == [vec(1)]
+    assert warm.stats()["disk_hits"] == 1
+    assert warm.get_many(MODEL, ["lstm"]) == [vec(1)]
+    assert warm.stats()["hits"] == 1
+
+
+def test_disk_tier_drops_oldest_rows(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = EmbeddingCache(max_items=1, disk_path=path, max_disk_rows=3)
+    for i in range(5):
+        cache.put_many(MODEL, [f"t{i}"], [vec(i)])
+    cache.put_many(MODEL, ["t2"], [vec(2)])               # rewrite moves t2 to the newest end
+    cache.put_many(MODEL, ["t5"], [vec(5)])
+    assert cache.stats()["disk_rows"] == 3
+
+    fresh = EmbeddingCache(disk_path=path, max_disk_rows=3)
+    got = fresh.get_many(MODEL, [f"t{i}" for i in range(6)])
+    assert got == [None, None, vec(2), None, vec(4), vec(5)]
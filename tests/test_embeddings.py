@@ -0,0 +1,126 @@
+# tests/test_embeddings.py
+# Shared embedding service with a stand-in model (no SentenceTransformer download)
+
+import time
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from backend import embeddings
+from backend.embedding_cache import EmbeddingCache
+
+
+class FakeModel:
+    """SentenceTransformer.encode stand-in: a deterministic vector per text."""
+
+    device = "cpu"
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True):
+        self.batches.append(list(texts))
+        return np.asarray([[float(len(t)), float(sum(map(ord, t)) % 97), 1.0] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def model():
+    fake = FakeModel()
+    embeddings._model.override(fake)
+    embeddings._cache.override(EmbeddingCache(max_items=64))
+    yield fake
+    embeddings._model.reset()
+    embeddings._cache.reset()
+
+
+def test_encode_many_serves_repeats_from_the_cache(model):
+    first = embeddings.encode_many(["lstm", "gru", "lstm"])
+    assert model.batches == [["lstm", "gru"]]            # duplicates in one call are encoded once
+    assert first[0] == first[2] != first[1]
+
+    second = embeddings.encode_many(["gru", "attention"])
+    assert second[0] == first[1]
+    assert model.batches == [["lstm", "gru"], ["attention"]]
+
+    # Bulk jobs bypass (and don't fill) the cache
+    embeddings.encode_many(["lstm", "cnn"], use_cache=False)
+    assert model.batches[-1] == ["lstm", "cnn"]
+    embeddings.encode_many(["cnn"])
+    assert model.batches[-1] == ["cnn"]
+
+
+def test_encode_uses_the_same_model_and_cache(model, monkeypatch):
+    monkeypatch.setattr(embeddings, "EMBED_MICROBATCH", False)
+    vec = embeddings.encode("what is an lstm?")
+    assert embeddings.encode("what is an lstm?") == vec
+    assert embeddings.encode_many(["what is an lstm?"]) == [vec]
+    assert model.batches == [["what is an lstm?"]]
+
+    stats = embeddings.stats()
+    assert stats["loaded"] and stats["cache"]["hits"] == 2
+
+
+# -------------------------------------------------------
+# Micro-batching
+# -------------------------------------------------------
+class GatedEncoder:
+    """encode_fn for MicroBatcher: records batches, blocks while `gate` is clear."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Event()
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.started.set()
+        self.gate.wait(5)
+        if "boom" in texts:
+            raise RuntimeError("model crashed")
+        return [[float(len(t))] for t in texts]
+
+
+def test_lone_request_does_not_wait_for_the_window():
+    enc = GatedEncoder()
+    batcher = embeddings.MicroBatcher(enc, max_batch=8, max_wait_ms=1000)
+    t0 = time.perf_counter()
+    assert batcher.submit("lstm").result(timeout=5) == [4.0]
+    assert time.perf_counter() - t0 < 0.5
+    assert enc.batches == [["lstm"]]
+
+
+def test_concurrent_requests_share_one_batch_and_dedup():
+    enc = GatedEncoder()
+    batcher = embeddings.MicroBatcher(enc, max_batch=8, max_wait_ms=50)
+    enc.gate.clear()
+    first = batcher.submit("warm")
+    assert enc.started.wait(5)                           # worker busy with the first batch
+
+    texts = ["what is attention?", "what is attention?", "gru", "lstm", "gru"]
+    futures = [batcher.submit(t) for t in texts]
+    enc.gate.set()
+
+    assert first.result(timeout=5) == [4.0]
+    assert [f.result(timeout=5) for f in futures] == [[float(len(t))] for t in texts]
+    assert enc.batches[1] == ["what is attention?", "gru", "lstm"]
+    stats = batcher.stats()
+    assert (stats["batches"], stats["items"], stats["max_batch_seen"]) == (2, 6, 3)
+
+
+def test_batch_error_reaches_every_caller_and_worker_survives():
+    enc = GatedEncoder()
+    batcher = embeddings.MicroBatcher(enc, max_batch=8, max_wait_ms=50)
+    enc.gate.clear()
+    blocker = batcher.submit("warm")
+    assert enc.started.wait(5)
+    failing = [batcher.submit("boom"), batcher.submit("ok")]
+    enc.gate.set()
+
+    blocker.result(timeout=5)
+    for f in failing:
+        with pytest.raises(RuntimeError):
+            f.result(timeout=5)
+    assert batcher.submit("again").result(timeout=5) == [5.0]
@@ -0,0 +1,78 @@
+# tests/test_history.py
+# Token-budgeted history window with the rolling summary cached in chat_store
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from backend import chat_store, history
+from benchmarks.fakes import FakeChatModel, summary_reply
+
+
+@pytest.fixture
+def summarizer(tmp_path, monkeypatch):
+    path = str(tmp_path / "chats.db")
+    get_conn = chat_store.get_conn
+    monkeypatch.setattr(chat_store, "get_conn", lambda p=path: get_conn(p))
+    fake = FakeChatModel(reply=summary_reply)
+    history._history_llm.override(fake)
+    yield fake
+    history._history_llm.reset()
+
+
+def chat(n: int) -> list:
+    """n messages of 25 tokens each, alternating student / assistant."""
+    return [
+        (HumanMessage if i % 2 == 0 else AIMessage)(content=f"{i:02d} " + "x" * 77)
+        for i in range(n)
+    ]
+
+
+def test_short_history_is_sent_verbatim(summarizer):
+    messages = chat(3)
+    window, report = history.build_window(messages, "u1", "c1", budget=1000)
+    assert window == messages
+    assert report["saved_tokens"] == 0 and not report["summarized"]
+    assert summarizer.calls == 0
+
+
+def test_overflow_folds_into_cached_summary(summarizer):
+    messages = chat(10)
+    window, report = history.build_window(messages, "u1", "c1", budget=100)
+    assert report["summarized"] and summarizer.calls == 1
+    summary, upto = chat_store.get_summary("u1", "c1")
+    assert summary == summary_reply([])
+    assert isinstance(window[0], SystemMessage) and summary in window[0].content
+    assert window[1:] == messages[upto:]
+    assert isinstance(window[1], HumanMessage)
+    assert report["sent_tokens"] <= 100 < report["full_tokens"]
+
+    # Next turn still fits next to the cached summary: no new LLM call
+    messages = chat(11)
+    window, report = history.build_window(messages, "u1", "c1", budget=100)
+    assert not report["summarized"] and summarizer.calls == 1
+    assert window[1:] == messages[upto:]
+
+    # Many turns later the summary is extended from where it stopped
+    messages = chat(20)
+    history.build_window(messages, "u1", "c1", budget=100)
+    assert summarizer.calls == 2
+    assert chat_store.get_summary("u1", "c1")[1] > upto
+
+
+def test_stale_summary_is_ignored(summarizer):
+    chat_store.save_summary("u1", "c1", "old summary", upto_seq=50)
+    messages = chat(4)
+    window, _ = history.build_window(messages, "u1", "c1", budget=1000)
+    assert window == messages
+
+
+def test_without_chat_id_old_turns_are_dropped(summarizer):
+    messages = chat(10)
+    window, report = history.build_window(messages, budget=100)
+    assert summarizer.calls == 0
+    assert window == messages[-len(window):]
+    assert isinstance(window[0], HumanMessage)
+    assert report["sent_tokens"] <= 100
@@ -0,0 +1,40 @@
+# tests/test_ingest.py
+
+import os
+
+import pytest
+
+from backend import build_index, ingest
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    slides, texts = tmp_path / "course_materials", tmp_path / "processed_texts"
+    slides.mkdir()
+    texts.mkdir()
+    monkeypatch.setattr(ingest, "OUTPUT_DIR", str(texts))
+    monkeypatch.setattr(ingest, "MANIFEST_PATH", str(tmp_path / "ingest_manifest.json"))
+    return slides, texts
+
+
+def test_removed_deck_is_dropped_from_the_index(workdir, monkeypatch):
+    slides, texts = workdir
+    (texts / "1_Old_Deck.txt").write_text("old slides")
+    (texts / "2_Notes.txt").write_text("text-only deck")
+    build_index.save_manifest({"1_Old_Deck.pptx": {"mtime": 1.0, "size": 10, "sha256": "x"}}, ingest.MANIFEST_PATH)
+
+    synced = {}
+
+    def sync_index(documents, keep=None):
+        synced.update(documents=dict(documents), keep=set(keep or ()))
+        return {}
+
+    monkeypatch.setattr(build_index, "sync_index", sync_index)
+    monkeypatch.setattr(build_index, "indexed_documents", lambda: {"1_Old_Deck.txt": {}, "2_Notes.txt": {}})
+
+    stats = ingest.run(input_dir=str(slides))
+    assert stats["removed"] == ["1_Old_Deck.pptx"]
+    assert not os.path.exists(texts / "1_Old_Deck.txt")
+    assert synced["documents"] == {"2_Notes.txt": "text-only deck"}
+    assert synced["keep"] == set()
+    assert build_index.load_manifest(ingest.MANIFEST_PATH) == {}
@@ -0,0 +1,42 @@
+# tests/test_jsonl_log.py
+
+import os
+
+from backend.jsonl_log import JsonlWriter, read_jsonl
+
+
+def test_writes_off_thread_and_reads_back(tmp_path):
+    path = str(tmp_path / "logs" / "a.jsonl")
+    writer = JsonlWriter("test-log", max_bytes=0, error_tag="TEST LOG ERROR")
+    for i in range(10):
+        writer.write(path, {"i": i})
+    writer.write(None, {"i": "dropped"})
+    assert writer.flush(timeout=5)
+    assert [r["i"] for r in read_jsonl(path)] == list(range(10))
+    assert writer.stats()["written"] == 10
+
+
+def test_rotates_at_max_bytes(tmp_path):
+    path = str(tmp_path / "a.jsonl")
+    writer = JsonlWriter("test-log", max_bytes=200, error_tag="TEST LOG ERROR")
+    for i in range(40):
+        writer.write(path, {"i": i, "pad": "x" * 20})
+        writer.flush(timeout=5)
+
+    assert os.path.getsize(path) < 400
+    assert os.path.exists(path + ".1")
+    assert writer.stats()["rotations"] > 1
+    kept = [r["i"] for r in read_jsonl(path)]
+    assert kept[-1] == 39
+    assert kept == sorted(kept)
+
+
+def test_bad_record_does_not_stop_the_writer(tmp_path, capsys):
+    path = str(tmp_path / "a.jsonl")
+    writer = JsonlWriter("test-log", max_bytes=0, error_tag="TEST LOG ERROR")
+    writer.write(path, {"bad": object()})
+    assert writer.flush(timeout=5)
+    writer.write(path, {"ok": 1})
+    assert writer.flush(timeout=5)
+    assert list(read_jsonl(path)) == [{"ok": 1}]
+    assert "[TEST LOG ERROR]" in capsys.readouterr().out
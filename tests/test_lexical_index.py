@@ -0,0 +1,52 @@
+# tests/test_lexical_index.py
+
+from backend.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+FILLER = [f"python code list of values sorted by the model step {i}" for i in range(40)]
+DOCS = [
+    "LSTM cells keep a memory with input forget and output gates",
+    "A bidirectional LSTM reads the sequence in both directions",
+    "YOLO predicts boxes on a grid in a single pass",
+] + FILLER
+
+
+def make_index():
+    return BM25Index([f"d{i}" for i in range(len(DOCS))], DOCS, [{"n": i % 2} for i in range(len(DOCS))])
+
+
+def test_tokenize_lowercases_and_splits():
+    assert tokenize("LSTM, GRU & seq2seq!") == ["lstm", "gru", "seq2seq"]
+
+
+def test_search_ranks_term_matches():
+    idx = make_index()
+    hits = idx.search("lstm gates", k=3)
+    assert [idx.ids[p] for p, _ in hits][:2] == ["d0", "d1"]
+    assert hits[0][1] > hits[1][1]
+
+
+def test_search_respects_allowed_positions():
+    idx = make_index()
+    allowed = idx.positions({"n": 1})
+    hits = idx.search("lstm", k=5, allowed=allowed)
+    assert [p for p, _ in hits] == [1]
+
+
+def test_confident_search_rare_terms_only():
+    idx = make_index()
+    assert idx.confident_search("lstm", k=2) is not None
+    assert idx.confident_search("yolo", k=1) is not None
+    # Common words pass the co-occurrence check but are not rare course terms
+    assert idx.confident_search("python list sort", k=2) is None
+    assert idx.confident_search("unknownword", k=1) is None
+    # Not enough chunks containing every term
+    assert idx.confident_search("lstm", k=3) is None
+    # Too many terms for a keyword query
+    assert idx.confident_search("lstm gates memory forget", k=1) is None
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]])
+    assert fused[0] == "a"
+    assert set(fused) == {"a", "b", "c", "d"}
+    assert fused.index("c") < fused.index("b")
@@ -0,0 +1,131 @@
+# tests/test_memory.py
+
+import uuid
+
+import pytest
+
+from backend import memory
+
+
+def test_memory_id_is_stable_and_per_user():
+    a = memory.memory_id("I prefer PyTorch", "u1")
+    assert a == memory.memory_id("  i prefer   pytorch ", "u1")
+    assert a != memory.memory_id("I prefer PyTorch", "u2")
+    assert a != memory.memory_id("I prefer PyTorch")
+    assert a.startswith("mem-") and len(a) == 36
+
+
+def test_writer_survives_failing_batch(monkeypatch):
+    calls = []
+
+    def write_memories(texts, user_id=None):
+        calls.append(list(texts))
+        if texts == ["boom"]:
+            raise RuntimeError("disk full")
+        return 0
+
+    monkeypatch.setattr(memory, "write_memories", write_memories)
+    writer = memory.MemoryWriter(batch_size=1, interval_s=0.01)
+    writer.submit("boom", "u1")
+    assert writer.flush(timeout=5)
+    writer.submit("fine", "u1")
+    assert writer.flush(timeout=5)
+
+    assert calls == [["boom"], ["fine"]]
+    assert writer.stats()["failed"] == 1
+    assert writer._thread.is_alive()
+
+
+def test_writer_restarts_dead_thread(monkeypatch):
+    monkeypatch.setattr(memory, "write_memories", lambda texts, user_id=None: len(texts))
+    monkeypatch.setattr(memory, "evict_memories", lambda user_id: 0)
+    writer = memory.MemoryWriter(batch_size=4, interval_s=0.01)
+    dead = memory.threading.Thread(target=lambda: None)
+    dead.start()
+    dead.join()
+    writer._thread = dead
+
+    writer.submit("hello", "u1")
+    assert writer.flush(timeout=5)
+    assert writer._thread is not dead
+    assert writer.stats()["written"] == 1
+
+
+def _collection(name: str):
+    chromadb = pytest.importorskip("chromadb")
+    return chromadb.EphemeralClient().get_or_create_collection(
+        name=f"{name}_{uuid.uuid4().hex[:8]}",
+        metadata={"hnsw:space": "cosine"},
+    )
+
+
+def test_quarantine_moves_rows_without_user_id():
+    main, legacy = _collection("memory"), _collection("legacy")
+    main.add(
+        ids=["old", "new"],
+        documents=["old memory", "new memory"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0]],
+        metadatas=[{"created": 1.0}, {"user_id": "u1", "created": 2.0, "last_recalled": 2.0}],
+    )
+
+    assert memory.quarantine_unpartitioned(main, legacy) == 1
+    assert main.get()["ids"] == ["new"]
+    moved = legacy.get(include=["documents", "metadatas"])
+    assert moved["ids"] == ["old"]
+    assert moved["documents"] == ["old memory"]
+    assert "quarantined" in moved["metadatas"][0]
+    assert memory.quarantine_unpartitioned(main, legacy) == 0
+
+
+@pytest.fixture
+def memory_store():
+    memory._memory_collection.override(_collection("memory"))
+    yield memory.get_memory_collection()
+    memory._memory_collection.reset()
+
+
+def test_write_memories_dedups_near_duplicates(monkeypatch, memory_store):
+    vectors = {
+        "likes pytorch": [1.0, 0.0],
+        "Likes  PyTorch": [1.0, 0.0],
+        "likes torch": [0.99, 0.01],
+        "uses jax": [0.0, 1.0],
+    }
+    monkeypatch.setattr(memory.embeddings, "encode_many", lambda texts, **kw: [vectors[t] for t in texts])
+
+    # Same normalized text → one id; near-identical vector in the batch → dropped
+    assert memory.write_memories(["likes pytorch", "Likes  PyTorch", "likes torch"], "u1") == 1
+    # Already stored for u1, but new for u2
+    assert memory.write_memories(["likes torch", "uses jax"], "u1") == 1
+    assert memory.write_memories(["likes pytorch"], "u2") == 1
+    assert len(memory_store.get(where={"user_id": "u1"})["ids"]) == 2
+
+
+class BrokenCollection:
+    def __init__(self, n):
+        self.n = n
+        self.queries = 0
+
+    def count(self):
+        return self.n
+
+    def query(self, **kwargs):
+        self.queries += 1
+        raise ValueError("Embedding dimension 2 does not match collection dimensionality 384")
+
+
+@pytest.mark.parametrize("stored", [0, 3])
+def test_novel_logs_failed_lookups(stored, capsys):
+    coll = BrokenCollection(stored)
+    memory._memory_collection.override(coll)
+    try:
+        keep = memory._novel("u1", ["a", "a again", "b"], [[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+    finally:
+        memory._memory_collection.reset()
+
+    assert keep == [0, 2]                                # in-batch dedup still applies
+    out = capsys.readouterr().out
+    if stored:
+        assert coll.queries == 1 and "[MEMORY ERROR]" in out
+    else:
+        assert coll.queries == 0 and out == ""
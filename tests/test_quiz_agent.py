@@ -0,0 +1,93 @@
+# tests/test_quiz_agent.py
+
+import threading
+
+import pytest
+
+from backend import quiz_agent
+
+TOPICS = [
+    {"id": "1.1", "question": "q1.1"},
+    {"id": "1.2", "question": "q1.2"},
+    {"id": "10.1", "question": "q10.1"},
+    {"id": "12.1", "question": "q12.1"},
+    {"id": "12.10", "question": "q12.10"},
+]
+
+
+@pytest.fixture
+def topics(monkeypatch):
+    monkeypatch.setattr(quiz_agent, "_check_topics_fresh", lambda: None)
+    quiz_agent._topics.override(TOPICS)
+    quiz_agent._chapter_index.reset()
+    yield
+    quiz_agent._topics.reset()
+    quiz_agent._chapter_index.reset()
+
+
+def ids(topics):
+    return [t["id"] for t in topics]
+
+
+def test_chapter_index_matches_whole_segments(topics):
+    assert ids(quiz_agent.topics_for_chapter("1")) == ["1.1", "1.2"]
+    assert ids(quiz_agent.topics_for_chapter("1.")) == ["1.1", "1.2"]
+    assert ids(quiz_agent.topics_for_chapter(" 12.1 ")) == ["12.1"]
+    assert ids(quiz_agent.topics_for_chapter("12")) == ["12.1", "12.10"]
+    assert quiz_agent.topics_for_chapter("2") == []
+    assert quiz_agent.chapters() == ["1", "10", "12"]
+
+
+@pytest.fixture
+def gated_build(monkeypatch):
+    """_build_quiz stand-in that blocks until released, counting calls."""
+    release = threading.Event()
+    calls = []
+
+    def build(chapter, n_questions):
+        calls.append(chapter)
+        release.wait(5)
+        return f"quiz {chapter} #{len(calls)}"
+
+    monkeypatch.setattr(quiz_agent, "_build_quiz", build)
+    return release, calls
+
+
+def _drain(cache):
+    cache._pool.shutdown(wait=True)
+
+
+def test_miss_schedules_one_background_variant(gated_build):
+    release, calls = gated_build
+    cache = quiz_agent.QuizCache(variants=3, workers=2)
+
+    assert cache.take("1", 5) is None
+    assert cache.stats()["pending"] == 1
+    release.set()
+    _drain(cache)
+    assert len(calls) == 1
+    assert cache.stats() == {"hits": 0, "misses": 1, "generated": 1, "ready": 1, "pending": 0}
+
+
+def test_hit_refills_to_variants(gated_build):
+    release, calls = gated_build
+    release.set()
+    cache = quiz_agent.QuizCache(variants=3, workers=1)
+    cache.take("1", 5)
+    cache._pool.submit(lambda: None).result()            # wait for the miss's variant
+
+    assert cache.take("1", 5) == "quiz 1 #1"
+    _drain(cache)
+    assert cache.stats()["ready"] == 3
+    assert len(calls) == 4
+
+
+def test_invalidate_discards_running_generations(gated_build):
+    release, calls = gated_build
+    cache = quiz_agent.QuizCache(variants=2, workers=2)
+    cache.refill("1", 5)
+    cache.invalidate()
+    release.set()
+    _drain(cache)
+    assert cache.stats()["ready"] == 0
+    assert len(calls) == 2
@@ -0,0 +1,67 @@
+# tests/test_router_local.py
+
+import json
+
+import numpy as np
+import pytest
+
+from backend import router_local
+
+
+def test_centroid_weights_sources_equally(monkeypatch):
+    axis = {"a": [1.0, 0.0], "b": [0.0, 1.0]}
+    monkeypatch.setattr(router_local.embeddings, "encode_many", lambda texts, **kw: [axis[t] for t in texts])
+
+    c = router_local._centroid({"seeds": ["a"], "chunks": ["b"] * 50, "empty": []})
+    assert np.allclose(c, np.array([1.0, 1.0]) / np.sqrt(2))
+
+
+@pytest.fixture
+def decision_log(tmp_path, monkeypatch):
+    path = str(tmp_path / "router_decisions.jsonl")
+    monkeypatch.setattr(router_local, "DECISION_LOG", path)
+    return path
+
+
+def test_log_decision_is_written_in_background(decision_log):
+    router_local.log_decision("explain pca", "general_explanation", "local", 0.123456)
+    assert router_local._log_writer.flush(timeout=5)
+    with open(decision_log) as f:
+        rec = json.loads(f.readline())
+    assert (rec["query"], rec["source"], rec["margin"]) == ("explain pca", "local", 0.1235)
+
+
+def test_agreement_report(decision_log):
+    rows = [
+        {"query": "q1", "label": "rag_query", "source": "local", "margin": 0.2},
+        {"query": "q2", "label": "rag_query", "source": "llm", "margin": 0.01},               # agrees
+        {"query": "q3", "label": "general_explanation", "source": "llm", "margin": 0.015},    # disagrees
+        {"query": "q4", "label": "general_explanation", "source": "llm", "margin": -0.07},    # agrees
+        {"query": "q5", "label": "rag_query", "source": "llm", "margin": None},
+    ]
+    with open(decision_log, "w") as f:
+        f.write("".join(json.dumps(r) + "\n" for r in rows) + "not json\n")
+
+    report = router_local.agreement_report(margin=0.08, band=0.02)
+    assert (report["decisions"], report["local"], report["llm"]) == (4, 1, 3)
+    assert report["agreement"] == pytest.approx(2 / 3, abs=1e-3)
+    assert [b["n"] for b in report["bands"]] == [2, 0, 0, 1]
+    assert report["bands"][0] == {"margin": "0.00-0.02", "n": 2, "agreement": 0.5}
+    assert report["bands"][3]["agreement"] == 1.0
+
+    # Logged LLM labels (including the rotated file) are training data
+    with open(decision_log + ".1", "w") as f:
+        f.write(json.dumps({"query": "old", "label": "rag_query", "source": "llm", "margin": 0.0}) + "\n")
+    examples = router_local._logged_examples()
+    assert examples["rag_query"] == ["old", "q2", "q5"]
+    assert examples["general_explanation"] == ["q3", "q4"]
+
+
+def test_train_writes_to_the_current_centroids_path(tmp_path, monkeypatch):
+    path = tmp_path / "router_centroids.json"
+    monkeypatch.setattr(router_local, "CENTROIDS_PATH", str(path))
+    monkeypatch.setattr(router_local, "_seed_texts", lambda: {label: {"seeds": [label]} for label in router_local.LABELS})
+    monkeypatch.setattr(router_local.embeddings, "encode_many", lambda texts, **kw: [[1.0, 0.0] for _ in texts])
+
+    router_local.train(include_log=False)
+    assert set(json.loads(path.read_text())["centroids"]) == set(router_local.LABELS)
@@ -0,0 +1,80 @@
+# tests/test_service.py
+# Request parsing and admission of the assistant service (no graph runs)
+
+import json
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from backend import service
+
+
+async def _exchange(raw: bytes) -> bytes:
+    """Send raw bytes to a fresh service and return everything it answers."""
+    svc = service.AssistantService(workers=0)
+    server = await asyncio.start_server(svc.handle, host="127.0.0.1", port=0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(raw)
+        await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+        data = await asyncio.wait_for(reader.read(), timeout=5)
+        writer.close()
+        return data
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def exchange(raw: bytes):
+    data = asyncio.run(_exchange(raw))
+    if not data:
+        return None, None
+    head, _, body = data.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), json.loads(body)
+
+
+def post_turn(payload: dict) -> bytes:
+    body = json.dumps(payload).encode()
+    return b"POST /turn HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+
+
+def test_oversized_headers_get_431():
+    raw = b"GET /health HTTP/1.1\r\nX-Big: " + b"a" * (100 * 1024) + b"\r\n\r\n"
+    status, body = exchange(raw)
+    assert status == 431
+    assert "too large" in body["error"]
+
+
+def test_malformed_and_incomplete_requests_get_400():
+    assert exchange(b"GARBAGE\r\n\r\n")[0] == 400
+    assert exchange(b"GET /health HTTP/1.1\r\nHost: x")[0] == 400
+    assert exchange(b"POST /turn HTTP/1.1\r\nContent-Length: -5\r\n\r\n")[0] == 400
+    assert exchange(b"") == (None, None)
+
+
+def test_turn_requires_user_id():
+    messages = [{"role": "user", "content": "hi"}]
+    for payload in ({"messages": messages}, {"user_id": "  ", "messages": messages}, {"user_id": 7, "messages": messages}):
+        status, body = exchange(post_turn(payload))
+        assert status == 400
+        assert "user_id" in body["error"]
+
+
+def test_admission_limits():
+    async def run():
+        svc = service.AssistantService(workers=0, queue_size=2, user_concurrency=1)
+        job = lambda user: service._Job(user, {}, stream=False)
+        assert svc.submit(job("u1")) is None
+        assert svc.submit(job("u1"))[0] == 429
+        assert svc.submit(job("u2")) is None
+        assert svc.submit(job("u3"))[0] == 503
+        return dict(svc.in_flight), dict(svc.counters)
+
+    in_flight, counters = asyncio.run(run())
+    assert in_flight == {"u1": 1, "u2": 1}
+    assert (counters["rejected_user_limit"], counters["rejected_queue_full"]) == (1, 1)
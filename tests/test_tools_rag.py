@@ -0,0 +1,137 @@
+# tests/test_tools_rag.py
+# Score-gated, chapter-scoped retrieval over a tiny in-memory index
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+pytest.importorskip("dotenv")
+
+from backend import tools_rag
+from backend.build_index import deck_metadata
+from backend.vector_backend import NumpyCollection
+
+ON_TOPIC = [1.0, 0.0, 0.0]
+OFF_TOPIC = [0.0, 1.0, 0.0]
+
+FILLER = "neural networks learn representations from data with gradient descent"
+
+
+def _chunks():
+    """(source, text, vector): chapter 4 mentions 'yolo' but points away from the query."""
+    rows = []
+    for i in range(3):
+        rows.append(("4_DL_CV_Object_Detection.txt", f"yolo detector grid cells anchor boxes part {i}", OFF_TOPIC))
+    for i in range(3):
+        rows.append(("7_NLP_Seq2Seq_Transformer.txt", f"attention transformer encoder decoder part {i}", ON_TOPIC))
+    for i in range(60):
+        rows.append(("10_3_CLOUD_AI_Weapons_of_math_destruction.txt", f"{FILLER} {i}", [0.0, 0.0, 1.0]))
+    return rows
+
+
+@pytest.fixture
+def index(monkeypatch):
+    rows = _chunks()
+    coll = NumpyCollection(
+        [f"c{i}" for i in range(len(rows))],
+        [text for _, text, _ in rows],
+        [deck_metadata(src) for src, _, _ in rows],
+        np.asarray([v for _, _, v in rows], dtype=np.float32),
+    )
+    tools_rag._collection.override(coll)
+    tools_rag._lexical_index.reset()
+    tools_rag._partitions.reset()
+    monkeypatch.setattr(tools_rag.embeddings, "encode", lambda q: ON_TOPIC)
+    yield coll
+    tools_rag._collection.reset()
+    tools_rag._lexical_index.reset()
+    tools_rag._partitions.reset()
+
+
+def test_chapter_filter(index):
+    assert tools_rag.chapter_filter("7") == {"chapter": "7"}
+    assert tools_rag.chapter_filter("10.3") == {"deck": "10.3"}
+    assert tools_rag.chapter_filter("10") == {"chapter": "10"}
+    assert tools_rag.chapter_filter("7.2") == {"chapter": "7"}
+    assert tools_rag.chapter_filter("99") is None
+    assert tools_rag.chapter_filter(None) is None
+
+
+def test_scoped_search_stays_in_chapter(index):
+    result = tools_rag.retrieve("encoder decoder attention", k=2, chapter="7")
+    assert result["scope"] == {"chapter": "7"}
+    assert {h["metadata"]["chapter"] for h in result["hits"]} == {"7"}
+    assert result["confidence"] == "high"
+
+
+def _no_embedder(q):
+    raise AssertionError(f"embedder called for {q!r}")
+
+
+def test_lexical_fast_path_skips_the_embedder(index, monkeypatch):
+    monkeypatch.setattr(tools_rag, "RAG_LEXICAL_FAST", True)
+    monkeypatch.setattr(tools_rag.embeddings, "encode", _no_embedder)
+    seen = []
+
+    result = tools_rag.retrieve("yolo", k=2, chapter="4", on_score=lambda top, conf: seen.append(conf))
+    assert result["path"] == "lexical"
+    assert result["scope"] == {"chapter": "4"}
+    assert {h["metadata"]["chapter"] for h in result["hits"]} == {"4"}
+    assert result["top_similarity"] is None
+    assert result["confidence"] == "high"
+    assert tools_rag.rag_is_sufficient(result)
+    assert seen == ["high"]
+
+    # Unscoped, BM25 has to fill every MMR candidate slot to be confident
+    monkeypatch.setattr(tools_rag, "RAG_MMR_CANDIDATES", 3)
+    unscoped = tools_rag.retrieve("yolo", k=2)
+    assert (unscoped["path"], unscoped["confidence"]) == ("lexical", "high")
+
+
+def test_common_terms_are_embedded(index, monkeypatch):
+    monkeypatch.setattr(tools_rag, "RAG_LEXICAL_FAST", True)
+    calls = []
+    monkeypatch.setattr(tools_rag.embeddings, "encode", lambda q: calls.append(q) or ON_TOPIC)
+    result = tools_rag.retrieve("neural networks", k=2)
+    assert result["path"] == "hybrid"
+    assert calls == ["neural networks"]
+
+
+def test_low_score_is_not_sufficient(index, monkeypatch):
+    monkeypatch.setattr(tools_rag.embeddings, "encode", lambda q: [0.0, -1.0, 0.0])
+    seen = []
+    result = tools_rag.retrieve("completely unrelated", k=3, on_score=lambda top, conf: seen.append(conf))
+    assert result["confidence"] == "low"
+    assert not tools_rag.rag_is_sufficient(result)
+    assert seen == ["low"]
+
+
+def test_index_without_chapter_metadata_warns(index, capsys):
+    legacy = NumpyCollection(
+        index.ids, index.documents, [{"source": m["source"]} for m in index.metadatas], index.matrix
+    )
+    tools_rag._collection.override(legacy)
+    tools_rag._partitions.reset()
+    assert tools_rag.chapter_filter("7") is None
+    assert "No chapter metadata" in capsys.readouterr().out
+
+
+def test_fingerprint_without_manifest_tracks_ids(tmp_path, monkeypatch):
+    from backend import build_index
+
+    monkeypatch.setattr(build_index, "MANIFEST_PATH", str(tmp_path / "missing.json"))
+    rows = _chunks()
+    chroma = NumpyCollection(
+        [f"c{i}" for i in range(len(rows))],
+        [text for _, text, _ in rows],
+        [{} for _ in rows],
+        np.asarray([v for _, _, v in rows], dtype=np.float32),
+    )
+    monkeypatch.setattr(tools_rag, "get_chroma_collection", lambda: chroma)
+
+    first = tools_rag._index_fingerprint()
+    assert first and first.startswith("ids:")
+    assert tools_rag._index_fingerprint() == first
+
+    chroma.ids[-1] = "c-new"
+    assert tools_rag._index_fingerprint() != first
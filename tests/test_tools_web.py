@@ -0,0 +1,198 @@
+# tests/test_tools_web.py
+# WebSearchClient against the local Tavily stand-in (benchmarks/fakes.py)
+
+import time
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("langchain_core")
+
+from backend.tools_web import WebSearchClient
+from benchmarks.fakes import FakeTavilyServer
+
+
+@pytest.fixture
+def server():
+    fake = FakeTavilyServer().start()
+    yield fake
+    fake.stop()
+
+
+def make_client(server, tmp_path, **kwargs):
+    kwargs.setdefault("cache_path", str(tmp_path / "web_cache.db"))
+    return WebSearchClient(api_key="test", base_url=server.url, **kwargs)
+
+
+def test_result_shape_and_pooled_session(server, tmp_path):
+    client = make_client(server, tmp_path, cache_path=None)
+    for q in ("lstm", "gru", "attention"):
+        result = client.search(q, max_results=3)
+        assert result["ok"] and result["error"] is None
+        assert len(result["results"]) == 3
+        assert set(result["results"][0]) == {"title", "url", "content"}
+    assert server.requests == 3
+    # One keep-alive connection served all three requests
+    assert len(server.connections) == 1
+
+
+def test_ttl_cache_hit_then_expiry(server, tmp_path):
+    client = make_client(server, tmp_path, ttl_s=0.3)
+    first = client.search("What is dropout?")
+    assert client.search("  what is   DROPOUT? ") == first      # normalized key
+    assert server.requests == 1 and client.cache_hits == 1
+
+    time.sleep(0.4)
+    client.search("What is dropout?")
+    assert server.requests == 2
+
+
+def test_expired_rows_are_deleted_on_write(server, tmp_path):
+    client = make_client(server, tmp_path, ttl_s=0.2)
+    client.search("first query")
+    time.sleep(0.3)
+    client.search("second query")
+    rows = client._db.execute("SELECT COUNT(*) FROM web_cache").fetchone()[0]
+    assert rows == 1
+
+
+def test_concurrent_identical_queries_coalesce(server, tmp_path):
+    server.latency_s = 0.3
+    client = make_client(server, tmp_path, cache_path=None)
+    barrier = threading.Barrier(10)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(client.search("transformers"))
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert server.requests == 1
+    assert client.coalesced == 9
+    assert all(r == results[0] and r["ok"] for r in results)
+    assert client.stats()["inflight"] == 0
+
+
+def test_pending_map_is_capped(server, tmp_path):
+    server.latency_s = 0.2
+    client = make_client(server, tmp_path, cache_path=None, max_pending=2)
+    threads = [threading.Thread(target=client.search, args=(f"q{i}",)) for i in range(6)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    assert len(client._inflight) <= 2
+    for t in threads:
+        t.join()
+    assert server.requests == 6
+
+
+def test_upstream_timeout_keeps_result_shape(server, tmp_path):
+    server.latency_s = 0.5
+    client = make_client(server, tmp_path, timeout=(1.0, 0.1))
+    result = client.search("slow")
+    assert result["ok"] is False and result["results"] == [] and result["error"]
+
+
+def test_upstream_5xx_keeps_result_shape_and_is_not_cached(server, tmp_path):
+    server.status = 503
+    client = make_client(server, tmp_path)
+    result = client.search("outage")
+    assert result["ok"] is False and result["results"] == [] and "503" in result["error"]
+
+    server.status = 200
+    assert client.search("outage")["ok"] is True
+
+
+def test_missing_api_key(server, tmp_path, monkeypatch):
+    monkeypatch.delenv("TAVILY_API_KEY", raising=False)
+    client = WebSearchClient(base_url=server.url, cache_path=None)
+    assert client.search("x") == {
+        "ok": False,
+        "results": [],
+        "error": "Missing TAVILY_API_KEY environment variable.",
+    }
+    assert server.requests == 0
+
+
+# ----------------------------
+# Async
+# ----------------------------
+pytest.importorskip("httpx")
+
+
+def test_async_cache_coalescing_and_errors(server, tmp_path):
+    server.latency_s = 0.2
+    client = make_client(server, tmp_path, ttl_s=60)
+
+    async def main():
+        results = await asyncio.gather(*(client.asearch("cnn") for _ in range(10)))
+        assert server.requests == 1 and client.coalesced == 9
+        assert all(r == results[0] and r["ok"] for r in results)
+
+        assert await client.asearch("cnn") == results[0]        # disk cache
+        assert server.requests == 1
+
+        server.status = 500
+        failed = await client.asearch("uncached question")
+        assert failed["ok"] is False and failed["results"] == [] and failed["error"]
+        await client.aclose()
+
+    asyncio.run(main())
+
+
+def test_async_timeout_keeps_result_shape(server, tmp_path):
+    server.latency_s = 0.5
+    client = make_client(server, tmp_path, timeout=(1.0, 0.1))
+
+    async def main():
+        result = await client.asearch("slow")
+        assert result["ok"] is False and result["results"] == [] and result["error"]
+        await client.aclose()
+
+    asyncio.run(main())
+
+
+def test_async_last_waiter_cancels_request(server, tmp_path):
+    server.latency_s = 0.5
+    client = make_client(server, tmp_path, cache_path=None)
+
+    async def main():
+        first = asyncio.ensure_future(client.asearch("rnn"))
+        second = asyncio.ensure_future(client.asearch("rnn"))
+        await asyncio.sleep(0.1)
+        inflight = client._loop_state()[2]
+        upstream = next(iter(inflight.values()))[0]
+
+        # One waiter giving up leaves the shared request running...
+        first.cancel()
+        await asyncio.sleep(0.05)
+        assert not upstream.done()
+
+        # ...the last one cancels it
+        second.cancel()
+        await asyncio.sleep(0.05)
+        assert upstream.cancelled()
+        assert inflight == {}
+        await client.aclose()
+
+    asyncio.run(main())
+
+
+def test_aclose_releases_loop_client(server, tmp_path):
+    client = make_client(server, tmp_path, cache_path=None)
+
+    async def main():
+        await client.asearch("gan")
+        http = client._loop_state()[0]
+        await client.aclose()
+        assert http.is_closed
+        assert len(client._async_state) == 0
+
+    asyncio.run(main())
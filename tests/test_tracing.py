@@ -0,0 +1,63 @@
+# tests/test_tracing.py
+
+import asyncio
+import threading
+
+import pytest
+
+from backend import tracing
+from backend.jsonl_log import read_jsonl
+
+pytestmark = pytest.mark.skipif(not tracing.TRACE_ENABLED, reason="TRACE=0")
+
+
+def test_async_turn_is_traced_and_exported_off_loop(tmp_path, monkeypatch):
+    path = str(tmp_path / "traces.jsonl")
+    monkeypatch.setattr(tracing, "TRACE_LOG", path)
+    append_threads = []
+    append = tracing._log_writer._append
+
+    def spy(p, records):
+        append_threads.append(threading.current_thread().name)
+        append(p, records)
+
+    monkeypatch.setattr(tracing._log_writer, "_append", spy)
+
+    async def retrieve(state):
+        with tracing.span("chroma_query"):
+            await asyncio.sleep(0.01)
+        tracing.annotate(route="rag_query")
+        tracing.count("tokens_in", 12)
+        return state
+
+    async def answer(state):
+        return state
+
+    async def turn():
+        state = {}
+        state = await tracing.traced_node("retrieve", retrieve)(state)
+        state = await tracing.traced_node("answer", answer, final=True)(state)
+        return state["trace_id"], threading.current_thread().name
+
+    trace_id, loop_thread = asyncio.run(turn())
+    assert tracing._log_writer.flush(timeout=5)
+
+    trace = tracing.get_trace(trace_id)
+    parents = {s["name"]: s["parent"] for s in trace["spans"]}
+    # A node and its first sub-span can start in the same 0.01 ms: compare nesting, not order
+    assert parents == {"retrieve": None, "chroma_query": "retrieve", "answer": None}
+    assert trace["attrs"] == {"route": "rag_query", "tokens_in": 12}
+
+    exported = [t for t in read_jsonl(path) if t["trace_id"] == trace_id]
+    assert len(exported) == 1
+    assert append_threads and loop_thread not in append_threads
+
+
+def test_no_export_without_log(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_LOG", None)
+    before = tracing._log_writer.stats()["written"]
+    wrapped = tracing.traced_node("only", lambda state: state, final=True)
+    state = wrapped({})
+    assert tracing._log_writer.flush(timeout=5)
+    assert tracing.get_trace(state["trace_id"]) is not None
+    assert tracing._log_writer.stats()["written"] == before
@@ -0,0 +1,56 @@
+# tests/test_vector_backend.py
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from backend.vector_backend import NumpyCollection
+
+
+def make(dtype="float32", n=50, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    m = rng.normal(size=(n, dim)).astype(np.float32)
+    m /= np.linalg.norm(m, axis=1, keepdims=True)
+    metas = [{"chapter": str(i % 3), "deck": f"{i % 3}.{i % 2}"} for i in range(n)]
+    return NumpyCollection([f"c{i}" for i in range(n)], [f"doc {i}" for i in range(n)], metas, m.astype(dtype)), m
+
+
+def test_query_matches_brute_force():
+    coll, m = make()
+    q = np.random.default_rng(1).normal(size=(3, 8)).astype(np.float32)
+    res = coll.query(query_embeddings=q.tolist(), n_results=5, include=["distances", "documents"])
+    qn = q / np.linalg.norm(q, axis=1, keepdims=True)
+    for row, ids, dists in zip(qn @ m.T, res["ids"], res["distances"]):
+        order = np.argsort(-row)[:5]
+        assert ids == [f"c{i}" for i in order]
+        assert np.allclose(dists, 1.0 - row[order], atol=1e-5)
+    assert set(res) == {"ids", "distances", "documents"}
+
+
+def test_where_filters():
+    coll, _ = make()
+    res = coll.query(query_embeddings=[[1.0] * 8], n_results=100, where={"chapter": "1"})
+    assert len(res["ids"][0]) == len([i for i in range(50) if i % 3 == 1])
+    assert all(m["chapter"] == "1" for m in res["metadatas"][0])
+    res = coll.get(where={"$and": [{"chapter": {"$in": ["0", "2"]}}, {"deck": {"$ne": "0.0"}}]})
+    assert all(m["chapter"] in ("0", "2") and m["deck"] != "0.0" for m in res["metadatas"])
+    empty = coll.query(query_embeddings=[[1.0] * 8], n_results=3, where={"chapter": "9"})
+    assert empty["ids"] == [[]]
+
+
+def test_float16_is_upcast_once(tmp_path):
+    coll, m = make("float16")
+    assert coll._scan is None
+    first = coll.query(query_embeddings=[m[7].tolist()], n_results=1)
+    scan = coll._scan
+    assert scan.dtype == np.float32
+    coll.query(query_embeddings=[m[3].tolist()], n_results=1, where={"chapter": "0"})
+    assert coll._scan is scan
+    assert first["ids"] == [["c7"]]
+
+    prefix = str(tmp_path / "matrix")
+    coll.save(prefix, fingerprint="abc")
+    assert NumpyCollection.stored_fingerprint(prefix) == "abc"
+    loaded = NumpyCollection.load(prefix)
+    assert loaded.matrix.dtype == np.float16
+    assert loaded.query(query_embeddings=[m[7].tolist()], n_results=1)["ids"] == [["c7"]]